@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the strategy hot paths on synthetic candles.
+
+Every case runs on deterministic random-walk OHLCV data (same seed, same
+candles on every machine) for each combination of candles per pair
+(`--candles`) and number of pairs (`--pairs`); combinations above
+`--max-total-candles` are skipped. For each case it records the time (best
+of `--repeat` runs per pair, summed over the pairs) and the peak memory
+allocated by one call (tracemalloc, in a separate untimed run).
+
+    python bench_strategies.py                         # all cases and sizes
+    python bench_strategies.py --candles 10000 --pairs 1 10 --cases 'weapon.*'
+    python bench_strategies.py --save-baseline         # results become the baseline
+
+The results are written as JSON (`--output`). When a baseline exists
+(`--baseline`, saved from a previous run on the same machine), every case
+is compared with it and the run fails (exit code 1) when a case is slower
+or uses more memory than the ratios in `--thresholds` allow.
+
+Needs the strategy dependencies (Freqtrade, TA-Lib, technical) importable,
+as when running Freqtrade outside docker.
+"""
+import argparse
+import fnmatch
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+STRATEGIES_DIR = BENCHMARKS_DIR.parent / 'user_data' / 'strategies'
+
+CANDLES = (10_000, 100_000, 1_000_000)
+PAIRS = (1, 10, 100)
+# 1M candles x 100 pairs would need tens of GB of indicators
+MAX_TOTAL_CANDLES = 10_000_000
+SEED = 20240101
+# custom_stoploss calls per pair, as trade-loop iterations with an open trade
+STOPLOSS_CALLS = 1_000
+
+# The strategies compute, they do not read the disk cache
+NO_CACHE_CONFIG = {'indicator_cache': {'enabled': False}}
+
+
+def synthetic_candles(candles, pair_index, seed=SEED):
+    """
+    Deterministic 5m candles: geometric random walk with a few zero-volume
+    candles
+    """
+    rng = np.random.default_rng([seed, pair_index, candles])
+    close = 100 * np.exp(np.cumsum(rng.standard_normal(candles) * 0.002))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.random(candles) * 0.002)
+    low = np.minimum(open_, close) * (1 - rng.random(candles) * 0.002)
+    volume = rng.lognormal(6, 1, candles)
+    volume[rng.random(candles) < 0.001] = 0
+    return pd.DataFrame({
+        'date': pd.date_range('2020-01-01', periods=candles, freq='5min', tz='UTC'),
+        'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+    })
+
+
+def load_strategy(filename, name, config):
+    if str(STRATEGIES_DIR) not in sys.path:
+        sys.path.append(str(STRATEGIES_DIR))
+    spec = importlib.util.spec_from_file_location(f'_bench_{name}', STRATEGIES_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    strategy = getattr(module, name)(config)
+    strategy.bot_start()
+    return strategy
+
+
+class Strategies:
+    """
+    The benchmarked strategy instances, loaded on first use
+    """
+
+    def __init__(self):
+        self._strategies = {}
+
+    def get(self, key):
+        if key not in self._strategies:
+            filename, name, config = STRATEGY_SETUPS[key]
+            self._strategies[key] = load_strategy(filename, name, config)
+        return self._strategies[key]
+
+
+STRATEGY_SETUPS = {
+    'weapon': ('WeaponCandleStrategy.py', 'WeaponCandleStrategy',
+               {'runmode': 'backtest', 'pochteca': NO_CACHE_CONFIG}),
+    # Dry-run: custom_stoploss reads the candle snapshots
+    'weapon_dry': ('WeaponCandleStrategy.py', 'WeaponCandleStrategy',
+                   {'runmode': 'dry_run', 'pochteca': {**NO_CACHE_CONFIG, 'streaming_indicators': False}}),
+    'template': ('HyperOptTeamplate.py', 'TemplateHyperopt',
+                 {'runmode': 'backtest', 'pochteca': NO_CACHE_CONFIG}),
+    'sample': ('sample_strategy.py', 'SampleStrategy',
+               {'runmode': 'backtest', 'pochteca': {**NO_CACHE_CONFIG, 'all_indicators': True}}),
+}
+
+
+# Cases: name -> (prepare, run). `prepare(strategies, frame, memo)` builds the
+# arguments of one timed call (untimed, fresh for every run); `memo` keeps
+# what the cases of the same pair share.
+
+def _indicators(strategies, frame, memo, key='weapon'):
+    if key not in memo:
+        memo[key] = strategies.get(key).populate_indicators(frame.copy(), {'pair': 'BENCH/USDT'})
+    return memo[key]
+
+
+def _weapon(strategies, frame, memo):
+    return strategies.get('weapon'), frame.copy()
+
+
+def _weapon_indicators(strategies, frame, memo):
+    return strategies.get('weapon'), _indicators(strategies, frame, memo).copy()
+
+
+def _weapon_entries(strategies, frame, memo):
+    if 'weapon_entries' not in memo:
+        memo['weapon_entries'] = strategies.get('weapon').populate_entry_trend(
+            _indicators(strategies, frame, memo).copy(), {'pair': 'BENCH/USDT'})
+    return strategies.get('weapon'), memo['weapon_entries'].copy()
+
+
+def _weapon_stoploss(strategies, frame, memo):
+    strategy = strategies.get('weapon_dry')
+    metadata = {'pair': 'BENCH/USDT'}
+    dataframe = strategy.populate_indicators(frame.copy(), metadata)
+    dataframe = strategy.populate_entry_trend(dataframe, metadata)
+    strategy.populate_exit_trend(dataframe, metadata)
+    current_time = frame['date'].iat[-1].to_pydatetime() + timedelta(minutes=5)
+    return strategy, current_time, float(frame['close'].iat[-1])
+
+
+def _run_stoploss(strategy, current_time, current_rate):
+    for _ in range(STOPLOSS_CALLS):
+        strategy.custom_stoploss('BENCH/USDT', None, current_time, current_rate, 0.01)
+
+
+def _template(strategies, frame, memo):
+    return strategies.get('template'), frame.copy()
+
+
+def _sample(strategies, frame, memo):
+    return strategies.get('sample'), frame.copy()
+
+
+CASES = {
+    'weapon.populate_indicators': (
+        _weapon, lambda strategy, df: strategy.populate_indicators(df, {'pair': 'BENCH/USDT'})),
+    'weapon.calculate_volume_windows': (
+        _weapon, lambda strategy, df: strategy.calculate_volume_windows(df, strategy.buy_vwap_period.range)),
+    'weapon.populate_entry_trend': (
+        _weapon_indicators, lambda strategy, df: strategy.populate_entry_trend(df, {'pair': 'BENCH/USDT'})),
+    'weapon.populate_exit_trend': (
+        _weapon_entries, lambda strategy, df: strategy.populate_exit_trend(df, {'pair': 'BENCH/USDT'})),
+    'weapon.custom_stoploss': (_weapon_stoploss, _run_stoploss),
+    'template.populate_indicators': (
+        _template, lambda strategy, df: strategy.populate_indicators(df, {'pair': 'BENCH/USDT'})),
+    'sample.populate_indicators': (
+        _sample, lambda strategy, df: strategy.populate_indicators(df, {'pair': 'BENCH/USDT'})),
+}
+
+
+def measure(case, strategies, frames, repeat, memory):
+    """
+    :return: (seconds summed over the pairs, peak MB of one call or None)
+    """
+    prepare, run = CASES[case]
+    seconds = 0.0
+    peak = 0
+    for frame, memo in frames:
+        best = float('inf')
+        for _ in range(repeat):
+            args = prepare(strategies, frame, memo)
+            start = time.perf_counter()
+            run(*args)
+            best = min(best, time.perf_counter() - start)
+        seconds += best
+        if memory:
+            args = prepare(strategies, frame, memo)
+            tracemalloc.start()
+            try:
+                run(*args)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+    return seconds, (peak / 2 ** 20 if memory else None)
+
+
+def run_benchmarks(cases, candles_sizes, pair_counts, repeat, memory, max_total):
+    strategies = Strategies()
+    results = []
+    for candles in candles_sizes:
+        # Frames of the largest pair count, the smaller counts use the first ones
+        counts = [pairs for pairs in pair_counts if candles * pairs <= max_total]
+        for pairs in sorted(set(pair_counts) - set(counts)):
+            print(f"skip {candles} candles x {pairs} pairs (above --max-total-candles)")
+        if not counts:
+            continue
+        frames = [(synthetic_candles(candles, j), {}) for j in range(max(counts))]
+        for pairs in counts:
+            for case in cases:
+                seconds, peak = measure(case, strategies, frames[:pairs], repeat, memory)
+                result = {
+                    'case': case, 'candles': candles, 'pairs': pairs,
+                    'seconds': seconds, 'us_per_candle': seconds / (candles * pairs) * 1e6,
+                    'peak_mb': peak,
+                }
+                results.append(result)
+                print(f"{case:34} {candles:>9} x {pairs:<3} {seconds * 1000:10.1f} ms"
+                      + (f" {peak:9.1f} MB" if peak is not None else ""))
+        del frames
+    return results
+
+
+def environment():
+    import talib
+
+    return {
+        'time': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'talib': talib.__version__,
+    }
+
+
+def load_thresholds(path):
+    thresholds = {'time': 1.25, 'memory': 1.25, 'min_seconds': 0.01, 'cases': {}}
+    if path and Path(path).exists():
+        with open(path) as f:
+            thresholds.update(json.load(f))
+    return thresholds
+
+
+def regressions(results, baseline, thresholds):
+    """
+    Cases over their thresholds against the baseline
+    """
+    previous = {(r['case'], r['candles'], r['pairs']): r for r in baseline['results']}
+    failures = []
+    for result in results:
+        before = previous.get((result['case'], result['candles'], result['pairs']))
+        if before is None:
+            continue
+        limits = {**thresholds, **thresholds['cases'].get(result['case'], {})}
+        # Timings this short are mostly noise
+        if max(result['seconds'], before['seconds']) >= limits['min_seconds']:
+            ratio = result['seconds'] / before['seconds']
+            if ratio > limits['time']:
+                failures.append(f"{result['case']} {result['candles']}x{result['pairs']}: "
+                                f"time x{ratio:.2f} (limit x{limits['time']})")
+        if result['peak_mb'] and before.get('peak_mb'):
+            ratio = result['peak_mb'] / before['peak_mb']
+            if ratio > limits['memory']:
+                failures.append(f"{result['case']} {result['candles']}x{result['pairs']}: "
+                                f"memory x{ratio:.2f} (limit x{limits['memory']})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strategy hot path benchmarks")
+    parser.add_argument('--cases', nargs='+', default=['*'], help="Case names or patterns")
+    parser.add_argument('--candles', nargs='+', type=int, default=list(CANDLES), help="Candles per pair")
+    parser.add_argument('--pairs', nargs='+', type=int, default=list(PAIRS))
+    parser.add_argument('--max-total-candles', type=int, default=MAX_TOTAL_CANDLES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the memory measurement")
+    parser.add_argument('--output', default=str(BENCHMARKS_DIR / 'results' / 'latest.json'))
+    parser.add_argument('--baseline', default=str(BENCHMARKS_DIR / 'baseline.json'))
+    parser.add_argument('--thresholds', default=str(BENCHMARKS_DIR / 'thresholds.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="Save the results as the baseline")
+    args = parser.parse_args()
+
+    cases = [case for case in CASES if any(fnmatch.fnmatch(case, pattern) for pattern in args.cases)]
+    if not cases:
+        parser.error(f"No case matches {args.cases}, cases: {', '.join(CASES)}")
+
+    results = run_benchmarks(cases, args.candles, args.pairs, args.repeat, not args.no_memory,
+                             args.max_total_candles)
+    report = {'environment': environment(), 'results': results}
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {path}")
+
+    if args.save_baseline or not Path(args.baseline).exists():
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = regressions(results, baseline, load_thresholds(args.thresholds))
+    if failures:
+        print(f"Regressions against {args.baseline}:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Columnar, memory-mappable OHLCV store for fast backtest loading.
+
+Every pair/timeframe is a directory holding one contiguous `.npy` array per
+column: `date` as int64 epoch milliseconds, the price and volume columns
+as float64. Arrays are opened with `mmap_mode='r'`, and the sorted `date`
+array is the index: a timerange is located with a binary search and
+returned as a view, so loading a slice reads only the pages it touches
+instead of parsing the whole candle file.
+
+Build it from the Freqtrade data files with the /update `"columnar": true`
+option, or for existing data:
+
+    python columnar_store.py --timeframes 5m 15m 1h --pairs BTC/USDT ETH/USDT
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from datafiles import OHLCV_COLUMNS, pair_to_filename
+
+VALUE_COLUMNS = OHLCV_COLUMNS[1:]
+
+
+def parse_timerange(timerange):
+    """
+    Freqtrade style 'YYYYMMDD-YYYYMMDD' (either side optional) to epoch ms
+    """
+    if not timerange:
+        return None, None
+    start, _, end = timerange.partition('-')
+
+    def to_ms(value):
+        if not value:
+            return None
+        return int(datetime.strptime(value, '%Y%m%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+    return to_ms(start), to_ms(end)
+
+
+class ColumnarStore:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, pair, timeframe, candle_type='spot'):
+        name = f"{pair_to_filename(pair)}-{timeframe}"
+        if candle_type != 'spot':
+            name = f"{name}-{candle_type}"
+        return os.path.join(self.root, name)
+
+    def exists(self, pair, timeframe, candle_type='spot'):
+        return os.path.exists(os.path.join(self.path(pair, timeframe, candle_type), 'meta.json'))
+
+    def write(self, pair, timeframe, dates_ms, columns, candle_type='spot'):
+        """
+        Replaces the stored arrays of a pair/timeframe.
+
+        :param dates_ms: Sorted candle open times, epoch milliseconds
+        :param columns: dict with open/high/low/close/volume arrays
+        """
+        target = self.path(pair, timeframe, candle_type)
+        tmp = f"{target}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        dates_ms = np.ascontiguousarray(dates_ms, dtype=np.int64)
+        np.save(os.path.join(tmp, 'date.npy'), dates_ms)
+        for column in VALUE_COLUMNS:
+            np.save(os.path.join(tmp, f'{column}.npy'), np.ascontiguousarray(columns[column], dtype=np.float64))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({
+                'pair': pair,
+                'timeframe': timeframe,
+                'candle_type': candle_type,
+                'rows': int(dates_ms.size),
+                'first': int(dates_ms[0]) if dates_ms.size else None,
+                'last': int(dates_ms[-1]) if dates_ms.size else None,
+                'written_at': time.time(),
+            }, f)
+
+        # Swap directories; open memory maps keep the replaced files alive
+        old = f"{target}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(target):
+            os.replace(target, old)
+        os.replace(tmp, target)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def write_dataframe(self, df, pair, timeframe, candle_type='spot'):
+        from datafiles import dates_ms
+
+        self.write(pair, timeframe, dates_ms(df), {c: df[c].to_numpy() for c in VALUE_COLUMNS},
+                   candle_type)
+
+    def meta(self, pair, timeframe, candle_type='spot'):
+        with open(os.path.join(self.path(pair, timeframe, candle_type), 'meta.json')) as f:
+            return json.load(f)
+
+    def load(self, pair, timeframe, timerange=None, startup_candles=0, columns=None, candle_type='spot'):
+        """
+        Zero-copy views of the stored arrays within `timerange`.
+
+        :param timerange: 'YYYYMMDD-YYYYMMDD' string or (start_ms, end_ms), end exclusive
+        :param startup_candles: Extra candles before the start, for indicator warm-up
+        :return: dict of read-only arrays keyed by column ('date' in epoch ms)
+        """
+        path = self.path(pair, timeframe, candle_type)
+        dates = np.load(os.path.join(path, 'date.npy'), mmap_mode='r')
+
+        start_ms, end_ms = parse_timerange(timerange) if isinstance(timerange, str) or timerange is None \
+            else timerange
+        lo = int(np.searchsorted(dates, start_ms, side='left')) if start_ms is not None else 0
+        hi = int(np.searchsorted(dates, end_ms, side='left')) if end_ms is not None else dates.size
+        lo = max(0, lo - startup_candles)
+
+        out = {'date': dates[lo:hi]}
+        for column in columns or VALUE_COLUMNS:
+            out[column] = np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')[lo:hi]
+        return out
+
+    def load_dataframe(self, pair, timeframe, timerange=None, startup_candles=0, candle_type='spot'):
+        """
+        `load` as a DataFrame in Freqtrade's layout. Value columns are not
+        copied; only the date column is converted.
+        """
+        import pandas as pd
+
+        arrays = self.load(pair, timeframe, timerange, startup_candles, candle_type=candle_type)
+        arrays['date'] = pd.to_datetime(np.asarray(arrays['date']), unit='ms', utc=True)
+        return pd.DataFrame(arrays, copy=False)
+
+
+def main():
+    from pipeline import DataContext
+
+    parser = argparse.ArgumentParser(description="Build the columnar OHLCV store from Freqtrade data files")
+    parser.add_argument('--config', default='../user_data/config.json')
+    parser.add_argument('--user-data-dir', default='../user_data')
+    parser.add_argument('--pairs', nargs='+', help="Defaults to the config whitelist")
+    parser.add_argument('--timeframes', nargs='+', required=True)
+    args = parser.parse_args()
+
+    context = DataContext(args.config, args.user_data_dir)
+    store = ColumnarStore(context.columnar_dir)
+    for pair in args.pairs or context.whitelist:
+        for timeframe in args.timeframes:
+            df = context.load(pair, timeframe)
+            if df is None or df.empty:
+                print(f"No {timeframe} data for {pair}")
+                continue
+            store.write_dataframe(df, pair, timeframe, context.candle_type)
+            print(f"{pair} {timeframe}: {len(df)} candles -> {store.path(pair, timeframe, context.candle_type)}")
+
+
+if __name__ == "__main__":
+    main()
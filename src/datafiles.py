@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Access to the OHLCV files Freqtrade keeps in user_data/data.
+
+Mirrors Freqtrade's file naming (`BTC_USDT-5m.feather`,
+`futures/BTC_USDT_USDT-1h-futures.feather`) so pipeline stages in the
+listener can read and write candles without importing Freqtrade. pandas
+is only needed by the functions that load or store data.
+"""
+import json
+import os
+
+OHLCV_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+EXTENSIONS = {
+    'feather': 'feather',
+    'parquet': 'parquet',
+    'json': 'json',
+    'jsongz': 'json.gz',
+}
+
+
+def load_freqtrade_config(config_path):
+    with open(config_path) as f:
+        return json.load(f)
+
+
+def exchange_datadir(user_data_dir, config):
+    """
+    user_data/data/<exchange>, the default Freqtrade datadir
+    """
+    if config.get('datadir'):
+        return config['datadir']
+    return os.path.join(user_data_dir, 'data', config['exchange']['name'].lower())
+
+
+def pair_to_filename(pair):
+    for ch in ['/', ' ', '.', '@', '$', '+', ':']:
+        pair = pair.replace(ch, '_')
+    return pair
+
+
+def ohlcv_path(datadir, pair, timeframe, data_format='feather', candle_type='spot'):
+    filename = f"{pair_to_filename(pair)}-{timeframe}"
+    if candle_type != 'spot':
+        datadir = os.path.join(datadir, 'futures')
+        filename = f"{filename}-{candle_type}"
+    return os.path.join(datadir, f"{filename}.{EXTENSIONS[data_format]}")
+
+
+def load_ohlcv(path, data_format='feather'):
+    """
+    Stored candles as a DataFrame with a UTC `date` column, None if missing
+    """
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return None
+    if data_format == 'feather':
+        df = pd.read_feather(path)
+    elif data_format == 'parquet':
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_json(path, orient='values', compression='infer')
+        df.columns = OHLCV_COLUMNS
+        df['date'] = pd.to_datetime(df['date'], unit='ms', utc=True)
+    return df
+
+
+def store_ohlcv(df, path, data_format='feather'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = df.reset_index(drop=True).loc[:, OHLCV_COLUMNS]
+    tmp_path = f"{path}.tmp"
+    if data_format == 'feather':
+        df.to_feather(tmp_path, compression_level=9, compression='lz4')
+    elif data_format == 'parquet':
+        df.to_parquet(tmp_path)
+    else:
+        out = df.copy()
+        out['date'] = dates_ms(out)
+        out.to_json(tmp_path, orient='values', compression='gzip' if data_format == 'jsongz' else None)
+    # Readers never see a half-written file
+    os.replace(tmp_path, path)
+
+
+def dates_ms(df):
+    """
+    Candle open times of `df` as int64 epoch milliseconds
+    """
+    return df['date'].dt.as_unit('ms').astype('int64').to_numpy()
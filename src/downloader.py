@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Download backends used by update jobs.
+
+ScriptDownloader forks updatedata.sh (and with it a fresh
+`freqtrade download-data` container) for every job. NativeDownloader keeps
+a few long-lived worker processes that import Freqtrade once and hold a
+warm exchange object (markets, ccxt session) between jobs; the pairs of a
+job are split across those workers and downloaded in parallel.
+
+Both take an `UpdateRequest` plus the job log and return the job result,
+raising `JobFailed` on errors. Incremental requests only fetch what
+`ohlcv_gaps` finds missing from the stored candles: the native backend
+fills every gap, the script backend can only move the download window so
+Freqtrade appends the tail instead of re-fetching the whole range.
+"""
+import logging
+import multiprocessing
+import os
+import subprocess
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from jobs import JobFailed
+
+# Same defaults as updatedata.sh when the payload is empty
+DEFAULT_TIMEFRAMES = ['5m', '15m', '30m', '1h', '4h']
+DEFAULT_TIMERANGE = '20260111-'
+
+
+def with_defaults(request):
+    """
+    The request as both backends download it: updatedata.sh's timeframes
+    and timerange for an empty payload, its timeframes when the payload
+    has none (incremental or not)
+    """
+    if not request.to_args():
+        return request.replace(timeframes=DEFAULT_TIMEFRAMES, timerange=DEFAULT_TIMERANGE)
+    if request.timeframes is None:
+        return request.replace(timeframes=DEFAULT_TIMEFRAMES)
+    return request
+
+
+def _window_ms(request):
+    start, end = request.window() or (None, None)
+    return (int(start.timestamp() * 1000) if start else None,
+            int(end.timestamp() * 1000) if end else None)
+
+
+class ScriptDownloader:
+    def __init__(self, script, config_path=None, user_data_dir=None):
+        self.script = script
+        self.config_path = config_path
+        self.user_data_dir = user_data_dir
+
+    def ready(self):
+        if not os.path.exists(self.script):
+            return False, f"Script {self.script} not found"
+        return True, None
+
+    def _incremental_requests(self, request, log):
+        """
+        Starts the window at the newest first-stored candle of the requested
+        pairs, so Freqtrade appends to every file instead of re-downloading
+        it. Pairs without a file for a timeframe are first downloaded on
+        their own, over the requested window. Holes inside stored data can
+        only be reported here.
+
+        :return: list of requests, run in order
+        """
+        import datafiles
+        from ohlcv_gaps import count_missing, find_missing_ranges
+        from pipeline import DataContext
+
+        context = DataContext(self.config_path, self.user_data_dir)
+        timeframes = request.timeframes
+        start_ms, end_ms = _window_ms(request)
+
+        first_stored = []
+        missing = {}
+        for pair in context.pairs(request):
+            for timeframe in timeframes:
+                data = context.load(pair, timeframe)
+                if data is None or data.empty:
+                    missing.setdefault(timeframe, []).append(pair)
+                    continue
+                dates = datafiles.dates_ms(data)
+                first_stored.append(int(dates[0]))
+                ranges = find_missing_ranges(dates, timeframe, max(start_ms or 0, int(dates[0])), end_ms)
+                holes = [r for r in ranges if r[1] <= dates[-1]]
+                if holes:
+                    log.write(f"{pair} {timeframe}: {count_missing(holes, timeframe)} candles missing "
+                              f"in {len(holes)} gaps, use the native backend to fill them")
+
+        if not first_stored:
+            return [request]
+        requests = [request.replace(pairs=pairs, timeframes=[timeframe]) for timeframe, pairs in missing.items()]
+        start = max(first_stored + [start_ms or 0])
+        start = datetime.fromtimestamp(start / 1000, tz=timezone.utc)
+        timerange = f"{start:%Y%m%d}-" + (request.timerange.split('-')[1] if request.timerange else '')
+        return requests + [request.replace(days=None, timerange=timerange)]
+
+    def download(self, request, log):
+        request = with_defaults(request)
+        requests = self._incremental_requests(request, log) if request.incremental else [request]
+        for step in requests:
+            cmd = [self.script] + step.to_args()
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors='replace'
+            )
+            for line in process.stdout:
+                log.write(line)
+            returncode = process.wait()
+
+            if returncode != 0:
+                raise JobFailed("Script execution failed", returncode=returncode)
+        return {
+            "message": "Update executed",
+            "returncode": returncode
+        }
+
+
+class _QueueLogHandler(logging.Handler):
+    """
+    Forwards worker log records to the listener, tagged with the running task
+    """
+
+    def __init__(self, outbox):
+        super().__init__()
+        self.outbox = outbox
+        self.task_id = None
+
+    def emit(self, record):
+        if self.task_id is not None:
+            self.outbox.put(('log', self.task_id, self.format(record)))
+
+
+def _worker_main(config_path, user_data_dir, inbox, outbox):
+    """
+    Worker process: loads Freqtrade and the exchange once, then serves tasks
+    """
+    log_handler = _QueueLogHandler(outbox)
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logging.getLogger().addHandler(log_handler)
+    logging.getLogger().setLevel(logging.INFO)
+
+    from freqtrade.configuration import Configuration, TimeRange
+    from freqtrade.data.history import refresh_backtest_ohlcv_data
+    from freqtrade.enums import RunMode
+    from freqtrade.plugins.pairlist.pairlist_helpers import expand_pairlist
+    from freqtrade.resolvers import ExchangeResolver
+
+    config = Configuration({'config': [config_path], 'user_data_dir': user_data_dir},
+                           RunMode.UTIL_EXCHANGE).get_config()
+    if 'datadir' not in config:
+        from freqtrade.configuration.directory_operations import create_datadir
+        config['datadir'] = create_datadir(config, None)
+    exchange = ExchangeResolver.load_exchange(config, validate=False)
+    outbox.put(('ready', None, os.getpid()))
+
+    while True:
+        task = inbox.get()
+        if task is None:
+            break
+        task_id, kind, request = task
+        log_handler.task_id = task_id
+        try:
+            # Cheap when markets are still fresh, keeps long-lived workers current
+            exchange.reload_markets()
+            pairs = expand_pairlist(request['pairs'] or config['exchange']['pair_whitelist'],
+                                    list(exchange.markets))
+            if kind == 'expand':
+                outbox.put(('done', task_id, {'pairs': pairs}))
+                continue
+
+            timerange = None
+            if request['days'] is not None:
+                start = datetime.now(timezone.utc) - timedelta(days=request['days'])
+                timerange = TimeRange.parse_timerange(f"{start:%Y%m%d}-")
+            if request['timerange'] is not None:
+                timerange = TimeRange.parse_timerange(request['timerange'])
+
+            if request['incremental']:
+                result = _download_incremental(exchange, config, pairs, request['timeframes'], timerange)
+                outbox.put(('done', task_id, result))
+                continue
+
+            pairs_not_available = refresh_backtest_ohlcv_data(
+                exchange,
+                pairs=pairs,
+                timeframes=request['timeframes'],
+                datadir=config['datadir'],
+                timerange=timerange,
+                new_pairs_days=config.get('new_pairs_days', 30),
+                erase=False,
+                data_format=config.get('dataformat_ohlcv', 'feather'),
+                trading_mode=config.get('trading_mode', 'spot'),
+            )
+            outbox.put(('done', task_id, {'pairs': pairs, 'pairs_not_available': list(pairs_not_available)}))
+        except Exception as e:
+            logging.getLogger(__name__).exception("Download failed")
+            outbox.put(('error', task_id, str(e)))
+        finally:
+            log_handler.task_id = None
+
+
+def _download_incremental(exchange, config, pairs, timeframes, timerange):
+    """
+    Fetches only the candle ranges missing from the stored files, then
+    merges them in. Runs inside a worker process.
+    """
+    import pandas as pd
+    from freqtrade.data.converter import clean_ohlcv_dataframe, ohlcv_to_dataframe
+    import datafiles
+    from ohlcv_gaps import find_missing_ranges
+    from freqtrade.data.history import get_datahandler
+    from freqtrade.enums import CandleType
+
+    logger = logging.getLogger(__name__)
+    candle_type = CandleType.get_default(config.get('trading_mode', 'spot'))
+    data_handler = get_datahandler(config['datadir'], config.get('dataformat_ohlcv', 'feather'))
+    start_ms = timerange.startts * 1000 if timerange and timerange.starttype == 'date' else None
+    end_ms = timerange.stopts * 1000 if timerange and timerange.stoptype == 'date' else None
+    new_pairs_start_ms = int((datetime.now(timezone.utc)
+                              - timedelta(days=config.get('new_pairs_days', 30))).timestamp() * 1000)
+
+    fetched = 0
+    for pair in pairs:
+        for timeframe in timeframes:
+            data = data_handler.ohlcv_load(pair, timeframe, timerange=None, fill_missing=False,
+                                           drop_incomplete=False, warn_no_data=False,
+                                           candle_type=candle_type)
+            if data.empty:
+                ranges = [(start_ms or new_pairs_start_ms, end_ms)]
+            else:
+                ranges = find_missing_ranges(datafiles.dates_ms(data), timeframe, start_ms, end_ms)
+            if not ranges:
+                logger.info(f"{pair} {timeframe}: up to date")
+                continue
+
+            chunks = [data]
+            for since_ms, until_ms in ranges:
+                new = exchange.get_historic_ohlcv(pair, timeframe, since_ms=since_ms, candle_type=candle_type,
+                                                  is_new_pair=data.empty, until_ms=until_ms)
+                if isinstance(new, list):
+                    new = ohlcv_to_dataframe(new, timeframe, pair, fill_missing=False, drop_incomplete=True)
+                fetched += len(new)
+                chunks.append(new)
+            logger.info(f"{pair} {timeframe}: fetched {sum(len(c) for c in chunks[1:])} candles "
+                        f"in {len(ranges)} missing ranges")
+
+            merged = clean_ohlcv_dataframe(pd.concat(chunks, ignore_index=True), timeframe, pair,
+                                           fill_missing=False, drop_incomplete=False)
+            data_handler.ohlcv_store(pair, timeframe, data=merged, candle_type=candle_type)
+
+    return {
+        'pairs': pairs,
+        'pairs_not_available': [],
+        'candles_fetched': fetched,
+    }
+
+
+class _Task:
+    def __init__(self, log):
+        self.id = uuid.uuid4().hex[:12]
+        self.log = log
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class NativeDownloader:
+    """
+    Runs downloads in `workers` long-lived Freqtrade processes.
+
+    Each worker keeps its exchange connection and market data across jobs,
+    so an update only pays for the candles it fetches.
+    """
+
+    def __init__(self, config_path, user_data_dir, workers=2):
+        self.config_path = config_path
+        self.user_data_dir = user_data_dir
+        self.workers = workers
+        # spawn: the listener is multi-threaded, never fork it
+        self._ctx = multiprocessing.get_context('spawn')
+        self._outbox = self._ctx.Queue()
+        self._processes = []
+        self._inboxes = []
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            self._inboxes.append(self._ctx.Queue())
+            self._processes.append(None)
+            self._spawn(i)
+        threading.Thread(target=self._dispatch, name="native-downloader", daemon=True).start()
+
+    def stop(self):
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+
+    def _spawn(self, i):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.config_path, self.user_data_dir, self._inboxes[i], self._outbox),
+            name=f"native-downloader-{i}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[i] = process
+
+    def ready(self):
+        if not os.path.exists(self.config_path):
+            return False, f"Freqtrade config {self.config_path} not found"
+        return True, None
+
+    def _dispatch(self):
+        while True:
+            kind, task_id, payload = self._outbox.get()
+            if kind == 'ready':
+                print(f"Native downloader worker ready (pid {payload})")
+                continue
+            with self._lock:
+                task = self._tasks.get(task_id)
+            if task is None:
+                continue
+            if kind == 'log':
+                task.log.write(payload)
+            elif kind == 'done':
+                task.result = payload
+                task.done.set()
+            elif kind == 'error':
+                task.error = payload
+                task.done.set()
+
+    def _run(self, i, kind, request, log):
+        task = _Task(log)
+        with self._lock:
+            self._tasks[task.id] = task
+        self._inboxes[i].put((task.id, kind, request))
+        return task
+
+    def _wait(self, i, task):
+        try:
+            while not task.done.wait(timeout=1):
+                if not self._processes[i].is_alive():
+                    # Replace the dead worker; its task is lost
+                    exitcode = self._processes[i].exitcode
+                    self._spawn(i)
+                    raise JobFailed("Downloader worker died", exitcode=exitcode)
+            if task.error is not None:
+                raise JobFailed("Download failed", error=task.error)
+            return task.result
+        finally:
+            with self._lock:
+                self._tasks.pop(task.id, None)
+
+    def download(self, request, log):
+        request = with_defaults(request)
+        spec = {
+            'pairs': list(request.pairs) if request.pairs is not None else None,
+            'timeframes': list(request.timeframes),
+            'days': request.days,
+            'timerange': request.timerange,
+            'incremental': request.incremental,
+        }
+        log.write(f"Native download{' (incremental)' if request.incremental else ''}: "
+                  f"{' '.join(request.to_args())}")
+
+        # Resolve the pairlist once, then shard it across the workers
+        pairs = self._wait(0, self._run(0, 'expand', spec, log))['pairs']
+        shards = [pairs[i::self.workers] for i in range(self.workers)]
+        tasks = [(i, self._run(i, 'download', dict(spec, pairs=shard), log))
+                 for i, shard in enumerate(shards) if shard]
+
+        results = []
+        errors = []
+        for i, task in tasks:
+            try:
+                results.append(self._wait(i, task))
+            except JobFailed as e:
+                errors.append(e.details.get('error', str(e)))
+        if errors:
+            raise JobFailed("Download failed", errors=errors)
+
+        result = {
+            "message": "Update executed",
+            "pairs": pairs,
+            "pairs_not_available": [p for r in results for p in r['pairs_not_available']],
+        }
+        if request.incremental:
+            result["candles_fetched"] = sum(r['candles_fetched'] for r in results)
+        return result
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Client for the Freqtrade REST API (api_server), for control actions.
+
+Keeps a small pool of keep-alive HTTP connections to the bot and caches
+the JWT access token (refreshed before it expires, with a new login when
+the refresh token is rejected), so an action costs one request on an open
+connection instead of a TCP connect, a login and the call.
+
+The URL and credentials come from the `api_server` section of the
+Freqtrade config; FREQTRADE_API_URL, FREQTRADE_API_USERNAME and
+FREQTRADE_API_PASSWORD override them (the bot runs in docker and publishes
+port 8080 on the host).
+"""
+import base64
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+API_PREFIX = "/api/v1"
+TIMEOUT = 5.0
+POOL_SIZE = 4
+# Tokens are renewed this long before they expire
+TOKEN_MARGIN = 30
+# Freqtrade access tokens last 15 minutes
+DEFAULT_TOKEN_LIFETIME = 15 * 60
+
+
+class RpcError(Exception):
+    """Raised when the Freqtrade API answers with an error or cannot be reached."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def _token_expiry(token):
+    """
+    `exp` claim of a JWT (not verified: only used to renew it in time)
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + DEFAULT_TOKEN_LIFETIME
+
+
+class FreqtradeClient:
+    def __init__(self, url, username, password, timeout=TIMEOUT, pool_size=POOL_SIZE):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._auth_lock = threading.Lock()
+        self._access_token = None
+        self._access_expires = 0.0
+        self._refresh_token = None
+
+    @classmethod
+    def from_config(cls, config_path, **kwargs):
+        """
+        Client for the api_server of a Freqtrade config (environment
+        variables take precedence)
+        """
+        settings = {}
+        try:
+            with open(config_path) as f:
+                settings = json.load(f).get('api_server', {})
+        except (OSError, ValueError):
+            pass
+        port = settings.get('listen_port', 8080)
+        url = os.environ.get('FREQTRADE_API_URL', f"http://127.0.0.1:{port}")
+        username = os.environ.get('FREQTRADE_API_USERNAME', settings.get('username', ''))
+        password = os.environ.get('FREQTRADE_API_PASSWORD', settings.get('password', ''))
+        return cls(url, username, password, **kwargs)
+
+    def _connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _send(self, method, path, payload=None, headers=None):
+        """
+        One request on a pooled connection.
+
+        :return: (status, decoded JSON body or None)
+        """
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Accept': 'application/json', **(headers or {})}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        try:
+            connection, reused = self._pool.get_nowait(), True
+        except queue.Empty:
+            connection, reused = self._connect(), False
+        while True:
+            sent = False
+            try:
+                connection.request(method, API_PREFIX + path, body=body, headers=headers)
+                sent = True
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                # Retried on a new connection only when the server closed the idle
+                # keep-alive one before taking the request: a timeout or an error
+                # after sending may have run it already (force_exit must not run twice)
+                stale = not sent or isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError))
+                if not reused or not stale:
+                    raise RpcError(f"Freqtrade API at {self.url} unreachable: {e}")
+                connection, reused = self._connect(), False
+
+        if response.will_close:
+            connection.close()
+        else:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, {'detail': data.decode('utf-8', 'replace')}
+
+    def _token(self):
+        """
+        Valid access token: cached, refreshed or from a new login
+        """
+        with self._auth_lock:
+            if self._access_token and time.time() < self._access_expires - TOKEN_MARGIN:
+                return self._access_token
+            data = None
+            if self._refresh_token:
+                status, data = self._send('POST', '/token/refresh',
+                                          headers={'Authorization': f"Bearer {self._refresh_token}"})
+                if status != 200:
+                    data = None
+            if data is None:
+                credentials = base64.b64encode(f"{self.username}:{self.password}".encode('utf-8')).decode('ascii')
+                status, data = self._send('POST', '/token/login', headers={'Authorization': f"Basic {credentials}"})
+                if status != 200:
+                    raise RpcError(f"Freqtrade API login failed ({status}): {data}", status)
+                self._refresh_token = data.get('refresh_token')
+            self._access_token = data['access_token']
+            self._access_expires = _token_expiry(self._access_token)
+            return self._access_token
+
+    def _forget_token(self, token):
+        with self._auth_lock:
+            if self._access_token == token:
+                self._access_token = None
+
+    def call(self, method, path, payload=None):
+        """
+        Authenticated API call, e.g. `call('POST', '/forceexit', {'tradeid': 'all'})`
+        """
+        token = self._token()
+        status, data = self._send(method, path, payload, {'Authorization': f"Bearer {token}"})
+        if status == 401:
+            # Token revoked or the bot restarted with a new secret
+            self._forget_token(token)
+            token = self._token()
+            status, data = self._send(method, path, payload, {'Authorization': f"Bearer {token}"})
+        if status >= 400:
+            raise RpcError(f"{method} {path} failed ({status}): {data}", status)
+        return data
+
+    def warm(self):
+        """
+        Logs in and opens a connection ahead of the first action
+        """
+        self._token()
+
+    def ping(self):
+        """
+        Unauthenticated round trip, keeps a pooled connection open
+        """
+        status, data = self._send('GET', '/ping')
+        if status != 200:
+            raise RpcError(f"GET /ping failed ({status}): {data}", status)
+        return data
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def force_exit(self, trade_id='all', ordertype=None):
+        payload = {'tradeid': str(trade_id)}
+        if ordertype:
+            payload['ordertype'] = ordertype
+        return self.call('POST', '/forceexit', payload)
+
+    def pause(self):
+        """
+        No new entries, open trades are still managed
+        """
+        try:
+            return self.call('POST', '/pause')
+        except RpcError as e:
+            if e.status != 404:
+                raise
+            # Freqtrade versions before /pause
+            return self.call('POST', '/stopentry')
+
+    def stop(self):
+        return self.call('POST', '/stop')
+
+    def start(self):
+        return self.call('POST', '/start')
+
+
+# Control actions of the listener: name -> call with the payload
+ACTIONS = {
+    'force_exit': lambda client, data: client.force_exit(data.get('trade_id', 'all'), data.get('ordertype')),
+    'pause': lambda client, data: client.pause(),
+    'stop': lambda client, data: client.stop(),
+    'start': lambda client, data: client.start(),
+}
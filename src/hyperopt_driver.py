@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Parallel, resumable hyperopt driver.
+
+Runs the hyperopt epochs of a strategy (TemplateHyperopt,
+WeaponCandleStrategy, ...) with Optuna:
+
+- The candles are loaded and the indicators computed once, before the
+  worker processes are forked, so every worker shares the preloaded data.
+- Every finished epoch is stored in a SQLite study
+  (`user_data/hyperopt_results/<strategy>-<spaces>.sqlite`). Running the
+  same command again resumes an interrupted run up to `--epochs`.
+- Each epoch is first backtested on the start of the timerange (the first
+  third, then two thirds). Epochs whose partial Sharpe ratio falls in the
+  bottom `--prune-percentile` of the previous epochs at the same point are
+  stopped there.
+
+The best parameters are merged into the strategy's parameter file
+(`<strategy>.json` next to the strategy), as `freqtrade hyperopt` does, so
+the next space optimizes on top of them:
+
+    python hyperopt_driver.py --strategy WeaponCandleStrategy --spaces buy -e 200 -j 4
+    python hyperopt_driver.py --strategy WeaponCandleStrategy --spaces sell -e 200 -j 4
+    python hyperopt_driver.py --strategy WeaponCandleStrategy --spaces roi stoploss -e 100 -j 4
+
+Needs Freqtrade and Optuna installed (like the native downloader); worker
+processes are forked, so it runs on Linux (or inside the Freqtrade image).
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fractions of the timerange backtested before the full run, for pruning
+PRUNING_STEPS = (1 / 3, 2 / 3)
+# Epochs run to completion before pruning starts
+STARTUP_EPOCHS = 10
+# Failed epochs in a row after which a worker gives up: failed epochs do not
+# count towards --epochs, so a deterministic error (strategy exception, bad
+# parameter) would otherwise fail every epoch forever
+MAX_CONSECUTIVE_FAILURES = 5
+
+# As SharpeHyperOptLoss
+SLIPPAGE_PER_TRADE = 0.0005
+NO_TRADES_SHARPE = -20.0
+
+# The evaluator of this process, inherited by the forked workers
+_evaluator = None
+
+
+def sharpe_ratio(results, min_date, max_date):
+    """
+    Sharpe ratio of a backtest, computed like Freqtrade's SharpeHyperOptLoss
+    """
+    profits = results['profit_ratio'] - SLIPPAGE_PER_TRADE
+    days = max((max_date - min_date).days, 1)
+    deviation = np.std(profits)
+    if len(profits) == 0 or deviation == 0:
+        return NO_TRADES_SHARPE
+    return float(profits.sum() / days / deviation * np.sqrt(365))
+
+
+class ParameterSpace:
+    """
+    Optuna suggestions for the strategy parameters of the chosen spaces,
+    plus Freqtrade's default ROI and stoploss spaces
+    """
+
+    def __init__(self, strategy, spaces, timeframe_minutes):
+        self.spaces = spaces
+        self.parameters = {
+            space: [(name, parameter) for name, parameter in strategy.enumerate_parameters(space)
+                    if parameter.optimize]
+            for space in spaces if space not in ('roi', 'stoploss')
+        }
+        # ROI time steps scale with the timeframe, as in Freqtrade's default roi_space
+        self.roi_scale = timeframe_minutes / 5
+
+    def suggest(self, trial):
+        """
+        :return: dict space -> parameter values, in the layout of Freqtrade's
+                 strategy parameter files
+        """
+        params = {}
+        for space, parameters in self.parameters.items():
+            params[space] = {name: self._suggest(trial, name, parameter) for name, parameter in parameters}
+        if 'roi' in self.spaces:
+            params['roi'] = self._roi_table(trial)
+        if 'stoploss' in self.spaces:
+            params['stoploss'] = {'stoploss': trial.suggest_float('stoploss', -0.35, -0.02, step=0.001)}
+        return params
+
+    @staticmethod
+    def _suggest(trial, name, parameter):
+        from freqtrade.strategy import CategoricalParameter, DecimalParameter, IntParameter
+
+        if isinstance(parameter, CategoricalParameter):  # BooleanParameter included
+            return trial.suggest_categorical(name, list(parameter.opt_range))
+        if isinstance(parameter, IntParameter):
+            return trial.suggest_int(name, parameter.low, parameter.high)
+        if isinstance(parameter, DecimalParameter):
+            return trial.suggest_float(name, parameter.low, parameter.high, step=10 ** -parameter.decimals)
+        return trial.suggest_float(name, parameter.low, parameter.high)
+
+    def _roi_table(self, trial):
+        t1 = trial.suggest_int('roi_t1', int(10 * self.roi_scale), int(120 * self.roi_scale))
+        t2 = trial.suggest_int('roi_t2', int(10 * self.roi_scale), int(60 * self.roi_scale))
+        t3 = trial.suggest_int('roi_t3', int(10 * self.roi_scale), int(40 * self.roi_scale))
+        p1 = trial.suggest_float('roi_p1', 0.01, 0.04, step=0.001)
+        p2 = trial.suggest_float('roi_p2', 0.01, 0.07, step=0.001)
+        p3 = trial.suggest_float('roi_p3', 0.01, 0.20, step=0.001)
+        return {
+            '0': round(p1 + p2 + p3, 3),
+            str(t3): round(p1 + p2, 3),
+            str(t3 + t2): round(p1, 3),
+            str(t3 + t2 + t1): 0,
+        }
+
+    @staticmethod
+    def apply(strategy, params):
+        for space, values in params.items():
+            if space == 'roi':
+                strategy.minimal_roi = {int(minutes): roi for minutes, roi in values.items()}
+            elif space == 'stoploss':
+                strategy.stoploss = values['stoploss']
+            else:
+                for name, value in values.items():
+                    getattr(strategy, name).value = value
+
+
+class Evaluator:
+    """
+    Backtesting with the candles and indicators loaded once; called by
+    Optuna with one trial per epoch
+    """
+
+    def __init__(self, config, spaces):
+        from freqtrade.exchange import timeframe_to_minutes
+        from freqtrade.optimize.backtesting import Backtesting
+
+        self.backtesting = Backtesting(config)
+        self.backtesting._set_strategy(self.backtesting.strategylist[0])
+        self.strategy = self.backtesting.strategy
+        self.strategy.ft_bot_start()
+
+        data, self.timerange = self.backtesting.load_bt_data()
+        # As `freqtrade hyperopt --analyze-per-epoch`: for strategies whose
+        # indicators depend on the hyperopt parameters
+        self.analyze_per_epoch = config.get('analyze_per_epoch', False)
+        self.data = data if self.analyze_per_epoch else None
+        self.processed = self._analyze(data)
+        self.space = ParameterSpace(self.strategy, spaces, timeframe_to_minutes(self.strategy.timeframe))
+        logger.info(f"Loaded {len(self.processed)} pairs, {self.min_date} - {self.max_date}")
+
+    def _analyze(self, data):
+        """
+        :return: the indicators including the startup candles; as in
+                 Freqtrade's hyperopt, the trimmed frames only give the
+                 dates, Backtesting.backtest() trims the startup itself
+        """
+        from freqtrade.data.converter import trim_dataframes
+        from freqtrade.data.history import get_timerange
+
+        preprocessed = self.strategy.advise_all_indicators(data)
+        trimmed = trim_dataframes(preprocessed, self.timerange, self.backtesting.required_startup)
+        self.min_date, self.max_date = get_timerange(trimmed)
+        return preprocessed
+
+    def backtest(self, end_date):
+        # A new dict every run: backtest() stores its trimmed frames in it
+        if end_date < self.max_date:
+            processed = {pair: df[df['date'] < end_date] for pair, df in self.processed.items()}
+        else:
+            processed = dict(self.processed)
+        results = self.backtesting.backtest(processed=processed, start_date=self.min_date, end_date=end_date)
+        return sharpe_ratio(results['results'], self.min_date, end_date)
+
+    def __call__(self, trial):
+        import optuna
+
+        params = self.space.suggest(trial)
+        self.space.apply(self.strategy, params)
+        trial.set_user_attr('params', params)
+        if self.analyze_per_epoch:
+            self.processed = self._analyze(self.data)
+
+        span = self.max_date - self.min_date
+        for step, fraction in enumerate(PRUNING_STEPS):
+            trial.report(self.backtest(self.min_date + span * fraction), step)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+        return self.backtest(self.max_date)
+
+
+def open_study(storage_url, study_name, prune_percentile, seed=None, create=False):
+    import optuna
+
+    storage = optuna.storages.RDBStorage(
+        storage_url,
+        # Workers share one SQLite file; epochs of a killed run are failed on resume
+        engine_kwargs={'connect_args': {'timeout': 60}},
+        heartbeat_interval=60,
+        grace_period=300,
+    )
+    pruner = optuna.pruners.PercentilePruner(prune_percentile, n_startup_trials=STARTUP_EPOCHS)
+    sampler = optuna.samplers.TPESampler(seed=seed)
+    if create:
+        return optuna.create_study(study_name=study_name, storage=storage, direction='maximize',
+                                   sampler=sampler, pruner=pruner, load_if_exists=True)
+    return optuna.load_study(study_name=study_name, storage=storage, sampler=sampler, pruner=pruner)
+
+
+def finished_epochs(study):
+    from optuna.trial import TrialState
+
+    return len(study.get_trials(deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED)))
+
+
+class StopOnFailures:
+    """
+    Optuna callback: stops the worker after `limit` failed epochs in a row
+    """
+
+    def __init__(self, limit=MAX_CONSECUTIVE_FAILURES):
+        self.limit = limit
+        self.failures = 0
+
+    def __call__(self, study, trial):
+        from optuna.trial import TrialState
+
+        if trial.state != TrialState.FAIL:
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= self.limit:
+            # Optuna logged each epoch's exception
+            logger.error(f"{self.failures} epochs failed in a row, stopping this worker")
+            study.stop()
+
+
+def run_worker(storage_url, study_name, prune_percentile, epochs, seed):
+    """
+    Worker process: runs epochs until the study has `epochs` finished ones,
+    or until MAX_CONSECUTIVE_FAILURES epochs fail in a row
+    """
+    from optuna.study import MaxTrialsCallback
+    from optuna.trial import TrialState
+
+    study = open_study(storage_url, study_name, prune_percentile, seed)
+    study.optimize(
+        _evaluator,
+        callbacks=[MaxTrialsCallback(epochs, states=(TrialState.COMPLETE, TrialState.PRUNED)), StopOnFailures()],
+        catch=(Exception,),
+    )
+
+
+def export_params(strategy, params, sharpe):
+    """
+    Merges the best parameters into the strategy's parameter file
+    """
+    path = os.path.splitext(strategy.__file__)[0] + '.json'
+    current = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            current = json.load(f)
+    current.setdefault('params', {}).update(params)
+    current.update({
+        'strategy_name': type(strategy).__name__,
+        'ft_stratparam_v': 1,
+        'export_time': datetime.now(timezone.utc).isoformat(),
+        'sharpe': sharpe,
+    })
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(current, f, indent=4)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    global _evaluator
+    parser = argparse.ArgumentParser(description="Parallel, resumable hyperopt with early pruning")
+    parser.add_argument('--config', default='../user_data/config.json')
+    parser.add_argument('--strategy', required=True)
+    parser.add_argument('--spaces', nargs='+', required=True,
+                        choices=('buy', 'sell', 'protection', 'roi', 'stoploss'))
+    parser.add_argument('-e', '--epochs', type=int, default=100)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--timerange')
+    parser.add_argument('--timeframe')
+    parser.add_argument('--study', help="Study name, defaults to <strategy>-<spaces>")
+    parser.add_argument('--prune-percentile', type=float, default=25.0,
+                        help="Prune epochs below this percentile of the partial Sharpe ratios")
+    parser.add_argument('--analyze-per-epoch', action='store_true',
+                        help="Recompute the indicators every epoch (parameters used in populate_indicators)")
+    parser.add_argument('--random-state', type=int)
+    parser.add_argument('--no-export', action='store_true', help="Do not write the strategy parameter file")
+    args = parser.parse_args()
+    from freqtrade.configuration import Configuration
+    from freqtrade.enums import RunMode
+    from optuna.trial import TrialState
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(levelname)s %(message)s')
+
+    config = Configuration.from_files([args.config])
+    config.update({'strategy': args.strategy, 'runmode': RunMode.HYPEROPT, 'spaces': args.spaces})
+    if args.timerange:
+        config['timerange'] = args.timerange
+    if args.timeframe:
+        config['timeframe'] = args.timeframe
+    if args.analyze_per_epoch:
+        config['analyze_per_epoch'] = True
+
+    results_dir = os.path.join(config['user_data_dir'], 'hyperopt_results')
+    os.makedirs(results_dir, exist_ok=True)
+    study_name = args.study or f"{args.strategy}-{'-'.join(args.spaces)}"
+    storage_url = f"sqlite:///{os.path.abspath(os.path.join(results_dir, study_name))}.sqlite"
+
+    study = open_study(storage_url, study_name, args.prune_percentile, create=True)
+    done = finished_epochs(study)
+    if done >= args.epochs:
+        print(f"{study_name}: {done}/{args.epochs} epochs already finished")
+    else:
+        print(f"{study_name}: {done}/{args.epochs} epochs finished, running the rest with {args.workers} workers")
+        # Loaded before forking: the workers share the candles and indicators
+        _evaluator = Evaluator(config, args.spaces)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=run_worker, name=f"hyperopt-{i}", args=(
+                storage_url, study_name, args.prune_percentile, args.epochs,
+                None if args.random_state is None else args.random_state + i))
+            for i in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            print("Interrupted, run the same command again to resume")
+            for worker in workers:
+                worker.terminate()
+            raise SystemExit(1)
+
+    study = open_study(storage_url, study_name, args.prune_percentile)
+    completed = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    pruned = len(study.get_trials(deepcopy=False, states=(TrialState.PRUNED,)))
+    if finished_epochs(study) < args.epochs:
+        failed = len(study.get_trials(deepcopy=False, states=(TrialState.FAIL,)))
+        print(f"Stopped at {finished_epochs(study)}/{args.epochs} epochs after repeated failures "
+              f"({failed} failed epochs, see the log)")
+    if not completed:
+        print("No completed epochs")
+        return
+    best = study.best_trial
+    print(f"{len(completed)} completed, {pruned} pruned. Best epoch {best.number}: Sharpe {best.value:.4f}")
+    print(json.dumps(best.user_attrs['params'], indent=4))
+    if not args.no_export:
+        strategy = _evaluator.strategy if _evaluator is not None else None
+        if strategy is None:
+            from freqtrade.resolvers import StrategyResolver
+            strategy = StrategyResolver.load_strategy(config)
+        print(f"Parameters written to {export_params(strategy, best.user_attrs['params'], best.value)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Bounded, on-disk output of an update job.
+
+Script output is written line by line to a size-capped log file that is
+rotated once it grows past `max_bytes`. Only the last `tail_lines` lines
+stay in memory, so a job uses the same amount of RAM whether the download
+logs a hundred lines or a hundred megabytes. Readers can follow the log
+while the job is still running.
+"""
+import os
+import threading
+from collections import deque
+
+
+class JobLog:
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=1, tail_lines=200):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._tail = deque(maxlen=tail_lines)
+        self._seq = 0
+        self._file = None
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _backup_paths(self):
+        # Oldest first
+        return [f"{self.path}.{i}" for i in range(self.backups, 0, -1)]
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, line):
+        line = line.rstrip('\n')
+        data = (line + '\n').encode('utf-8', errors='replace')
+        with self._cond:
+            if self._file is not None and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._file = open(self.path, 'wb')
+                self._size = 0
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self._seq += 1
+            self._tail.append((self._seq, line))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._closed = True
+            self._cond.notify_all()
+
+    def remove(self):
+        self.close()
+        for path in self._backup_paths() + [self.path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def tail(self):
+        with self._cond:
+            return [line for _, line in self._tail]
+
+    @property
+    def lines_written(self):
+        return self._seq
+
+    def follow(self, live=True, keepalive=15):
+        """
+        Yields every line still on disk, then (if `live`) new lines as they
+        are written until the log is closed. Yields None after `keepalive`
+        seconds without output so callers can keep connections open.
+        """
+        with self._cond:
+            seen = self._seq
+            sources = []
+            for path in self._backup_paths() + [self.path]:
+                if os.path.exists(path):
+                    # Open handles survive rotation, sizes pin what was written up to `seen`
+                    sources.append((open(path, 'rb'), os.path.getsize(path)))
+
+        for handle, size in sources:
+            with handle:
+                while handle.tell() < size:
+                    line = handle.readline()
+                    if not line:
+                        break
+                    yield line.decode('utf-8', errors='replace').rstrip('\n')
+
+        if not live:
+            return
+
+        while True:
+            with self._cond:
+                if self._seq == seen and not self._closed:
+                    self._cond.wait(timeout=keepalive)
+                lines = [(seq, line) for seq, line in self._tail if seq > seen]
+                closed = self._closed
+                current = self._seq
+            if lines and lines[0][0] > seen + 1:
+                yield f"... {lines[0][0] - seen - 1} lines skipped ..."
+            for _, line in lines:
+                yield line
+            if current == seen and not closed:
+                yield None
+            seen = current
+            if closed and not lines:
+                return
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Bounded job queue for the webhook listener.
+
+Update requests are accepted right away and executed by a small pool of
+worker threads, so a multi-minute download never blocks health checks or
+other webhook calls. Requests asking for candles that a queued or running
+job already fetches are coalesced into that job instead of starting another
+download.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCESS = 'success'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when the update queue cannot take another job."""
+
+
+class JobFailed(Exception):
+    """Raised by a job runner to fail a job with extra result data."""
+
+    def __init__(self, message, **details):
+        super().__init__(message)
+        self.details = details
+
+
+class Job:
+    def __init__(self, spec, payload=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.spec = spec
+        # Payload of every request served by this job, coalesced ones included
+        self.payloads = [payload or {}]
+        self.callers = 1
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.log = None
+        self.done = threading.Event()
+
+    @property
+    def args(self):
+        return self.spec.to_args()
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "args_used": self.args,
+            "callers": self.callers,
+            "payloads": self.payloads,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        if self.log is not None:
+            data["log_lines"] = self.log.lines_written
+            data["log_tail"] = self.log.tail()
+        return data
+
+
+class JobQueue:
+    """
+    Runs jobs on `workers` threads, with at most `maxsize` jobs waiting.
+
+    `runner(job)` does the actual work and returns a JSON-serialisable dict.
+    Raising `JobFailed` marks the job as failed and keeps its details.
+    Finished jobs are kept for lookup until `history` newer ones replace them.
+    `log_factory(job)`, if given, creates the `JobLog` each job writes to.
+    Job specs provide `to_args()`, `covers(other)` and `merge(other)`, see
+    `update_request.UpdateRequest`.
+    """
+
+    def __init__(self, runner, workers=2, maxsize=16, history=100, log_factory=None):
+        self.runner = runner
+        self.log_factory = log_factory
+        self.workers = workers
+        self.history = history
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"update-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, spec, payload=None):
+        """
+        Queues `spec`, or attaches it to a job that already covers it.
+        Returns (job, coalesced).
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == RUNNING and job.spec.covers(spec):
+                    job.payloads.append(payload or {})
+                    job.callers += 1
+                    return job, True
+            for job in self._jobs.values():
+                if job.status == QUEUED:
+                    merged = job.spec.merge(spec)
+                    if merged is not None:
+                        job.spec = merged
+                        job.payloads.append(payload or {})
+                        job.callers += 1
+                        return job, True
+
+            # Only submit() adds to the queue, under this lock: once there is
+            # room the put cannot fail, and no job log is created for nothing
+            if self._queue.full():
+                raise QueueFull(f"Update queue is full ({self._queue.maxsize} jobs waiting)")
+            job = Job(spec, payload)
+            if self.log_factory is not None:
+                job.log = self.log_factory(job)
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+            self._trim()
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _trim(self):
+        # Forget the oldest finished jobs; queued and running ones are always kept
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            job = self._jobs.pop(job_id)
+            if job.log is not None:
+                job.log.remove()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            with self._lock:
+                # From here on the spec is frozen: later requests can only attach
+                job.status = RUNNING
+                job.started_at = time.time()
+            try:
+                job.result = self.runner(job)
+                job.status = SUCCESS
+            except JobFailed as e:
+                job.error = str(e)
+                job.result = e.details
+                job.status = FAILED
+            except Exception as e:
+                print(f"Unexpected error in job {job.id}: {e}")
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                if job.log is not None:
+                    job.log.close()
+                job.done.set()
+                self._queue.task_done()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Gap detection for stored OHLCV candles.
+
+Given the candle open times already on disk, works out which ranges are
+missing from a requested window: history before the first stored candle,
+holes inside the stored data and the tail after the last candle. Only those
+ranges need to be fetched from the exchange.
+"""
+import time
+
+import numpy as np
+
+TIMEFRAME_UNITS_MS = {
+    'm': 60_000,
+    'h': 3_600_000,
+    'd': 86_400_000,
+    'w': 604_800_000,
+}
+
+
+def timeframe_to_ms(timeframe):
+    """
+    '5m' -> 300000
+    """
+    if timeframe[-1:] not in TIMEFRAME_UNITS_MS:
+        raise ValueError(f"Unsupported timeframe {timeframe!r}")
+    return int(timeframe[:-1]) * TIMEFRAME_UNITS_MS[timeframe[-1]]
+
+
+def find_missing_ranges(dates_ms, timeframe, start_ms=None, end_ms=None):
+    """
+    Missing candle ranges as a list of (first_missing_ms, next_present_ms).
+
+    :param dates_ms: Sorted open times (epoch ms) of the stored candles
+    :param timeframe: Candle timeframe, e.g. '5m'
+    :param start_ms: Start of the requested window, None for "from the first
+                     stored candle"
+    :param end_ms: End of the requested window (exclusive), None for now
+    """
+    tf_ms = timeframe_to_ms(timeframe)
+    if end_ms is None:
+        end_ms = int(time.time() * 1000)
+    # Only closed candles can be missing
+    end_ms = end_ms // tf_ms * tf_ms
+
+    dates_ms = np.asarray(dates_ms, dtype=np.int64)
+    if start_ms is not None:
+        start_ms = -(-start_ms // tf_ms) * tf_ms
+        dates_ms = dates_ms[(dates_ms >= start_ms) & (dates_ms < end_ms)]
+    else:
+        dates_ms = dates_ms[dates_ms < end_ms]
+
+    if dates_ms.size == 0:
+        return [(start_ms, end_ms)] if start_ms is not None and start_ms < end_ms else []
+
+    ranges = []
+    if start_ms is not None and dates_ms[0] > start_ms:
+        ranges.append((start_ms, int(dates_ms[0])))
+
+    steps = np.diff(dates_ms)
+    holes = np.flatnonzero(steps > tf_ms)
+    ranges.extend((int(dates_ms[i]) + tf_ms, int(dates_ms[i + 1])) for i in holes)
+
+    tail_start = int(dates_ms[-1]) + tf_ms
+    if tail_start < end_ms:
+        ranges.append((tail_start, end_ms))
+    return ranges
+
+
+def count_missing(ranges, timeframe):
+    tf_ms = timeframe_to_ms(timeframe)
+    return sum((end - start) // tf_ms for start, end in ranges)
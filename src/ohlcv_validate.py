@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Integrity checks for stored OHLCV candles.
+
+One vectorized pass over the arrays of a pair/timeframe finds the problems
+that break the strategies' indicators or Freqtrade's data handling:
+
+- out-of-order rows and duplicated open times
+- open times not aligned to the timeframe
+- missing candles (holes between the first and last stored candle)
+- prices that are missing, not positive, or outside the candle's high/low
+- runs of zero-volume candles long enough to leave a whole rolling volume
+  window at zero (volume_ratio and the rolling VWAP turn into NaN/inf)
+
+`repair_arrays` fixes what can be fixed without inventing candles: rows are
+sorted, duplicates keep the last downloaded row, misaligned and unusable
+rows are dropped, and high/low are widened to contain open/close. Holes and
+zero-volume runs are only reported (Freqtrade fills holes when loading).
+"""
+import numpy as np
+
+from ohlcv_gaps import count_missing, find_missing_ranges, timeframe_to_ms
+from resample import _BUCKET_OFFSET_MS
+
+# Shortest rolling volume window of the strategies (VWAP/volume SMA periods)
+ZERO_VOLUME_RUN = 14
+# Ranges listed per issue in the report, the counts are always complete
+MAX_RANGES = 10
+
+
+def _runs(mask):
+    """
+    (start, end) index pairs, end exclusive, of the True runs of `mask`
+    """
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _date_ranges(dates_ms, starts, ends, tf_ms):
+    return [[int(dates_ms[s]), int(dates_ms[e - 1]) + tf_ms]
+            for s, e in zip(starts[:MAX_RANGES], ends[:MAX_RANGES])]
+
+
+def validate_arrays(dates_ms, open_, high, low, close, volume, timeframe, zero_volume_run=ZERO_VOLUME_RUN):
+    """
+    Integrity issues of one pair/timeframe.
+
+    :return: dict of issue name -> {"count": ..., "ranges": [[start_ms, end_ms], ...]}
+             (ranges where they apply, at most MAX_RANGES), empty when clean
+    """
+    tf_ms = timeframe_to_ms(timeframe)
+    dates_ms = np.asarray(dates_ms, dtype=np.int64)
+    issues = {}
+    if dates_ms.size == 0:
+        return issues
+
+    steps = np.diff(dates_ms)
+    out_of_order = int(np.count_nonzero(steps < 0))
+    if out_of_order:
+        issues['out_of_order'] = {"count": out_of_order}
+        order = np.argsort(dates_ms, kind='stable')
+        dates_ms = dates_ms[order]
+        open_, high, low, close, volume = (np.asarray(a)[order] for a in (open_, high, low, close, volume))
+        steps = np.diff(dates_ms)
+
+    duplicates = int(np.count_nonzero(steps == 0))
+    if duplicates:
+        issues['duplicates'] = {"count": duplicates}
+
+    offset = _BUCKET_OFFSET_MS.get(timeframe[-1], 0)
+    misaligned = int(np.count_nonzero((dates_ms - offset) % tf_ms))
+    if misaligned:
+        issues['misaligned'] = {"count": misaligned}
+
+    # Sorted by now: the distinct open times are the ones after a step
+    distinct = dates_ms[np.concatenate(([True], steps != 0))] if duplicates else dates_ms
+    holes = find_missing_ranges(distinct, timeframe, int(dates_ms[0]), int(dates_ms[-1]) + tf_ms)
+    if holes:
+        issues['missing'] = {"count": count_missing(holes, timeframe), "gaps": len(holes),
+                             "ranges": [list(r) for r in holes[:MAX_RANGES]]}
+
+    open_, high, low, close, volume = (np.asarray(a, dtype=np.float64) for a in (open_, high, low, close, volume))
+    with np.errstate(invalid='ignore'):
+        prices = np.stack((open_, high, low, close))
+        bad_price = ~np.isfinite(prices).all(axis=0) | (prices <= 0).any(axis=0)
+        bad_range = ~bad_price & ((high < np.maximum(open_, close)) | (low > np.minimum(open_, close)))
+        bad_volume = ~np.isfinite(volume) | (volume < 0)
+        zero_volume = volume == 0
+    for name, mask in (('invalid_price', bad_price), ('high_low_range', bad_range), ('invalid_volume', bad_volume)):
+        count = int(np.count_nonzero(mask))
+        if count:
+            starts, ends = _runs(mask)
+            issues[name] = {"count": count, "ranges": _date_ranges(dates_ms, starts, ends, tf_ms)}
+
+    starts, ends = _runs(zero_volume)
+    long_runs = (ends - starts) >= zero_volume_run
+    if long_runs.any():
+        starts, ends = starts[long_runs], ends[long_runs]
+        issues['zero_volume_runs'] = {"count": int(long_runs.sum()), "candles": int((ends - starts).sum()),
+                                      "ranges": _date_ranges(dates_ms, starts, ends, tf_ms)}
+    return issues
+
+
+def repair_arrays(dates_ms, open_, high, low, close, volume, timeframe):
+    """
+    Sorted, deduplicated and aligned candles with usable prices.
+
+    :return: (dict of repaired arrays keyed by OHLCV column, rows dropped)
+    """
+    tf_ms = timeframe_to_ms(timeframe)
+    dates_ms = np.asarray(dates_ms, dtype=np.int64)
+    columns = [np.asarray(a, dtype=np.float64) for a in (open_, high, low, close, volume)]
+
+    # Stable sort, then the last row of each open time: the most recent download
+    order = np.argsort(dates_ms, kind='stable')
+    dates_ms = dates_ms[order]
+    columns = [a[order] for a in columns]
+    keep = np.ones(dates_ms.size, dtype=bool)
+    keep[:-1] = dates_ms[1:] != dates_ms[:-1]
+
+    open_, high, low, close, volume = columns
+    offset = _BUCKET_OFFSET_MS.get(timeframe[-1], 0)
+    with np.errstate(invalid='ignore'):
+        prices = np.stack((open_, high, low, close))
+        keep &= ((dates_ms - offset) % tf_ms == 0)
+        keep &= np.isfinite(prices).all(axis=0) & (prices > 0).all(axis=0)
+        keep &= np.isfinite(volume) & (volume >= 0)
+
+    dates_ms, open_, high, low, close, volume = (a[keep] for a in (dates_ms, open_, high, low, close, volume))
+    high = np.maximum(high, np.maximum(open_, close))
+    low = np.minimum(low, np.minimum(open_, close))
+    return ({'date': dates_ms, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume},
+            int(keep.size - keep.sum()))
+
+
+def validate_ohlcv(df, timeframe, repair=False):
+    """
+    Checks (and optionally repairs) a stored candle DataFrame.
+
+    :return: (report dict, repaired DataFrame or None when unchanged)
+    """
+    import pandas as pd
+
+    import datafiles
+
+    arrays = [df[column].to_numpy() for column in ('open', 'high', 'low', 'close', 'volume')]
+    dates_ms = datafiles.dates_ms(df)
+    issues = validate_arrays(dates_ms, *arrays, timeframe)
+    report = {"rows": len(df), "first": int(dates_ms.min()) if len(df) else None,
+              "last": int(dates_ms.max()) if len(df) else None, "issues": issues}
+    # Holes and zero volume are only reported, nothing to rewrite for them
+    if not repair or not set(issues) - {'missing', 'zero_volume_runs'}:
+        return report, None
+
+    repaired, dropped = repair_arrays(dates_ms, *arrays, timeframe)
+    repaired['date'] = pd.to_datetime(repaired['date'], unit='ms', utc=True)
+    report["repaired"] = {"rows_dropped": dropped}
+    return report, pd.DataFrame(repaired, columns=datafiles.OHLCV_COLUMNS)
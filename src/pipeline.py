@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Post-download stages of an update job.
+
+Stages work on the candle files in the Freqtrade datadir and run in the
+job worker right after the download, writing their progress to the job log.
+"""
+import glob
+import json
+import os
+import threading
+import time
+
+import datafiles
+from columnar_store import ColumnarStore
+from ohlcv_validate import validate_ohlcv
+from resample import resample_ohlcv
+from update_request import RESAMPLE_BASE_TIMEFRAME
+# Latest integrity check of every pair/timeframe, in the datadir
+INTEGRITY_REPORT = 'integrity.json'
+# Update jobs run on several threads, the report is read-modify-write
+_REPORT_LOCK = threading.Lock()
+
+
+class DataContext:
+    """
+    Where and how the Freqtrade config stores candles
+    """
+
+    def __init__(self, config_path, user_data_dir):
+        config = datafiles.load_freqtrade_config(config_path)
+        self.datadir = datafiles.exchange_datadir(user_data_dir, config)
+        self.columnar_dir = os.path.join(self.datadir, 'columnar')
+        self.data_format = config.get('dataformat_ohlcv', 'feather')
+        self.candle_type = 'futures' if config.get('trading_mode') == 'futures' else 'spot'
+        # Regex entries need the exchange markets to expand, only plain pairs are usable here
+        self.whitelist = [p for p in config['exchange'].get('pair_whitelist', [])
+                          if not any(ch in p for ch in '*+?[(')]
+
+    def pairs(self, request):
+        return list(request.pairs) if request.pairs is not None else self.whitelist
+
+    def path(self, pair, timeframe):
+        return datafiles.ohlcv_path(self.datadir, pair, timeframe, self.data_format, self.candle_type)
+
+    def stored_timeframes(self, pair):
+        suffix = f".{datafiles.EXTENSIONS[self.data_format]}"
+        if self.candle_type != 'spot':
+            suffix = f"-{self.candle_type}{suffix}"
+        prefix = os.path.basename(self.path(pair, 'TF')).split('-TF')[0] + '-'
+        pattern = os.path.join(os.path.dirname(self.path(pair, 'TF')), f"{prefix}*{suffix}")
+        return sorted(os.path.basename(p)[len(prefix):-len(suffix)] for p in glob.glob(pattern))
+
+    def load(self, pair, timeframe):
+        return datafiles.load_ohlcv(self.path(pair, timeframe), self.data_format)
+
+    def store(self, df, pair, timeframe):
+        datafiles.store_ohlcv(df, self.path(pair, timeframe), self.data_format)
+
+
+def resample_stage(request, context, log):
+    """
+    Rebuilds the `request.resample` timeframes of every pair from the base
+    timeframe files
+    """
+    started = time.time()
+    written = {}
+    for pair in context.pairs(request):
+        base = context.load(pair, RESAMPLE_BASE_TIMEFRAME)
+        if base is None or base.empty:
+            log.write(f"Resample: no {RESAMPLE_BASE_TIMEFRAME} data for {pair}, skipped")
+            continue
+        for timeframe in request.resample:
+            df, dropped = resample_ohlcv(base, RESAMPLE_BASE_TIMEFRAME, timeframe)
+            context.store(df, pair, timeframe)
+            written[f"{pair} {timeframe}"] = len(df)
+            log.write(f"Resample: {pair} {RESAMPLE_BASE_TIMEFRAME} -> {timeframe}: {len(df)} candles, "
+                      f"{dropped} partial dropped")
+    return {"files": written, "seconds": round(time.time() - started, 3)}
+
+
+def validate_stage(request, context, log):
+    """
+    Checks the candle files touched by the request, repairing them with
+    `"validate": "repair"`, and updates the integrity report
+    """
+    started = time.time()
+    repair = request.validate == 'repair'
+    reports = {}
+    for pair in context.pairs(request):
+        for timeframe in request.timeframes or context.stored_timeframes(pair):
+            df = context.load(pair, timeframe)
+            if df is None or df.empty:
+                continue
+            report, repaired = validate_ohlcv(df, timeframe, repair=repair)
+            if repaired is not None:
+                context.store(repaired, pair, timeframe)
+            report["checked_at"] = int(started)
+            reports[f"{pair} {timeframe}"] = report
+            if report["issues"]:
+                summary = ", ".join(f"{name} {issue['count']}" for name, issue in report["issues"].items())
+                log.write(f"Validate: {pair} {timeframe}: {summary}"
+                          + (f", repaired ({report['repaired']['rows_dropped']} rows dropped)"
+                             if "repaired" in report else ""))
+
+    path = os.path.join(context.datadir, INTEGRITY_REPORT)
+    with _REPORT_LOCK:
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        stored.update(reports)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(stored, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    failing = {name: report for name, report in reports.items() if report["issues"]}
+    log.write(f"Validate: {len(reports)} pair/timeframes checked, {len(failing)} with issues, report in {path}")
+    return {"checked": len(reports), "issues": failing, "report": path,
+            "seconds": round(time.time() - started, 3)}
+
+
+def columnar_stage(request, context, log):
+    """
+    Mirrors the candle files touched by the request into the columnar store
+    """
+    started = time.time()
+    store = ColumnarStore(context.columnar_dir)
+    written = {}
+    for pair in context.pairs(request):
+        timeframes = list(request.timeframes or context.stored_timeframes(pair))
+        timeframes += [tf for tf in request.resample or [] if tf not in timeframes]
+        for timeframe in timeframes:
+            df = context.load(pair, timeframe)
+            if df is None or df.empty:
+                continue
+            store.write_dataframe(df, pair, timeframe, context.candle_type)
+            written[f"{pair} {timeframe}"] = len(df)
+    log.write(f"Columnar store: {len(written)} pair/timeframes written to {context.columnar_dir}")
+    return {"files": written, "seconds": round(time.time() - started, 3)}
+
+
+def run_stages(request, context, log):
+    """
+    Runs every stage the request asks for, returns their results by name
+    """
+    results = {}
+    if request.validate:
+        # First, so the other stages work on repaired candles
+        results['validate'] = validate_stage(request, context, log)
+    if request.resample:
+        results['resample'] = resample_stage(request, context, log)
+    if request.columnar:
+        # Last, so it also picks up resampled timeframes
+        results['columnar'] = columnar_stage(request, context, log)
+    return results
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Derives higher timeframes from stored base candles.
+
+One pass over the base arrays per pair: candles are bucketed by the open
+time of the target candle and reduced with numpy `reduceat`, using the
+exchange aggregation rules (first open, max high, min low, last close,
+summed volume). Buckets missing base candles are partial; the last bucket
+is usually still forming and is never written.
+"""
+import numpy as np
+
+from ohlcv_gaps import timeframe_to_ms
+
+# Exchanges open weekly candles on Monday, the epoch was a Thursday
+_BUCKET_OFFSET_MS = {'w': 4 * 86_400_000}
+
+DROP_PARTIAL_MODES = ('all', 'last', 'none')
+
+
+def resample_arrays(dates_ms, open_, high, low, close, volume, base_timeframe, target_timeframe,
+                    drop_partial='all'):
+    """
+    Aggregates base candles into `target_timeframe` candles. Base candles
+    must be sorted by open time without duplicates, as Freqtrade stores them.
+
+    :param drop_partial: 'all' drops every bucket with missing base candles,
+                         'last' only a trailing incomplete bucket, 'none' keeps all
+    :return: (dict of output arrays keyed by OHLCV column, partial buckets dropped)
+    """
+    if drop_partial not in DROP_PARTIAL_MODES:
+        raise ValueError(f"drop_partial must be one of {DROP_PARTIAL_MODES}")
+    base_ms = timeframe_to_ms(base_timeframe)
+    target_ms = timeframe_to_ms(target_timeframe)
+    if target_ms <= base_ms or target_ms % base_ms:
+        raise ValueError(f"Cannot build {target_timeframe} candles from {base_timeframe}")
+
+    dates_ms = np.asarray(dates_ms, dtype=np.int64)
+    if dates_ms.size == 0:
+        empty = np.empty(0)
+        return {'date': dates_ms, 'open': empty, 'high': empty, 'low': empty,
+                'close': empty, 'volume': empty}, 0
+
+    offset = _BUCKET_OFFSET_MS.get(target_timeframe[-1], 0)
+    buckets = (dates_ms - offset) // target_ms * target_ms + offset
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], dates_ms.size]
+
+    complete = (ends - starts) == target_ms // base_ms
+    if drop_partial == 'all':
+        keep = complete
+    elif drop_partial == 'last':
+        keep = np.ones(starts.size, dtype=bool)
+        keep[-1] = complete[-1]
+    else:
+        keep = np.ones(starts.size, dtype=bool)
+
+    out = {
+        'date': buckets[starts],
+        'open': np.asarray(open_, dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(np.asarray(high, dtype=np.float64), starts),
+        'low': np.minimum.reduceat(np.asarray(low, dtype=np.float64), starts),
+        'close': np.asarray(close, dtype=np.float64)[ends - 1],
+        'volume': np.add.reduceat(np.asarray(volume, dtype=np.float64), starts),
+    }
+    return {column: values[keep] for column, values in out.items()}, int((~keep).sum())
+
+
+def resample_ohlcv(df, base_timeframe, target_timeframe, drop_partial='all'):
+    """
+    DataFrame wrapper around `resample_arrays`, in Freqtrade's column layout
+    """
+    import pandas as pd
+
+    from datafiles import dates_ms
+
+    out, dropped = resample_arrays(
+        dates_ms(df), df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(),
+        df['close'].to_numpy(), df['volume'].to_numpy(), base_timeframe, target_timeframe,
+        drop_partial=drop_partial)
+    out['date'] = pd.to_datetime(out['date'], unit='ms', utc=True)
+    return pd.DataFrame(out), dropped
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Candle-close aligned data refreshes for the webhook listener.
+
+Instead of an external cron calling /update, the listener queues an
+incremental update for every pair just after each candle of the scheduled
+timeframes closes: on a 5m boundary the 5m candles, on a 15m boundary the
+5m and 15m ones, on the hour all of 5m/15m/1h. The first pair goes `delay`
+seconds after the close, leaving the exchange time to finalize the candle,
+and the others are spread evenly over the next `jitter` seconds (always in
+the same order, so each pair keeps its slot) to stay within the exchange
+rate limits. A pair whose previous refresh is still queued or running is
+skipped for that close; the next one picks its candles up. Each refresh
+runs the validation stage (`validate`, see pipeline.validate_stage) on the
+files it updated.
+"""
+import threading
+import time
+
+from jobs import QUEUED, RUNNING, QueueFull
+from update_request import UpdateRequest
+
+# Candles are aligned to UTC epoch multiples up to a day (weeks start on Monday)
+TIMEFRAME_UNITS = {'m': 60, 'h': 3600, 'd': 86400}
+CLOSE_DELAY = 3
+JITTER = 60
+# Window of each incremental refresh, only the candles missing from it are fetched
+REFRESH_DAYS = 2
+# Integrity check after each refresh: 'report', 'repair' or None
+VALIDATE = 'report'
+
+
+def timeframe_seconds(timeframe):
+    """
+    '15m' -> 900
+    """
+    if timeframe[-1:] not in TIMEFRAME_UNITS or not timeframe[:-1].isdigit():
+        raise ValueError(f"Unsupported timeframe for scheduling {timeframe!r}")
+    return int(timeframe[:-1]) * TIMEFRAME_UNITS[timeframe[-1]]
+
+
+class CandleScheduler:
+    """
+    :param jobs: `JobQueue` the refreshes are submitted to
+    :param pairs: Pairs refreshed one by one, None for a single job with the
+                  pairs of the Freqtrade config
+    """
+
+    def __init__(self, jobs, timeframes, pairs=None, delay=CLOSE_DELAY, jitter=JITTER,
+                 refresh_days=REFRESH_DAYS, validate=VALIDATE, report=print):
+        self.jobs = jobs
+        self.timeframes = sorted(set(timeframes), key=timeframe_seconds)
+        self.pairs = list(pairs) if pairs else [None]
+        self.delay = delay
+        # Every pair has to go before the shortest timeframe closes again
+        self.jitter = min(jitter, timeframe_seconds(self.timeframes[0]) / 2)
+        self.refresh_days = refresh_days
+        self.validate = validate
+        self.report = report
+        self.runs = 0
+        self.submitted = 0
+        self.skipped = 0
+        self.last_close = None
+        self._last_jobs = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def closing(self, close):
+        """
+        Timeframes with a candle closing at `close` (epoch seconds)
+        """
+        return [timeframe for timeframe in self.timeframes if close % timeframe_seconds(timeframe) == 0]
+
+    def next_close(self, now):
+        step = timeframe_seconds(self.timeframes[0])
+        return (int(now) // step + 1) * step
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="candle-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            close = self.next_close(time.time())
+            timeframes = self.closing(close)
+            for i, pair in enumerate(self.pairs):
+                at = close + self.delay + self.jitter * i / len(self.pairs)
+                if self._stop.wait(max(0.0, at - time.time())):
+                    return
+                self.refresh(pair, timeframes)
+            self.runs += 1
+            self.last_close = close
+
+    def refresh(self, pair, timeframes):
+        """
+        Submits the refresh of one pair, unless its previous one is in flight
+
+        :return: The job, or None when skipped
+        """
+        previous = self._last_jobs.get(pair)
+        if previous is not None and previous.status in (QUEUED, RUNNING):
+            self.skipped += 1
+            self.report(f"[schedule] {pair or 'all pairs'} {' '.join(timeframes)}: "
+                        f"skipped, job {previous.id} still {previous.status}")
+            return None
+        request = UpdateRequest(pairs=[pair] if pair is not None else None, timeframes=timeframes,
+                                days=self.refresh_days, incremental=True, validate=self.validate)
+        try:
+            job, _ = self.jobs.submit(request, {"scheduled": True})
+        except QueueFull as e:
+            self.skipped += 1
+            self.report(f"[schedule] {pair or 'all pairs'} {' '.join(timeframes)}: skipped, {e}")
+            return None
+        self._last_jobs[pair] = job
+        self.submitted += 1
+        return job
+
+    def to_dict(self):
+        return {
+            "timeframes": self.timeframes,
+            "pairs": [pair for pair in self.pairs if pair is not None] or None,
+            "delay": self.delay,
+            "jitter": self.jitter,
+            "runs": self.runs,
+            "submitted": self.submitted,
+            "skipped": self.skipped,
+            "last_close": self.last_close,
+            "next_close": self.next_close(time.time()),
+        }
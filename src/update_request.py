@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Structured form of an /update payload.
+
+Keeping pairs, timeframes and the requested time window apart from the
+final updatedata.sh arguments lets the job queue tell when two requests
+ask for the same candles, so they can share one download.
+"""
+from datetime import datetime, timedelta, timezone
+
+# Timeframes built from base candles for "resample": true
+DEFAULT_RESAMPLE_TIMEFRAMES = ['15m', '1h']
+# Base timeframe the resampled ones are derived from (pipeline.resample_stage)
+RESAMPLE_BASE_TIMEFRAME = '5m'
+# Units resample.py can bucket (as ohlcv_gaps.TIMEFRAME_UNITS_MS, months are uneven)
+_UNIT_MINUTES = {'m': 1, 'h': 60, 'd': 1440, 'w': 10080}
+
+
+def _as_list(value):
+    # Handle list or string
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return str(value).split()
+
+
+def _resample_timeframes(value):
+    """
+    Validated "resample" timeframes: whole multiples of the base timeframe
+    """
+    timeframes = DEFAULT_RESAMPLE_TIMEFRAMES if value is True else _as_list(value)
+    base = _minutes(RESAMPLE_BASE_TIMEFRAME)
+    for timeframe in timeframes:
+        minutes = _minutes(timeframe)
+        if minutes is None or minutes <= base or minutes % base:
+            raise ValueError(f"Invalid resample timeframe: {timeframe!r}, expected a multiple of the "
+                             f"{RESAMPLE_BASE_TIMEFRAME} base candles in {'/'.join(_UNIT_MINUTES)} units")
+    return timeframes
+
+
+def _minutes(timeframe):
+    if timeframe[-1:] not in _UNIT_MINUTES or not timeframe[:-1].isdigit():
+        return None
+    return int(timeframe[:-1]) * _UNIT_MINUTES[timeframe[-1]]
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y%m%d').replace(tzinfo=timezone.utc)
+
+
+class UpdateRequest:
+    """
+    One data update: which pairs/timeframes and which window to download.
+
+    `pairs` / `timeframes` are None when the payload leaves them to the
+    Freqtrade config. The window is either `days` or a `timerange` string.
+    `incremental` only fetches candles missing from the stored data,
+    `resample` lists timeframes to derive from the base candles afterwards,
+    `columnar` mirrors the updated files into the columnar store,
+    `validate` checks them ('report') and also repairs them ('repair').
+    """
+
+    def __init__(self, pairs=None, timeframes=None, days=None, timerange=None, incremental=False,
+                 resample=None, columnar=False, validate=None):
+        self.pairs = tuple(sorted(set(pairs))) if pairs is not None else None
+        self.timeframes = tuple(sorted(set(timeframes))) if timeframes is not None else None
+        self.days = days
+        self.timerange = timerange
+        self.incremental = incremental
+        self.resample = tuple(sorted(set(resample))) if resample else None
+        self.columnar = columnar
+        self.validate = validate
+
+    def _options(self):
+        # Requests only share a download when they want it done the same way
+        return (self.incremental, self.resample, self.columnar, self.validate)
+
+    def stages(self):
+        """
+        Names of the pipeline stages to run after the download
+        """
+        stages = []
+        if self.validate:
+            stages.append('validate')
+        if self.resample:
+            stages.append('resample')
+        if self.columnar:
+            stages.append('columnar')
+        return stages
+
+    def replace(self, **changes):
+        fields = dict(pairs=self.pairs, timeframes=self.timeframes, days=self.days,
+                      timerange=self.timerange, incremental=self.incremental,
+                      resample=self.resample, columnar=self.columnar, validate=self.validate)
+        fields.update(changes)
+        return UpdateRequest(**fields)
+
+    @classmethod
+    def from_payload(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid payload: expected a JSON object, got {type(data).__name__}")
+        days = data.get('days')
+        if days is not None:
+            try:
+                days = int(days)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid days: {days!r}")
+        resample = data.get('resample')
+        if resample:
+            resample = _resample_timeframes(resample)
+        validate = data.get('validate', False)
+        if validate is True:
+            validate = 'report'
+        elif validate not in (False, None, 'report', 'repair'):
+            raise ValueError(f"Invalid validate: {validate!r}, expected true, 'report' or 'repair'")
+        return cls(
+            pairs=_as_list(data['pairs']) if 'pairs' in data else None,
+            timeframes=_as_list(data['timeframes']) if 'timeframes' in data else None,
+            days=days,
+            timerange=str(data['timerange']) if 'timerange' in data else None,
+            incremental=bool(data.get('incremental', False)),
+            resample=resample or None,
+            columnar=bool(data.get('columnar', False)),
+            validate=validate or None,
+        )
+
+    def to_args(self):
+        """
+        updatedata.sh arguments for this request
+        """
+        args = []
+        if self.days is not None:
+            args.extend(['--days', str(self.days)])
+        if self.timerange is not None:
+            args.extend(['--timerange', self.timerange])
+        if self.timeframes is not None:
+            args.append('--timeframes')
+            args.extend(self.timeframes)
+        if self.pairs is not None:
+            args.append('--pairs')
+            args.extend(self.pairs)
+        return args
+
+    def window(self):
+        """
+        (start, end) datetimes of the requested window, None meaning open.
+        Returns False when the window cannot be compared with others.
+        """
+        if self.days is None and self.timerange is None:
+            return None, None
+        if self.days is not None and self.timerange is not None:
+            # Both given: leave it to Freqtrade, never coalesce
+            return False
+        if self.days is not None:
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            return today - timedelta(days=self.days), None
+        try:
+            start, end = self.timerange.split('-')
+            return (_parse_date(start) if start else None,
+                    _parse_date(end) if end else None)
+        except ValueError:
+            return False
+
+    def _grid_covers(self, other):
+        if self._options() != other._options():
+            return False
+        for mine, theirs in ((self.pairs, other.pairs), (self.timeframes, other.timeframes)):
+            if mine is None or theirs is None:
+                if mine != theirs:
+                    return False
+            elif not set(theirs) <= set(mine):
+                return False
+        return True
+
+    def _window_covers(self, other):
+        mine, theirs = self.window(), other.window()
+        if mine is False or theirs is False:
+            return False
+        if (self.days is None and self.timerange is None) != \
+                (other.days is None and other.timerange is None):
+            return False
+        if mine[0] is not None and (theirs[0] is None or theirs[0] < mine[0]):
+            return False
+        if mine[1] is not None and (theirs[1] is None or theirs[1] > mine[1]):
+            return False
+        return True
+
+    def covers(self, other):
+        """
+        True if downloading self also downloads everything `other` asks for
+        """
+        return self._grid_covers(other) and self._window_covers(other)
+
+    def merge(self, other):
+        """
+        Single request covering both self and `other`, or None when that
+        would download candles neither of them asked for.
+        """
+        if self.covers(other):
+            return self
+        if other.covers(self):
+            return other
+        if (self.pairs, self.timeframes, self._options()) != \
+                (other.pairs, other.timeframes, other._options()):
+            return None
+
+        # Same pairs and timeframes: download the union of both windows
+        mine, theirs = self.window(), other.window()
+        if mine is False or theirs is False or None in (mine[0], theirs[0]):
+            return None
+        ends = [e for e in (mine[1], theirs[1]) if e is not None]
+        if ends and max(mine[0], theirs[0]) > min(ends):
+            # Disjoint windows: merging would also fetch the gap between them
+            return None
+        start = min(mine[0], theirs[0])
+        end = None if None in (mine[1], theirs[1]) else max(mine[1], theirs[1])
+        timerange = f"{start:%Y%m%d}-{end:%Y%m%d}" if end else f"{start:%Y%m%d}-"
+        return self.replace(days=None, timerange=timerange)
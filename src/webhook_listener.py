@@ -1,104 +1,413 @@
 #!/usr/bin/env python3
+import hmac
 import http.server
-import socketserver
-import subprocess
 import json
 import os
+import sys
+import threading
+import time
+
+import datafiles
+from downloader import NativeDownloader, ScriptDownloader
+from jobs import JobQueue, JobFailed, QueueFull
+from joblog import JobLog
+from ft_rpc import ACTIONS, FreqtradeClient, RpcError
+from scheduler import CandleScheduler
+from update_request import UpdateRequest
 
 PORT = 5001
 SCRIPT_TO_RUN = "./updatedata.sh"
 
-class WebhookHandler(http.server.SimpleHTTPRequestHandler):
+# "script" forks updatedata.sh per job, "native" keeps warm Freqtrade workers
+DOWNLOAD_BACKEND = os.environ.get("DOWNLOAD_BACKEND", "script")
+FREQTRADE_CONFIG = "../user_data/config.json"
+USER_DATA_DIR = "../user_data"
+NATIVE_WORKERS = 2
+
+# Update jobs run in the background so the listener keeps answering
+UPDATE_WORKERS = 2
+UPDATE_QUEUE_SIZE = 16
+JOB_HISTORY = 100
+
+# Incremental refreshes of the whitelisted pairs right after each candle
+# close of these timeframes, spread over SCHEDULE_JITTER seconds
+# (SCHEDULE_TIMEFRAMES="" turns the scheduler off)
+SCHEDULE_TIMEFRAMES = os.environ.get("SCHEDULE_TIMEFRAMES", "5m 15m 1h").split()
+SCHEDULE_DELAY = 3
+SCHEDULE_JITTER = 60
+
+# Script output goes to one size-capped log file per job
+JOB_LOG_DIR = "./logs"
+JOB_LOG_MAX_BYTES = 5 * 1024 * 1024
+JOB_LOG_TAIL_LINES = 200
+
+# Control actions (force_exit, pause...) skip the update queue and go to
+# the Freqtrade API over kept-alive connections; the keepalive thread pings
+# it and renews the token so an action never waits for either
+RPC_KEEPALIVE_INTERVAL = 4
+
+# Control actions and signals reach the live bot: they need this shared
+# secret in the X-Webhook-Secret header, or in a "secret" field of the
+# payload for senders that cannot set headers (TradingView). Unset, they
+# are refused
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+SECRET_HEADER = "X-Webhook-Secret"
+
+# Latency metrics, served on GET /metrics with the ones the bot exports
+# (pochteca/metrics.py lives with the strategies; found from this file, not
+# the working directory)
+STRATEGIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "user_data", "strategies")
+if STRATEGIES_DIR not in sys.path:
+    sys.path.append(STRATEGIES_DIR)
+from pochteca.metrics import Metrics, read_exported  # noqa: E402
+from pochteca.signals import SOCKET_NAME, Signal, SignalServer  # noqa: E402
+
+METRICS_DIR = os.path.join(USER_DATA_DIR, "metrics")
+METRICS_LOG_INTERVAL = 300
+METRICS = Metrics("pochteca_webhook", log_interval=METRICS_LOG_INTERVAL, report=print)
+
+# External signals (TradingView/n8n) kept until they expire and pushed to
+# the strategies on a Unix socket in user_data (pochteca/signals.py)
+SIGNAL_SOCKET = os.path.join(USER_DATA_DIR, SOCKET_NAME)
+# The socket is owner-only (0600); a bot running as another user follows it
+# through this group (name or gid, 0660)
+SIGNAL_SOCKET_GROUP = os.environ.get("SIGNAL_SOCKET_GROUP") or None
+
+
+def create_job_log(job):
+    return JobLog(os.path.join(JOB_LOG_DIR, f"{job.id}.log"),
+                  max_bytes=JOB_LOG_MAX_BYTES, tail_lines=JOB_LOG_TAIL_LINES)
+
+
+def create_scheduler(jobs):
+    if not SCHEDULE_TIMEFRAMES:
+        return None
+    try:
+        config = datafiles.load_freqtrade_config(FREQTRADE_CONFIG)
+        # Regex entries need the exchange markets to expand, those go as one job
+        pairs = config['exchange'].get('pair_whitelist', [])
+        if any(ch in p for p in pairs for ch in '*+?[('):
+            pairs = None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not read the pairs from {FREQTRADE_CONFIG} ({e}), scheduling one job for all pairs")
+        pairs = None
+    scheduler = CandleScheduler(jobs, SCHEDULE_TIMEFRAMES, pairs, delay=SCHEDULE_DELAY, jitter=SCHEDULE_JITTER)
+    scheduler.start()
+    return scheduler
+
+
+def run_update(job):
+    """
+    Job runner: downloads the candles of the job, streaming the output
+    into the job log, then runs the pipeline stages it asks for
+    """
+    print(f"[{job.id}] Executing ({DOWNLOAD_BACKEND}): {' '.join(job.args)}")
+    try:
+        with METRICS.timer("data_refresh"):
+            with METRICS.timer("download"):
+                result = WebhookHandler.downloader.download(job.spec, job.log)
+            if job.spec.stages():
+                # Stages need pandas/numpy, only import them when asked for
+                from pipeline import DataContext, run_stages
+                context = DataContext(FREQTRADE_CONFIG, USER_DATA_DIR)
+                with METRICS.timer("pipeline_stages"):
+                    result["stages"] = run_stages(job.spec, context, job.log)
+    except JobFailed as e:
+        print(f"[{job.id}] Error executing update: {e}")
+        raise
+
+    print(f"[{job.id}] Update completed successfully.")
+    return result
+
+
+def keep_rpc_warm(client):
+    """
+    Keeps a connection to the Freqtrade API open and the token fresh
+    """
+    up = None
+    while True:
+        try:
+            client.warm()
+            client.ping()
+        except RpcError as e:
+            # Only the changes are logged, not every failed ping while it is down
+            if up is not False:
+                print(f"Freqtrade API not ready: {e}")
+            up = False
+        else:
+            if up is False:
+                print(f"Freqtrade API at {client.url} is reachable again")
+            up = True
+        time.sleep(RPC_KEEPALIVE_INTERVAL)
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1 for chunked log streaming
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes, do not hold the body back
+    disable_nagle_algorithm = True
+    jobs = None
+    downloader = None
+    rpc = None
+    signals = None
+    scheduler = None
+
     def do_POST(self):
-        if self.path == '/update':
+        received = time.perf_counter()
+        with METRICS.timer("post_update" if self.path == '/update' else "post_other"):
+            self._post(received)
+
+    def _post(self, received):
+        if self.path == '/signal':
+            self._post_signal()
+        elif self.path in ('/update', '/action'):
             try:
                 # Parse JSON body if present
                 content_length = int(self.headers.get('Content-Length', 0))
-                args = []
-                
+                data = {}
+
                 if content_length > 0:
                     body = self.rfile.read(content_length)
                     data = json.loads(body)
-                    print(f"Received payload: {data}")
-                    
-                    # specific keys to flags mapping
-                    if 'days' in data:
-                        args.extend(['--days', str(data['days'])])
-                    if 'timerange' in data:
-                        args.extend(['--timerange', str(data['timerange'])])
-                    if 'timeframes' in data:
-                        # Handle list or string
-                        tf = data['timeframes']
-                        args.append('--timeframes')
-                        if isinstance(tf, list):
-                            args.extend(tf)
-                        else:
-                            args.extend(tf.split())
-                    if 'pairs' in data:
-                        pairs = data['pairs']
-                        args.append('--pairs')
-                        if isinstance(pairs, list):
-                            args.extend(pairs)
-                        else:
-                            args.extend(pairs.split())
-                
-                # Construct command
-                cmd = [SCRIPT_TO_RUN] + args
-                print(f"Executing: {' '.join(cmd)}")
-                
-                # Check if script exists
-                if not os.path.exists(SCRIPT_TO_RUN):
-                    self._send_response(500, {"status": "error", "message": f"Script {SCRIPT_TO_RUN} not found"})
+
+                # Control actions are answered right away, in this thread
+                if 'action' in data or self.path == '/action':
+                    self._run_action(data, received)
                     return
+                print(f"Received payload: {data}")
 
-                # Execute the script
-                result = subprocess.run(
-                    cmd, 
-                    check=True, 
-                    capture_output=True, 
-                    text=True
-                )
-                
-                print("Update completed successfully.")
-                self._send_response(200, {
-                    "status": "success", 
-                    "message": "Update executed", 
-                    "args_used": args,
-                    "stdout": result.stdout,
-                    "stderr": result.stderr
+                request = UpdateRequest.from_payload(data)
+
+                # Check if the download backend can run
+                ready, message = self.downloader.ready()
+                if not ready:
+                    self._send_response(500, {"status": "error", "message": message})
+                    return
+
+                job, coalesced = self.jobs.submit(request, data)
+                if coalesced:
+                    print(f"[{job.id}] Coalesced request into {job.status} job: {' '.join(job.args)}")
+                else:
+                    print(f"[{job.id}] Queued: {' '.join(job.args)}")
+                self._send_response(202, {
+                    "status": "accepted",
+                    "job_id": job.id,
+                    "coalesced": coalesced,
+                    "args_used": job.args,
+                    "status_url": f"/jobs/{job.id}",
+                    "log_url": f"/jobs/{job.id}/log"
                 })
-                
+
             except json.JSONDecodeError:
-                 self._send_response(400, {"status": "error", "message": "Invalid JSON"})
-            except subprocess.CalledProcessError as e:
-                print(f"Error executing script: {e}")
-                self._send_response(500, {
-                    "status": "error", 
-                    "message": "Script execution failed", 
-                    "stdout": e.stdout,
-                    "stderr": e.stderr
-                })
+                self._send_response(400, {"status": "error", "message": "Invalid JSON"})
+            except ValueError as e:
+                self._send_response(400, {"status": "error", "message": str(e)})
+            except QueueFull as e:
+                self._send_response(503, {"status": "error", "message": str(e)})
             except Exception as e:
                 print(f"Unexpected error: {e}")
                 self._send_response(500, {"status": "error", "message": str(e)})
         else:
+            # Unread request body: do not reuse the connection
+            self.close_connection = True
             self._send_response(404, {"status": "error", "message": "Not Found"})
 
+    def _post_signal(self):
+        """
+        One signal, e.g.
+        {"pair": "BTC/USDT", "action": "buy", "source": "tradingview", "ttl": 900},
+        or several: {"secret": ..., "signals": [...]}. A bare list of signals
+        has no room for the secret, it needs the header.
+        """
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            data = json.loads(self.rfile.read(content_length)) if content_length > 0 else {}
+            if not self._authorized(data):
+                return
+            items = data.get('signals', [data]) if isinstance(data, dict) else data
+            if not isinstance(items, list):
+                raise ValueError("Invalid signals: expected a list")
+            signals = [Signal.from_payload(item) for item in items]
+        except json.JSONDecodeError:
+            self._send_response(400, {"status": "error", "message": "Invalid JSON"})
+            return
+        except ValueError as e:
+            self._send_response(400, {"status": "error", "message": str(e)})
+            return
+        feeds = 0
+        for signal in signals:
+            feeds = self.signals.publish(signal)
+            print(f"Signal {signal.action} {signal.pair} from {signal.source}, sent to {feeds} feed(s)")
+        self._send_response(200, {"status": "ok", "signals": [signal.to_dict() for signal in signals],
+                                  "feeds": feeds})
+
+    def _authorized(self, data=None):
+        """
+        Checks the shared secret, from the header or the payload's "secret";
+        answers 403/401 and returns False when it is missing or wrong
+        """
+        # Dropped from the payload, never echoed back or logged with it
+        given = data.pop('secret', None) if isinstance(data, dict) else None
+        given = self.headers.get(SECRET_HEADER, given)
+        if not WEBHOOK_SECRET:
+            self._send_response(403, {"status": "error",
+                                      "message": "WEBHOOK_SECRET is not set on the listener, request refused"})
+            return False
+        if not isinstance(given, str) or not hmac.compare_digest(given.encode('utf-8'),
+                                                                 WEBHOOK_SECRET.encode('utf-8')):
+            print(f"Rejected {self.path} from {self.client_address[0]}: missing or wrong secret")
+            self._send_response(401, {"status": "error", "message": f"Missing or wrong {SECRET_HEADER}"})
+            return False
+        return True
+
+    def _run_action(self, data, received):
+        if not self._authorized(data):
+            return
+        action = data.get('action')
+        if action not in ACTIONS:
+            self._send_response(400, {"status": "error",
+                                      "message": f"Unknown action {action!r}, expected one of {sorted(ACTIONS)}"})
+            return
+        start = time.perf_counter()
+        try:
+            with METRICS.timer(f"action_{action}"):
+                result = ACTIONS[action](self.rpc, data)
+        except RpcError as e:
+            rpc_ms = (time.perf_counter() - start) * 1000
+            print(f"Action {action} failed after {rpc_ms:.1f}ms: {e}")
+            self._send_response(502, {"status": "error", "action": action, "message": str(e),
+                                      "latency_ms": {"rpc": round(rpc_ms, 3)}})
+            return
+        end = time.perf_counter()
+        latency = {"rpc": round((end - start) * 1000, 3), "total": round((end - received) * 1000, 3)}
+        self._send_response(200, {"status": "ok", "action": action, "result": result, "latency_ms": latency})
+        print(f"Action {action} ({data.get('reason', 'no reason given')}) done in {latency['total']:.1f}ms: {result}")
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        parts = [part for part in path.split('/') if part]
+
+        if parts == ['metrics']:
+            body = METRICS.render() + read_exported(METRICS_DIR)
+            self._send_text(200, body, 'text/plain; version=0.0.4; charset=utf-8')
+        elif parts == ['signals']:
+            if self._authorized():
+                self._send_response(200, {"signals": [signal.to_dict() for signal in self.signals.store.active()]})
+        elif parts == ['schedule']:
+            if self.scheduler is None:
+                self._send_response(404, {"status": "error", "message": "Scheduler disabled"})
+            else:
+                self._send_response(200, self.scheduler.to_dict())
+        elif parts == ['health']:
+            self._send_response(200, {"status": "ok", "pending_jobs": self.jobs.pending()})
+        elif parts == ['jobs']:
+            self._send_response(200, {"jobs": [job.to_dict() for job in self.jobs.list()]})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self.jobs.get(parts[1])
+            if job is None:
+                self._send_response(404, {"status": "error", "message": f"Unknown job {parts[1]}"})
+            else:
+                self._send_response(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'log':
+            job = self.jobs.get(parts[1])
+            if job is None or job.log is None:
+                self._send_response(404, {"status": "error", "message": f"Unknown job {parts[1]}"})
+            else:
+                self._stream_log(job, follow='follow=0' not in query.split('&'))
+        else:
+            self._send_response(404, {"status": "error", "message": "Not Found"})
+
+    def _stream_log(self, job, follow=True):
+        """
+        Streams the job log with chunked encoding: plain text lines, or
+        Server-Sent Events when the client asks for text/event-stream
+        """
+        sse = 'text/event-stream' in self.headers.get('Accept', '')
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream' if sse else 'text/plain; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for line in job.log.follow(live=follow):
+                if line is None:
+                    chunk = ": keepalive\n\n" if sse else ""
+                elif sse:
+                    chunk = f"data: {line}\n\n"
+                else:
+                    chunk = line + "\n"
+                self._write_chunk(chunk)
+            if sse:
+                job.done.wait(timeout=5)
+                self._write_chunk(f"event: end\ndata: {json.dumps({'status': job.status})}\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away, the job keeps running
+            self.close_connection = True
+
+    def _write_chunk(self, text):
+        if not text:
+            return
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_text(self, code, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def _send_response(self, code, data):
+        body = json.dumps(data).encode('utf-8')
         self.send_response(code)
         self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.wfile.write(body)
+
+
+def create_downloader():
+    if DOWNLOAD_BACKEND == "native":
+        downloader = NativeDownloader(FREQTRADE_CONFIG, USER_DATA_DIR, workers=NATIVE_WORKERS)
+        downloader.start()
+        return downloader
+    return ScriptDownloader(SCRIPT_TO_RUN, FREQTRADE_CONFIG, USER_DATA_DIR)
+
 
 def run_server():
-    with socketserver.TCPServer(("", PORT), WebhookHandler) as httpd:
+    WebhookHandler.downloader = create_downloader()
+    jobs = JobQueue(run_update, workers=UPDATE_WORKERS, maxsize=UPDATE_QUEUE_SIZE,
+                    history=JOB_HISTORY, log_factory=create_job_log)
+    jobs.start()
+    WebhookHandler.jobs = jobs
+    WebhookHandler.scheduler = create_scheduler(jobs)
+    WebhookHandler.signals = SignalServer(SIGNAL_SOCKET, group=SIGNAL_SOCKET_GROUP)
+    WebhookHandler.signals.start()
+    WebhookHandler.rpc = FreqtradeClient.from_config(FREQTRADE_CONFIG)
+    threading.Thread(target=keep_rpc_warm, args=(WebhookHandler.rpc,), name="rpc-keepalive", daemon=True).start()
+
+    with http.server.ThreadingHTTPServer(("", PORT), WebhookHandler) as httpd:
         print(f"Serving n8n webhook listener on port {PORT}")
-        print(f"POST to http://localhost:{PORT}/update to trigger {SCRIPT_TO_RUN}")
+        print(f"POST to http://localhost:{PORT}/update to trigger a data update ({DOWNLOAD_BACKEND} backend)")
+        print(f"POST {{\"action\": \"force_exit\"}} to http://localhost:{PORT}/action to control the bot "
+              f"with the {SECRET_HEADER} header ({WebhookHandler.rpc.url}, actions: {', '.join(ACTIONS)})")
+        if not WEBHOOK_SECRET:
+            print("WEBHOOK_SECRET is not set: control actions and signals are refused")
+        print(f"POST signals to http://localhost:{PORT}/signal with the {SECRET_HEADER} header, "
+              f"published on {SIGNAL_SOCKET}")
+        print(f"GET http://localhost:{PORT}/jobs/<job_id> for status, /jobs/<job_id>/log to stream its output")
+        print(f"GET http://localhost:{PORT}/metrics for Prometheus metrics")
+        if WebhookHandler.scheduler is not None:
+            print(f"Refreshing {' '.join(SCHEDULE_TIMEFRAMES)} candles after each close, GET /schedule for status")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\nShutting down server...")
             httpd.server_close()
+            WebhookHandler.signals.close()
 
 if __name__ == "__main__":
     run_server()
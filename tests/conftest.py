@@ -0,0 +1,87 @@
+"""
+Offline Freqtrade backtesting setup: synthetic candles in a temporary
+datadir and an exchange with a static BTC/USDT spot market, so Backtesting
+runs without loading the markets from Binance.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent / 'user_data' / 'strategies'
+PAIR = 'BTC/USDT'
+MARKET = {
+    'id': 'BTCUSDT', 'symbol': PAIR, 'base': 'BTC', 'quote': 'USDT', 'active': True,
+    'type': 'spot', 'spot': True, 'contract': False, 'linear': None, 'inverse': None, 'contractSize': None,
+    'precision': {'amount': 1e-5, 'price': 1e-8},
+    'limits': {'amount': {'min': 1e-5, 'max': None}, 'cost': {'min': 5, 'max': None}, 'price': {}, 'leverage': {}},
+}
+
+
+def random_walk(candles, seed, volatility, freq='5min'):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.standard_normal(candles) * volatility))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=candles, freq=freq, tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.random(candles) * volatility),
+        'low': np.minimum(open_, close) * (1 - rng.random(candles) * volatility),
+        'close': close,
+        'volume': rng.lognormal(6, 1, candles),
+    })
+
+
+@pytest.fixture
+def backtest_config(tmp_path):
+    """
+    :return: function (strategy, candles, timeframe) -> Freqtrade backtest
+             config, with the candles stored as the BTC/USDT history
+    """
+    from freqtrade.data.history import get_datahandler
+    from freqtrade.enums import CandleType, RunMode
+
+    def make(strategy, candles, timeframe='5m'):
+        get_datahandler(tmp_path, 'feather').ohlcv_store(PAIR, timeframe, candles, CandleType.SPOT)
+        return {
+            'runmode': RunMode.BACKTEST,
+            'dry_run': True,
+            'strategy': strategy,
+            'strategy_path': str(STRATEGIES_DIR),
+            'user_data_dir': tmp_path,
+            'datadir': tmp_path,
+            'dataformat_ohlcv': 'feather',
+            'timeframe': timeframe,
+            'stake_currency': 'USDT',
+            'stake_amount': 100,
+            'dry_run_wallet': 1000,
+            'max_open_trades': 1,
+            'fee': 0.001,
+            'trading_mode': 'spot',
+            'margin_mode': '',
+            'exchange': {'name': 'binance', 'pair_whitelist': [PAIR], 'key': '', 'secret': ''},
+            'pairlists': [{'method': 'StaticPairList'}],
+            'entry_pricing': {},
+            'exit_pricing': {},
+            'pochteca': {'indicator_cache': {'enabled': False}},
+        }
+    return make
+
+
+@pytest.fixture
+def offline_exchange(monkeypatch):
+    """
+    Makes Backtesting use an exchange with MARKET loaded instead of
+    downloading the markets
+    """
+    from freqtrade.exchange import Exchange
+    from freqtrade.resolvers import ExchangeResolver
+    from freqtrade.util import dt_ts
+
+    def load_exchange(config, **kwargs):
+        exchange = Exchange(config, validate=False)
+        exchange._markets = {PAIR: MARKET}
+        exchange._last_markets_refresh = dt_ts()
+        return exchange
+    monkeypatch.setattr(ExchangeResolver, 'load_exchange', staticmethod(load_exchange))
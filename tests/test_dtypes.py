@@ -0,0 +1,51 @@
+"""
+float32 storage of indicator columns (pochteca/dtypes.py)
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'user_data' / 'strategies'))
+
+from pochteca.dtypes import FLOAT32_TOLERANCE, downcast_float32, float32_error  # noqa: E402
+
+
+def random_walk(candles=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.standard_normal(candles) * 0.002))
+
+
+def test_cumulative_sum_is_rejected():
+    # Running price x volume sum over five years of 5m candles: the
+    # candle-to-candle changes get lost in float32 rounding
+    candles = 5 * 365 * 288
+    volume = np.random.default_rng(1).lognormal(6, 1, candles)
+    cumulative = np.cumsum(random_walk(candles) * volume)
+    assert float32_error(cumulative) > FLOAT32_TOLERANCE
+    grid = downcast_float32({'obv': cumulative}, FLOAT32_TOLERANCE, columns=('*',))
+    assert grid['obv'].dtype == np.float64
+
+
+def test_price_series_is_accepted():
+    close = random_walk()
+    assert float32_error(close) <= FLOAT32_TOLERANCE
+    grid = downcast_float32({'bb_middle': close}, FLOAT32_TOLERANCE, columns=('bb_*',))
+    assert grid['bb_middle'].dtype == np.float32
+
+
+def test_only_allowed_columns_are_converted():
+    close = random_walk()
+    grid = downcast_float32({'atr': close, 'rsi_14': close}, FLOAT32_TOLERANCE, columns=('atr',))
+    assert grid['atr'].dtype == np.float32
+    assert grid['rsi_14'].dtype == np.float64
+
+
+def test_overflow_and_underflow_are_rejected():
+    assert float32_error(np.array([1.0, 1e300])) == float('inf')
+    assert float32_error(np.array([1.0, 1e-300])) == float('inf')
+
+
+def test_constant_column():
+    assert float32_error(np.full(10, 0.5)) == 0.0
+    assert float32_error(np.full(10, 0.1)) == float('inf')
@@ -0,0 +1,49 @@
+"""
+The fast screen (pochteca/fastbacktest.py) has to find the same trades and
+exits as Freqtrade's backtesting of the same candles.
+
+Needs Freqtrade and the strategy dependencies importable.
+"""
+import sys
+
+import pytest
+
+pytest.importorskip('freqtrade')
+pytest.importorskip('talib')
+pytest.importorskip('technical')
+
+from conftest import STRATEGIES_DIR, random_walk  # noqa: E402
+
+sys.path.append(str(STRATEGIES_DIR))
+from pochteca import fastbacktest  # noqa: E402
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_matches_freqtrade_backtest(backtest_config, offline_exchange, seed):
+    from freqtrade.data.converter import trim_dataframes
+    from freqtrade.data.history import get_timerange
+    from freqtrade.optimize.backtesting import Backtesting
+
+    config = backtest_config('WeaponCandleStrategy', random_walk(3000, seed, 0.01, freq='1h'), '1h')
+    backtesting = Backtesting(config)
+    backtesting._set_strategy(backtesting.strategylist[0])
+    strategy = backtesting.strategy
+    strategy.ft_bot_start()
+    data, timerange = backtesting.load_bt_data()
+    preprocessed = strategy.advise_all_indicators(data)
+    min_date, max_date = get_timerange(trim_dataframes(preprocessed, timerange, backtesting.required_startup))
+    full = backtesting.backtest(processed=dict(preprocessed), start_date=min_date, end_date=max_date)['results']
+
+    # Signals on the candles with their startup, then trimmed, as Backtesting does
+    analyzed = {}
+    for pair, dataframe in preprocessed.items():
+        dataframe = strategy.populate_entry_trend(dataframe.copy(), {'pair': pair})
+        analyzed[pair] = strategy.populate_exit_trend(dataframe, {'pair': pair})
+    analyzed = trim_dataframes(analyzed, timerange, backtesting.required_startup)
+    fast, _ = fastbacktest.backtest(fastbacktest.ExitModel.from_strategy(strategy, fee=config['fee']), analyzed)
+
+    differences = fastbacktest.compare_trades(fast, full)
+    assert differences['matched'] == len(full) > 0
+    assert differences['only_fast'].empty
+    assert differences['only_full'].empty
+    assert differences['different_exits'].empty, differences['different_exits'].to_string()
@@ -0,0 +1,34 @@
+"""
+Hyperopt epochs with the same parameters have to score the same: the
+evaluator reuses its analyzed candles for every epoch and every pruning step.
+
+Needs Freqtrade, Optuna and the strategy dependencies importable.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('freqtrade')
+optuna = pytest.importorskip('optuna')
+pytest.importorskip('talib')
+
+from conftest import random_walk  # noqa: E402
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'src'))
+import hyperopt_driver  # noqa: E402
+
+
+def test_same_parameters_same_sharpe(backtest_config, offline_exchange):
+    evaluator = hyperopt_driver.Evaluator(backtest_config('SampleStrategy', random_walk(8000, 0, 0.01)), ['buy'])
+    rows = {pair: len(df) for pair, df in evaluator.processed.items()}
+
+    study = optuna.create_study(direction='maximize', pruner=optuna.pruners.NopPruner())
+    for _ in range(3):
+        study.enqueue_trial({'buy_rsi': 35})
+    study.optimize(evaluator, n_trials=3)
+
+    values = [trial.value for trial in study.trials]
+    assert values[0] != hyperopt_driver.NO_TRADES_SHARPE
+    assert values == [values[0]] * 3
+    assert {pair: len(df) for pair, df in evaluator.processed.items()} == rows
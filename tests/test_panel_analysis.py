@@ -0,0 +1,73 @@
+"""
+Batch analysis (pochteca/batch.py) and its process-pool version
+(pochteca/parallel.py) have to give WeaponCandleStrategy the same
+indicators and signals as the per-pair analysis.
+
+Needs Freqtrade and the strategy dependencies importable.
+"""
+import importlib.util
+import sys
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('freqtrade')
+pytest.importorskip('talib')
+pytest.importorskip('technical')
+
+from conftest import STRATEGIES_DIR, random_walk  # noqa: E402
+
+# Pairs of different lengths, starting at different dates
+PAIRS = {'BTC/USDT': (1500, 0), 'ETH/USDT': (1200, 300), 'SOL/USDT': (900, 100)}
+
+MODES = {
+    'batch': {'batch_analysis': True},
+    'parallel': {'parallel_analysis': {'workers': 2}},
+}
+
+
+def load_strategy(settings):
+    if str(STRATEGIES_DIR) not in sys.path:
+        sys.path.append(str(STRATEGIES_DIR))
+    spec = importlib.util.spec_from_file_location('_test_panel_WeaponCandleStrategy',
+                                                  STRATEGIES_DIR / 'WeaponCandleStrategy.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    strategy = module.WeaponCandleStrategy(
+        {'runmode': 'backtest', 'pochteca': {'indicator_cache': {'enabled': False}, **settings}})
+    strategy.bot_start()
+    return strategy
+
+
+def candles():
+    data = {}
+    for seed, (pair, (length, start)) in enumerate(PAIRS.items()):
+        data[pair] = random_walk(start + length, seed, 0.01, freq='1h').iloc[start:].reset_index(drop=True)
+    return data
+
+
+def analyze(strategy, data):
+    analyzed = strategy.advise_all_indicators(data)
+    return {pair: strategy.ft_advise_signals(dataframe, {'pair': pair}) for pair, dataframe in analyzed.items()}
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_matches_per_pair_analysis(mode):
+    data = candles()
+    serial = analyze(load_strategy({}), data)
+
+    strategy = load_strategy(MODES[mode])
+    try:
+        assert strategy.panel_analysis is not None
+        batched = analyze(strategy, data)
+        assert set(strategy.panel_analysis._pairs) == set(PAIRS)
+        if mode == 'parallel':
+            # Still open: the pool did not fail over to the in-process analysis
+            assert strategy.panel_analysis.analyze._executor is not None
+    finally:
+        if mode == 'parallel':
+            strategy.panel_analysis.analyze.close()
+
+    for pair in PAIRS:
+        assert serial[pair]['enter_long'].fillna(0).any()
+        pd.testing.assert_frame_equal(batched[pair], serial[pair], check_exact=True)
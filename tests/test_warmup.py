@@ -0,0 +1,83 @@
+"""
+Signals computed on only `startup_candle_count` candles of history, plus the
+candles being traded, have to match the full-history run: that is what
+Freqtrade loads before a backtest timerange and on the first live download.
+
+Needs the strategy dependencies (Freqtrade, TA-Lib, technical) importable.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('freqtrade')
+pytest.importorskip('talib')
+pytest.importorskip('technical')
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent / 'user_data' / 'strategies'
+CONFIG = {'runmode': 'backtest', 'pochteca': {'indicator_cache': {'enabled': False}}}
+SIGNALS = ('enter_long', 'exit_long', 'enter_short', 'exit_short')
+# Candles compared after each warm-up window, and windows per series
+TRADED = 300
+WINDOW_STEP = 500
+
+STRATEGIES = [
+    ('WeaponCandleStrategy.py', 'WeaponCandleStrategy'),
+    ('HyperOptTeamplate.py', 'TemplateHyperopt'),
+    ('sample_strategy.py', 'SampleStrategy'),
+]
+
+
+def load_strategy(filename, name):
+    if str(STRATEGIES_DIR) not in sys.path:
+        sys.path.append(str(STRATEGIES_DIR))
+    spec = importlib.util.spec_from_file_location(f'_test_{name}', STRATEGIES_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    strategy = getattr(module, name)(CONFIG)
+    strategy.bot_start()
+    return strategy
+
+
+def random_walk(candles, seed, volatility):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.standard_normal(candles) * volatility))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=candles, freq='5min', tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.random(candles) * volatility),
+        'low': np.minimum(open_, close) * (1 - rng.random(candles) * volatility),
+        'close': close,
+        'volume': rng.lognormal(6, 1, candles),
+    })
+
+
+def signals(strategy, candles):
+    metadata = {'pair': 'BTC/USDT'}
+    dataframe = strategy.populate_indicators(candles.copy(), metadata)
+    dataframe = strategy.populate_entry_trend(dataframe, metadata)
+    dataframe = strategy.populate_exit_trend(dataframe, metadata)
+    columns = [column for column in SIGNALS if column in dataframe]
+    return dataframe[columns].fillna(0).to_numpy()
+
+
+@pytest.mark.parametrize('filename,name', STRATEGIES)
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('volatility', (0.002, 0.01, 0.03))
+def test_startup_window_matches_full_history(filename, name, seed, volatility):
+    strategy = load_strategy(filename, name)
+    startup = strategy.startup_candle_count
+    assert startup > 0
+
+    candles = random_walk(startup + 4 * WINDOW_STEP, seed, volatility)
+    full = signals(strategy, candles)
+    assert full.any()
+    for start in range(0, len(candles) - startup - TRADED + 1, WINDOW_STEP):
+        window = signals(strategy, candles.iloc[start:start + startup + TRADED].reset_index(drop=True))
+        traded = slice(start + startup, start + startup + TRADED)
+        mismatches = np.flatnonzero((full[traded] != window[-TRADED:]).any(axis=1))
+        assert mismatches.size == 0, f"{name}: signals differ at candles {(start + startup + mismatches).tolist()}"
@@ -6,9 +6,18 @@ Dentro de la carpeta user_data/strategies
 docker compose run --rm freqtrade hyperopt --strategy Pochteca_Hyper --hyperopt-loss SharpeHyperOptLoss --timerange 20251001- --timeframe 15m -e 50 --spaces buy
 
 """
+import sys
+from pathlib import Path
+
 from freqtrade.strategy import IStrategy, IntParameter, DecimalParameter, CategoricalParameter
 from pandas import DataFrame
-import talib.abstract as ta
+
+# pochteca/ vive junto a las estrategias; los workers de hyperopt también lo importan
+if str(Path(__file__).parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent))
+
+from pochteca import lookback
+from pochteca.indicator_cache import NO_CACHE, IndicatorCache
 
 class TemplateHyperopt(IStrategy):
     # 1. Definir el Timeframe
@@ -33,13 +42,38 @@ class TemplateHyperopt(IStrategy):
     stoploss = -0.10
     trailing_stop = True
 
+    # Velas de calentamiento: se calculan en __init__ a partir de los lookbacks
+    # de los indicadores (ver pochteca/lookback.py)
+    startup_candle_count: int = 0
+    lookback_tolerance = lookback.DEFAULT_TOLERANCE
+
+    # Caché de indicadores en disco, se configura en bot_start
+    indicator_cache = NO_CACHE
+
+    def __init__(self, config: dict) -> None:
+        super().__init__(config)
+        self.lookback_tolerance = lookback.tolerance_from_config(self.config)
+        self.startup_candle_count = lookback.startup_candle_count(self)
+
+    def bot_start(self, **kwargs) -> None:
+        self.indicator_cache = IndicatorCache.from_config(self.config)
+
+    def warmup_candles(self, values) -> int:
+        # Velas previas a la primera señal válida con los valores de `values`
+        # (nombre -> valores posibles); manda la EMA 200 del filtro de entrada
+        tolerance = self.lookback_tolerance
+        periods = set(values('buy_ema_fast')) | set(values('buy_ema_slow')) | {200}
+        return max(max(lookback.talib('EMA', tolerance, timeperiod=period) for period in periods),
+                   lookback.talib('RSI', tolerance, timeperiod=14))
+
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         # AQUÍ CALCULAMOS TODO LO QUE LOS PARÁMETROS PODRÍAN NECESITAR
         # Si vas a optimizar periodos de EMA, calculamos un rango o los valores base
-        dataframe['ema_fast'] = ta.EMA(dataframe, timeperiod=self.buy_ema_fast.value)
-        dataframe['ema_slow'] = ta.EMA(dataframe, timeperiod=self.buy_ema_slow.value)
-        dataframe['rsi'] = ta.RSI(dataframe, timeperiod=14)
-        dataframe['ema_200'] = ta.EMA(dataframe, timeperiod=200)
+        ind = self.indicator_cache.bind(dataframe, metadata['pair'], self.timeframe)
+        dataframe['ema_fast'] = ind.talib('EMA', timeperiod=self.buy_ema_fast.value)
+        dataframe['ema_slow'] = ind.talib('EMA', timeperiod=self.buy_ema_slow.value)
+        dataframe['rsi'] = ind.talib('RSI', timeperiod=14)
+        dataframe['ema_200'] = ind.talib('EMA', timeperiod=200)
         
         return dataframe
 
@@ -20,11 +20,29 @@ Lógica:
 - SHORT: Price < VWAP + EMA bearish + MACD bearish + RSI not oversold
 """
 
-from freqtrade.strategy import IStrategy, IntParameter, DecimalParameter
-from pandas import DataFrame
+import sys
+from collections import ChainMap
+from pathlib import Path
+
+from freqtrade.strategy import IStrategy, IntParameter, DecimalParameter, timeframe_to_minutes
+from pandas import DataFrame, concat
 import talib.abstract as ta
 import numpy as np
 
+# pochteca/ vive junto a las estrategias; los workers de hyperopt también lo importan
+if str(Path(__file__).parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent))
+
+from pochteca import kernels, lookback, streaming
+from pochteca.batch import PanelAnalysis
+from pochteca.parallel import ParallelAnalysis
+from pochteca.indicator_cache import NO_CACHE, IndicatorCache
+from pochteca.registry import IndicatorRegistry, expand_columns, wanted_columns
+from pochteca.dtypes import CompactDtypes
+from pochteca.snapshot import SnapshotCache
+from pochteca.metrics import STRATEGY_METRICS, timed
+from pochteca.signals import SignalFeed
+
 
 class WeaponCandleStrategy(IStrategy):
     """
@@ -53,6 +71,14 @@ class WeaponCandleStrategy(IStrategy):
     trailing_stop_positive_offset = 0.025
     trailing_only_offset_is_reached = True
 
+    # Reglas de custom_exit: (horas mínimas o None, profit mínimo, motivo), en
+    # orden. El backtest rápido (pochteca/fastbacktest.py) usa las mismas
+    custom_exit_rules = (
+        (None, 0.08, "take_profit_8pct"),     # Take profit agresivo si el profit es muy alto
+        (24, 0.02, "timeout_profit_24h"),     # Mucho tiempo con profit pequeño
+        (48, 0.0, "timeout_profit_48h"),
+    )
+
     # Configuración de órdenes
     order_types = {
         'entry': 'limit',
@@ -80,210 +106,529 @@ class WeaponCandleStrategy(IStrategy):
     # Para calcular VWAP manualmente (Freqtrade no lo tiene built-in)
     buy_vwap_period = IntParameter(14, 30, default=20, space='buy', optimize=True)
 
-    def calculate_vwap(self, dataframe: DataFrame, period: int = 20) -> DataFrame:
+    # Columnas que leen las reglas de entrada/salida y custom_stoploss. Solo se
+    # calculan esas (más las de plot_config al graficar); los campos son
+    # parámetros de hyperopt y se expanden a todo su `.range`
+    signal_columns = (
+        'ema_{buy_ema_fast}', 'ema_{buy_ema_slow}', 'vwap_{buy_vwap_period}',
+        'macd_{buy_macd_fast}_{buy_macd_slow}', 'rsi_{buy_rsi_period}',
+        'bb_upper', 'atr_pct', 'volume_ratio',
+    )
+
+    # Caché de indicadores en disco, se configura en bot_start
+    indicator_cache = NO_CACHE
+    # Indicadores incrementales en dry/live, se configuran en bot_start
+    streaming_indicators = None
+    # Última vela analizada por par para los callbacks (dry/live)
+    candle_snapshots = None
+    # Tipos compactos para señales e indicadores, se configuran en bot_start
+    compact_dtypes = CompactDtypes()
+    # Columnas que pueden ir en float32: las que no se comparan contra un umbral
+    # en las reglas (el ATR escala el stop loss, el resto solo se grafica);
+    # "float32_columns" en la config las reemplaza (ver compare_precision)
+    float32_columns = ('atr', 'atr_pct', 'bb_middle', 'bb_lower', 'ema_50', 'ema_200')
+    # Análisis de todos los pares a la vez, opcionalmente en varios procesos;
+    # se configura en bot_start
+    panel_analysis = None
+    # Señales externas (TradingView/n8n) del webhook listener, en dry/live;
+    # se configura en bot_start
+    signal_feed = None
+
+    # Velas de calentamiento: se calculan en __init__ a partir de los lookbacks
+    # de los indicadores que usan las reglas (ver pochteca/lookback.py)
+    startup_candle_count: int = 0
+    lookback_tolerance = lookback.DEFAULT_TOLERANCE
+
+    def __init__(self, config: dict) -> None:
+        super().__init__(config)
+        self.lookback_tolerance = lookback.tolerance_from_config(self.config)
+        self.startup_candle_count = lookback.startup_candle_count(self)
+
+    def bot_start(self, **kwargs) -> None:
+        self.indicator_cache = IndicatorCache.from_config(self.config)
+        self.streaming_indicators = streaming.StreamingIndicators.from_config(
+            self.config, self.build_indicator_streams)
+        self.candle_snapshots = SnapshotCache.from_config(self.config, timeframe_to_minutes(self.timeframe))
+        self.compact_dtypes = CompactDtypes.from_config(self.config, self.float32_columns)
+        # En paralelo (varios procesos) o en un solo proceso
+        self.panel_analysis = (ParallelAnalysis.from_config(self.config, self, 'analyze_panel')
+                               or PanelAnalysis.from_config(self.config, self.analyze_panel))
+        # Tiempos de los puntos calientes (histogramas, por par), ver pochteca/metrics.py
+        STRATEGY_METRICS.configure(self.config, type(self).__name__)
+        self.signal_feed = SignalFeed.from_config(self.config)
+
+    @timed('analyze')
+    def analyze(self, pairs: list) -> None:
+        """
+        Dry/live: con el modo por lotes se analizan todos los pares antes del
+        bucle por par de Freqtrade
+        """
+        if self.panel_analysis is not None:
+            self.panel_analysis.prepare(
+                {pair: self.dp.ohlcv(pair, self.timeframe) for pair in pairs}, self.signal_parameters())
+        super().analyze(pairs)
+
+    def advise_all_indicators(self, data: dict) -> dict:
+        """
+        Backtesting/hyperopt: igual que analyze, con las velas de todos los pares
+        """
+        if self.panel_analysis is not None:
+            self.panel_analysis.prepare(data, self.signal_parameters())
+        return super().advise_all_indicators(data)
+
+    def analyze_panel(self, panel) -> tuple:
+        """
+        Indicadores, señales y reglas de todos los pares a la vez (arrays
+        tiempo × par)
+        """
+        indicators, missing = panel.streams(self.build_indicator_streams)
+        # Las mismas operaciones que indicator_registry, sobre todo el panel
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indicators['atr_pct'] = indicators['atr'] / panel['close'] * 100
+            indicators['volume_ratio'] = panel['volume'] / indicators['volume_sma']
+        signals = self.weapon_signals(ChainMap(indicators, panel.columns), panel.position)
+        columns = ChainMap(signals, indicators, panel.columns)
+        rules = {'entry': self.entry_signal(columns), 'exit': self.exit_signal(columns, panel.shift)}
+        return {'indicators': indicators, 'signals': signals, 'rules': rules}, missing
+
+    def panel_results(self, group: str, dataframe: DataFrame, metadata: dict):
         """
-        Calcula VWAP rolling (Volume Weighted Average Price)
+        Resultados del modo por lotes para este par, None si no hay
         """
-        typical_price = (dataframe['high'] + dataframe['low'] + dataframe['close']) / 3
-        vwap = (typical_price * dataframe['volume']).rolling(window=period).sum() / \
-               dataframe['volume'].rolling(window=period).sum()
-        return vwap
+        if self.panel_analysis is None or metadata is None:
+            return None
+        # Los indicadores llevan los parámetros en el nombre de la columna
+        key = None if group == 'indicators' else self.signal_parameters()
+        return self.panel_analysis.get(metadata['pair'], dataframe, group, key)
 
+    def build_indicator_streams(self) -> list:
+        """
+        Los indicadores de indicator_registry con los parámetros actuales, más
+        la señal MACD (en batch se calcula en populate_weapon_signals)
+        """
+        wanted = wanted_columns(self, self.signal_columns)
+        fast = self.buy_macd_fast.value
+        slow = self.buy_macd_slow.value
+        signal = self.buy_macd_signal.value
+        ema_periods = [
+            period for period in sorted({self.buy_ema_fast.value, self.buy_ema_slow.value, 50, 200})
+            if wanted is None or f'ema_{period}' in wanted
+        ]
+        return [
+            *(streaming.EMA(period, f'ema_{period}') for period in ema_periods),
+            streaming.VolumeWindows({self.buy_vwap_period.value: f'vwap_{self.buy_vwap_period.value}'},
+                                    {20: 'volume_sma'}),
+            streaming.MACD(fast, slow, signal, (f'macd_{fast}_{slow}', self.macd_signal_column())),
+            streaming.RSI(self.buy_rsi_period.value, f'rsi_{self.buy_rsi_period.value}'),
+            streaming.BBands(20, 2.0, ('bb_upper', 'bb_middle', 'bb_lower')),
+            streaming.ATR(14, 'atr'),
+        ]
+
+    def calculate_volume_windows(self, dataframe: DataFrame, vwap_periods, volume_sma_period: int = 20) -> dict:
+        """
+        Calcula VWAP rolling (Volume Weighted Average Price) para varios
+        periodos y la media de volumen en una sola pasada (sumas acumuladas)
+
+        Coincide con la versión de pandas (`rolling().sum()`) salvo por el
+        redondeo, ver pochteca/kernels.py
+        """
+        vwap, volume_sma = kernels.volume_windows(
+            dataframe['high'].to_numpy(dtype=np.float64), dataframe['low'].to_numpy(dtype=np.float64),
+            dataframe['close'].to_numpy(dtype=np.float64), dataframe['volume'].to_numpy(dtype=np.float64),
+            vwap_periods, (volume_sma_period,))
+        return {**{f'vwap_{period}': values for period, values in vwap.items()},
+                'volume_sma': volume_sma[volume_sma_period]}
+
+    def calculate_macd_line(self, dataframe: DataFrame, fast: int, slow: int):
+        """
+        Línea MACD tal como la calcula ta.MACD: la EMA rápida arranca alineada
+        con la lenta, así el resultado es idéntico al de ta.MACD
+        """
+        offset = slow - fast
+        ema_fast = ta.EMA(dataframe.iloc[offset:], timeperiod=fast).reindex(dataframe.index)
+        return ema_fast - ta.EMA(dataframe, timeperiod=slow)
+
+    @timed('populate_indicators', pair='metadata')
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         """
         Calcula los 4 indicadores del Weapon Candle Strategy
+
+        Solo se calculan las columnas de `signal_columns` y sus dependencias.
+        En dry/live los indicadores se actualizan de forma incremental (solo las
+        velas nuevas); con el modo por lotes ya vienen calculados para todos
+        los pares. En ambos casos el resultado es idéntico al cálculo completo.
+        """
+        grid = self.panel_results('indicators', dataframe, metadata)
+        if grid is None and self.streaming_indicators is not None:
+            grid = self.streaming_indicators.update(metadata['pair'], dataframe)
+
+        # Se calcula solo lo que falte (todo si no hay indicadores incrementales)
+        registry = self.indicator_registry(dataframe, metadata)
+        wanted = wanted_columns(self, self.signal_columns)
+        if wanted is not None:
+            # La señal MACD incremental la usa populate_weapon_signals, que luego la quita
+            wanted.add(self.macd_signal_column())
+        grid = registry.compute(wanted, grid)
+        # float32 solo si está activado, para las columnas permitidas y si el error
+        # medido queda dentro de la tolerancia
+        grid = self.compact_dtypes.indicators(grid)
+
+        # Un solo concat en lugar de insertar columna por columna
+        return concat([dataframe, DataFrame(grid, index=dataframe.index)], axis=1)
+
+    def indicator_registry(self, dataframe: DataFrame, metadata: dict, values=None) -> IndicatorRegistry:
+        """
+        Todos los indicadores que la estrategia sabe calcular, por columna, con
+        las velas que necesita cada uno antes de su primer valor (lookback)
+
+        Los indicadores que dependen de parámetros se registran una vez por cada
+        valor de su rango (`.range`): en hyperopt cada epoch solo elige columnas
+        en populate_entry_trend. Fuera de hyperopt `.range` contiene solo el
+        valor actual, así que se calcula una única columna por indicador.
+
+        :param values: Valores de un parámetro por nombre, por defecto su `.range`
         """
+        ind = self.indicator_cache.bind(dataframe, metadata['pair'], self.timeframe)
+        registry = IndicatorRegistry()
+        values = values or (lambda name: getattr(self, name).range)
+        tolerance = self.lookback_tolerance
+
         # ==========================================
         # 1. EMAs (Trend Direction)
         # ==========================================
-        dataframe['ema_fast'] = ta.EMA(dataframe, timeperiod=self.buy_ema_fast.value)
-        dataframe['ema_slow'] = ta.EMA(dataframe, timeperiod=self.buy_ema_slow.value)
-        dataframe['ema_50'] = ta.EMA(dataframe, timeperiod=50)
-        dataframe['ema_200'] = ta.EMA(dataframe, timeperiod=200)
-        
+        for period in sorted(set(values('buy_ema_fast')) | set(values('buy_ema_slow')) | {50, 200}):
+            registry.add(f'ema_{period}', lambda grid, period=period: ind.talib('EMA', timeperiod=period),
+                         lookback=lookback.talib('EMA', tolerance, timeperiod=period))
+
+        # ==========================================
+        # 2. VWAP (Volume-Weighted Fair Value)
+        # ==========================================
+        # Todos los periodos y la media de volumen (Volume analysis) salen de la
+        # misma pasada
+        vwap_periods = tuple(values('buy_vwap_period'))
+        registry.add((*(f'vwap_{period}' for period in vwap_periods), 'volume_sma'), lambda grid: ind.get(
+            'volume_windows', {'vwap_periods': vwap_periods, 'volume_sma_period': 20},
+            lambda: self.calculate_volume_windows(dataframe, vwap_periods, 20)),
+            lookback=lookback.window(max(*vwap_periods, 20)))
+
+        # ==========================================
+        # 3. MACD (Momentum Confirmation)
+        # ==========================================
+        # Solo la línea MACD depende de (fast, slow); la señal se calcula al elegir
+        # buy_macd_signal en populate_weapon_signals
+        for fast in values('buy_macd_fast'):
+            for slow in values('buy_macd_slow'):
+                # La EMA rápida arranca alineada con la lenta: manda la lenta
+                registry.add(f'macd_{fast}_{slow}', lambda grid, fast=fast, slow=slow: ind.get(
+                    'macd_line', {'fast': fast, 'slow': slow},
+                    lambda: self.calculate_macd_line(dataframe, fast, slow)),
+                    lookback=lookback.talib('EMA', tolerance, timeperiod=slow))
+
+        # ==========================================
+        # 4. RSI (Overbought/Oversold Filter)
+        # ==========================================
+        for period in values('buy_rsi_period'):
+            registry.add(f'rsi_{period}', lambda grid, period=period: ind.talib('RSI', timeperiod=period),
+                         lookback=lookback.talib('RSI', tolerance, timeperiod=period))
+
+        # ==========================================
+        # Indicadores adicionales para análisis
+        # ==========================================
+        # Bollinger Bands
+        def bollinger(grid):
+            bands = ind.talib('BBANDS', timeperiod=20, nbdevup=2.0, nbdevdn=2.0)
+            return {'bb_upper': bands['upperband'], 'bb_middle': bands['middleband'],
+                    'bb_lower': bands['lowerband']}
+
+        registry.add(('bb_upper', 'bb_middle', 'bb_lower'), bollinger,
+                     lookback=lookback.talib('BBANDS', tolerance, timeperiod=20))
+
+        # ATR para volatilidad
+        registry.add('atr', lambda grid: ind.talib('ATR', timeperiod=14),
+                     lookback=lookback.talib('ATR', tolerance, timeperiod=14))
+        registry.add('atr_pct', lambda grid: grid['atr'] / dataframe['close'] * 100, requires=('atr',))
+
+        # Volume analysis (volume_sma se calcula con el VWAP)
+        registry.add('volume_ratio', lambda grid: dataframe['volume'] / grid['volume_sma'],
+                     requires=('volume_sma',))
+
+        return registry
+
+    def warmup_candles(self, values) -> int:
+        """
+        Velas previas que necesitan las reglas con los parámetros de `values`
+        (nombre -> valores posibles) para no depender del inicio del histórico
+        """
+        candles = DataFrame(columns=['date', 'open', 'high', 'low', 'close', 'volume'])
+        registry = self.indicator_registry(candles, {'pair': None}, values)
+        indicators = registry.lookback(wanted_columns(self, self.signal_columns, values))
+        # La señal MACD es una EMA de la línea MACD (populate_weapon_signals)
+        macd_signal = registry.lookback(expand_columns(['macd_{buy_macd_fast}_{buy_macd_slow}'], values)) + max(
+            lookback.talib('EMA', self.lookback_tolerance, timeperiod=period) for period in values('buy_macd_signal'))
+        # Las salidas miran la vela anterior (shift(1))
+        return max(indicators, macd_signal) + 1
+
+    def populate_weapon_signals(self, dataframe: DataFrame, metadata: dict = None) -> DataFrame:
+        """
+        Elige las columnas de los parámetros actuales y calcula las señales
+        y el Weapon Score
+
+        Con `compact_dtypes` las señales son uint8 y el score int8 (por defecto
+        int64); los valores son los mismos. En el modo por lotes ya vienen
+        calculadas para todos los pares.
+        """
+        signals = self.panel_results('signals', dataframe, metadata)
+        if signals is None:
+            signals = self.weapon_signals(dataframe, np.arange(len(dataframe)))
+        # Un solo concat en lugar de insertar columna por columna; la señal MACD
+        # incremental ya está en `macd_signal`
+        existing = [column for column in [*signals, self.macd_signal_column()] if column in dataframe.columns]
+        if existing:
+            dataframe = dataframe.drop(columns=existing)
+        return concat([dataframe, DataFrame(signals, index=dataframe.index)], axis=1)
+
+    def macd_signal_column(self) -> str:
+        """
+        Columna de la señal MACD de los indicadores incrementales
+        """
+        return f'macd_signal_{self.buy_macd_fast.value}_{self.buy_macd_slow.value}_{self.buy_macd_signal.value}'
+
+    def signal_parameters(self) -> tuple:
+        """
+        Valores de los parámetros que usa weapon_signals
+        """
+        return tuple(getattr(self, name).value for name in (
+            'buy_ema_fast', 'buy_ema_slow', 'buy_vwap_period', 'buy_macd_fast', 'buy_macd_slow',
+            'buy_macd_signal', 'buy_rsi_period', 'buy_rsi_lower', 'buy_rsi_upper', 'sell_rsi_threshold'))
+
+    def weapon_signals(self, candles, row) -> dict:
+        """
+        Señales y Weapon Score de los parámetros actuales
+
+        :param candles: Columnas de un par (DataFrame) o de todos los pares
+                        (arrays tiempo × par del modo por lotes)
+        :param row: Número de vela dentro de su par
+        :return: dict con las columnas calculadas
+        """
+        flags = self.compact_dtypes.flag_dtype
+        signals = {}
+        # Se escribe en `signals`, se lee de `signals` y luego de `candles`
+        dataframe = ChainMap(signals, candles)
+
+        # ==========================================
+        # 1. EMAs (Trend Direction)
+        # ==========================================
+        dataframe['ema_fast'] = dataframe[f'ema_{self.buy_ema_fast.value}']
+        dataframe['ema_slow'] = dataframe[f'ema_{self.buy_ema_slow.value}']
+
         # EMA Trend Signal
         dataframe['ema_bullish'] = (
             (dataframe['ema_fast'] > dataframe['ema_slow']) &
             (dataframe['close'] > dataframe['ema_fast'])
-        ).astype(int)
-        
+        ).astype(flags)
+
         dataframe['ema_bearish'] = (
             (dataframe['ema_fast'] < dataframe['ema_slow']) &
             (dataframe['close'] < dataframe['ema_fast'])
-        ).astype(int)
+        ).astype(flags)
 
         # ==========================================
         # 2. VWAP (Volume-Weighted Fair Value)
         # ==========================================
-        dataframe['vwap'] = self.calculate_vwap(dataframe, self.buy_vwap_period.value)
-        
+        dataframe['vwap'] = dataframe[f'vwap_{self.buy_vwap_period.value}']
+
         # VWAP Signal
-        dataframe['above_vwap'] = (dataframe['close'] > dataframe['vwap']).astype(int)
-        dataframe['below_vwap'] = (dataframe['close'] < dataframe['vwap']).astype(int)
+        dataframe['above_vwap'] = (dataframe['close'] > dataframe['vwap']).astype(flags)
+        dataframe['below_vwap'] = (dataframe['close'] < dataframe['vwap']).astype(flags)
 
         # ==========================================
         # 3. MACD (Momentum Confirmation)
         # ==========================================
-        macd = ta.MACD(
-            dataframe,
-            fastperiod=self.buy_macd_fast.value,
-            slowperiod=self.buy_macd_slow.value,
-            signalperiod=self.buy_macd_signal.value
-        )
-        dataframe['macd'] = macd['macd']
-        dataframe['macd_signal'] = macd['macdsignal']
-        dataframe['macd_hist'] = macd['macdhist']
-        
+        macd_line = dataframe[f'macd_{self.buy_macd_fast.value}_{self.buy_macd_slow.value}']
+        signal_column = self.macd_signal_column()
+        if signal_column in dataframe:
+            # Ya calculada por los indicadores incrementales
+            macd_signal = dataframe[signal_column]
+        else:
+            # ta.EMA solo acepta float64 (las columnas pueden ser float32)
+            macd_signal = ta.EMA(macd_line.astype(np.float64), timeperiod=self.buy_macd_signal.value)
+        # Mismas velas iniciales sin valor que ta.MACD
+        warmup = self.buy_macd_slow.value + self.buy_macd_signal.value - 2
+        valid = row >= warmup
+        dataframe['macd'] = np.where(valid, macd_line, np.nan)
+        dataframe['macd_signal'] = np.where(valid, macd_signal, np.nan)
+        dataframe['macd_hist'] = dataframe['macd'] - dataframe['macd_signal']
+
         # MACD Signal
         dataframe['macd_bullish'] = (
             (dataframe['macd'] > dataframe['macd_signal']) &
             (dataframe['macd_hist'] > 0)
-        ).astype(int)
-        
+        ).astype(flags)
+
         dataframe['macd_bearish'] = (
             (dataframe['macd'] < dataframe['macd_signal']) &
             (dataframe['macd_hist'] < 0)
-        ).astype(int)
+        ).astype(flags)
 
         # ==========================================
         # 4. RSI (Overbought/Oversold Filter)
         # ==========================================
-        dataframe['rsi'] = ta.RSI(dataframe, timeperiod=self.buy_rsi_period.value)
-        
+        dataframe['rsi'] = dataframe[f'rsi_{self.buy_rsi_period.value}']
+
         # RSI zones
         dataframe['rsi_ok_buy'] = (
             (dataframe['rsi'] > self.buy_rsi_lower.value) &
             (dataframe['rsi'] < self.buy_rsi_upper.value)
-        ).astype(int)
-        
-        dataframe['rsi_oversold'] = (dataframe['rsi'] < self.buy_rsi_lower.value).astype(int)
-        dataframe['rsi_overbought'] = (dataframe['rsi'] > self.sell_rsi_threshold.value).astype(int)
+        ).astype(flags)
+
+        dataframe['rsi_oversold'] = (dataframe['rsi'] < self.buy_rsi_lower.value).astype(flags)
+        dataframe['rsi_overbought'] = (dataframe['rsi'] > self.sell_rsi_threshold.value).astype(flags)
 
         # ==========================================
         # 5. Señal Combinada (Weapon Score)
         # ==========================================
         # Score de 0-4 basado en cuántos indicadores confirman
-        dataframe['weapon_score_long'] = (
+        dataframe['weapon_score_long'] = self.compact_dtypes.score(
             dataframe['ema_bullish'] +
             dataframe['above_vwap'] +
             dataframe['macd_bullish'] +
             dataframe['rsi_ok_buy']
         )
-        
-        dataframe['weapon_score_short'] = (
+
+        dataframe['weapon_score_short'] = self.compact_dtypes.score(
             dataframe['ema_bearish'] +
             dataframe['below_vwap'] +
             dataframe['macd_bearish'] +
             (1 - dataframe['rsi_overbought'])  # RSI no overbought
         )
 
-        # ==========================================
-        # Indicadores adicionales para análisis
-        # ==========================================
-        # Bollinger Bands
-        bollinger = ta.BBANDS(dataframe, timeperiod=20, nbdevup=2.0, nbdevdn=2.0)
-        dataframe['bb_upper'] = bollinger['upperband']
-        dataframe['bb_middle'] = bollinger['middleband']
-        dataframe['bb_lower'] = bollinger['lowerband']
-        
-        # ATR para volatilidad
-        dataframe['atr'] = ta.ATR(dataframe, timeperiod=14)
-        dataframe['atr_pct'] = dataframe['atr'] / dataframe['close'] * 100
-        
-        # Volume analysis
-        dataframe['volume_sma'] = ta.SMA(dataframe['volume'], timeperiod=20)
-        dataframe['volume_ratio'] = dataframe['volume'] / dataframe['volume_sma']
-
-        return dataframe
+        return signals
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         """
         Señal de entrada: Los 4 indicadores deben confirmar (Weapon Score = 4)
         """
-        dataframe.loc[
-            (
-                # Weapon Score máximo (todos los indicadores confirman)
-                (dataframe['weapon_score_long'] >= 4) &
-                
-                # Confirmación adicional: Precio subiendo
-                (dataframe['close'] > dataframe['open']) &
-                
-                # Volumen decente
-                (dataframe['volume_ratio'] > 0.5) &
-                
-                # No en zona de resistencia extrema
-                (dataframe['close'] < dataframe['bb_upper']) &
-                
-                # Volumen no es cero
-                (dataframe['volume'] > 0)
-            ),
-            'enter_long'] = 1
+        dataframe = self.populate_weapon_signals(dataframe, metadata)
+
+        entry = self.panel_results('rules', dataframe, metadata)
+        dataframe.loc[self.entry_signal(dataframe) if entry is None else entry['entry'], 'enter_long'] = 1
+
+        # Alerta externa activa: entrada en la última vela
+        if self.signal_feed is not None and len(dataframe) > 0:
+            signal = self.signal_feed.get(metadata['pair'], 'enter_long')
+            if signal is not None:
+                dataframe.loc[dataframe.index[-1], ['enter_long', 'enter_tag']] = (
+                    1, signal.tag or f"signal_{signal.source}")
 
         return dataframe
 
+    def entry_signal(self, dataframe):
+        """
+        Velas con entrada, de un par (DataFrame) o de todos (modo por lotes)
+        """
+        return (
+            # Weapon Score máximo (todos los indicadores confirman)
+            (dataframe['weapon_score_long'] >= 4) &
+
+            # Confirmación adicional: Precio subiendo
+            (dataframe['close'] > dataframe['open']) &
+
+            # Volumen decente
+            (dataframe['volume_ratio'] > 0.5) &
+
+            # No en zona de resistencia extrema
+            (dataframe['close'] < dataframe['bb_upper']) &
+
+            # Volumen no es cero
+            (dataframe['volume'] > 0)
+        )
+
     def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         """
         Señal de salida: Cualquier indicador se vuelve bearish
         """
-        dataframe.loc[
-            (
-                # EMA cruce bearish
-                (
-                    (dataframe['ema_fast'] < dataframe['ema_slow']) &
-                    (dataframe['ema_fast'].shift(1) >= dataframe['ema_slow'].shift(1))
-                ) |
-                # RSI overbought
-                (dataframe['rsi'] > self.sell_rsi_threshold.value) |
-                # MACD bearish crossover
-                (
-                    (dataframe['macd'] < dataframe['macd_signal']) &
-                    (dataframe['macd'].shift(1) >= dataframe['macd_signal'].shift(1))
-                ) |
-                # Precio cae debajo de VWAP
-                (
-                    (dataframe['close'] < dataframe['vwap']) &
-                    (dataframe['close'].shift(1) >= dataframe['vwap'].shift(1))
-                )
-            ),
-            'exit_long'] = 1
+        if 'weapon_score_long' not in dataframe.columns:
+            dataframe = self.populate_weapon_signals(dataframe, metadata)
+
+        exit_ = self.panel_results('rules', dataframe, metadata)
+        if exit_ is None:
+            exit_ = self.exit_signal(dataframe, lambda values: values.shift(1))
+        else:
+            exit_ = exit_['exit']
+        dataframe.loc[exit_, 'exit_long'] = 1
+
+        if self.candle_snapshots is not None:
+            self.candle_snapshots.update(metadata['pair'], dataframe)
 
         return dataframe
 
+    def exit_signal(self, dataframe, shift):
+        """
+        Velas con salida, de un par (DataFrame) o de todos (modo por lotes)
+
+        :param shift: Devuelve la vela anterior del mismo par (`Series.shift(1)`)
+        """
+        return (
+            # EMA cruce bearish
+            (
+                (dataframe['ema_fast'] < dataframe['ema_slow']) &
+                (shift(dataframe['ema_fast']) >= shift(dataframe['ema_slow']))
+            ) |
+            # RSI overbought
+            (dataframe['rsi'] > self.sell_rsi_threshold.value) |
+            # MACD bearish crossover
+            (
+                (dataframe['macd'] < dataframe['macd_signal']) &
+                (shift(dataframe['macd']) >= shift(dataframe['macd_signal']))
+            ) |
+            # Precio cae debajo de VWAP
+            (
+                (dataframe['close'] < dataframe['vwap']) &
+                (shift(dataframe['close']) >= shift(dataframe['vwap']))
+            )
+        )
+
+    @timed('custom_stoploss', pair='pair')
     def custom_stoploss(self, pair: str, trade, current_time, current_rate,
                         current_profit, **kwargs) -> float:
         """
         Stop loss dinámico basado en ATR
         """
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-        
-        if len(dataframe) > 0:
-            last_candle = dataframe.iloc[-1]
-            atr_pct = last_candle['atr_pct']
-            
+        snapshot = None
+        if self.candle_snapshots is not None:
+            snapshot = self.candle_snapshots.get(pair, current_time)
+
+        atr_pct = None
+        if snapshot is not None:
+            atr_pct = snapshot.atr_pct
+        else:
+            dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
+            if len(dataframe) > 0:
+                atr_pct = dataframe['atr_pct'].iat[-1]
+
+        if atr_pct is not None:
             # Stop loss = 2x ATR pero mínimo -2% y máximo -5%
             dynamic_sl = -(atr_pct * 2) / 100
             return max(min(dynamic_sl, -0.02), -0.05)
         
         return -0.03  # Default 3%
 
+    @timed('custom_exit', pair='pair')
     def custom_exit(self, pair: str, trade, current_time, current_rate,
                     current_profit, **kwargs):
         """
         Lógica de salida personalizada para maximizar ganancias
         """
-        # Take profit agresivo si el profit es muy alto
-        if current_profit > 0.08:  # +8%
-            return "take_profit_8pct"
-        
-        # Salir si llevamos mucho tiempo con profit pequeño
+        # Alerta externa de salida recibida con el trade ya abierto
+        if self.signal_feed is not None:
+            signal = self.signal_feed.get(pair, 'exit_long')
+            if signal is not None and signal.received > trade.open_date_utc.timestamp():
+                return signal.tag or f"signal_{signal.source}"
+
         trade_duration = (current_time - trade.open_date_utc).total_seconds() / 3600
-        
-        if trade_duration > 24 and current_profit > 0.02:
-            return "timeout_profit_24h"
-        
-        if trade_duration > 48 and current_profit > 0:
-            return "timeout_profit_48h"
-        
+        for min_hours, min_profit, reason in self.custom_exit_rules:
+            if (min_hours is None or trade_duration > min_hours) and current_profit > min_profit:
+                return reason
         return None
 
     def leverage(self, pair: str, current_time, current_rate: float,
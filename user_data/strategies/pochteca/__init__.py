@@ -0,0 +1,6 @@
+"""
+Shared helpers for the Pochteca strategies.
+
+Lives in a sub-package so Freqtrade's strategy scan (non-recursive by
+default) does not try to load these modules as strategies.
+"""
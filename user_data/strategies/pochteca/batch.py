@@ -0,0 +1,198 @@
+"""
+Batched analysis of all pairs at once.
+
+Freqtrade analyzes one pair at a time, and every pair pays the pandas
+overhead of its own small dataframe for each indicator and signal column.
+In batch mode the strategy stacks the candles of every pair on one time
+axis (`Panel`: 2-D arrays, time × pair) before Freqtrade's per-pair loop,
+computes indicators, signals and entry/exit rules once for the whole panel,
+and the per-pair calls then only pick their columns out of the results.
+
+TA-Lib has no 2-D functions, so the recursive indicators run per pair
+column on plain arrays (the same C code, no pandas). Everything
+element-wise (ratios, signal flags, scores) runs once across the panel.
+Each pair is computed on its own candles only, so the results are
+identical to the per-pair analysis; a pair whose dataframe does not match
+the panel (or whose history is too short) is analyzed as usual.
+
+Configuration (optional, disabled by default):
+
+    "pochteca": {"batch_analysis": true}
+"""
+import logging
+
+import numpy as np
+import talib
+
+from . import streaming
+
+logger = logging.getLogger(__name__)
+
+_InsufficientHistory = getattr(talib, 'InsufficientHistory', ValueError)
+
+
+def _dates(dataframe):
+    return np.ascontiguousarray(dataframe['date'].values).view(np.int64)
+
+
+class Panel:
+    """
+    Candles of several pairs on the union of their dates.
+
+    `panel[column]` is a 2-D float64 array (time × pair), NaN where a pair
+    has no candle. `position` holds the number of each candle within its
+    pair, -1 where it has none.
+    """
+
+    def __init__(self, frames):
+        self.pairs = list(frames)
+        dates = [_dates(dataframe) for dataframe in frames.values()]
+        self.dates = np.unique(np.concatenate(dates)) if dates else np.empty(0, dtype=np.int64)
+        self.rows = [np.searchsorted(self.dates, pair_dates) for pair_dates in dates]
+        shape = (self.dates.size, len(self.pairs))
+
+        self.position = np.full(shape, -1, dtype=np.int64)
+        for j, rows in enumerate(self.rows):
+            self.position[rows, j] = np.arange(rows.size)
+
+        self.columns = {}
+        for column in streaming.CANDLE_COLUMNS:
+            # Column-major: each pair's values are contiguous
+            values = np.full(shape, np.nan, order='F')
+            for j, (dataframe, rows) in enumerate(zip(frames.values(), self.rows)):
+                values[rows, j] = dataframe[column].to_numpy(dtype=np.float64)
+            self.columns[column] = values
+
+    @classmethod
+    def from_arrays(cls, columns, position, pairs=None):
+        """
+        Panel over existing candle arrays (e.g. a slice of pairs in shared
+        memory); `dates` is not set
+        """
+        panel = cls.__new__(cls)
+        panel.columns = columns
+        panel.position = position
+        panel.pairs = list(pairs) if pairs is not None else list(range(position.shape[1]))
+        panel.dates = None
+        panel.rows = [np.flatnonzero(position[:, j] >= 0) for j in range(position.shape[1])]
+        return panel
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def candles(self, j):
+        """
+        Candle columns of pair number `j`, on its own dates
+        """
+        return {column: np.ascontiguousarray(values[self.rows[j], j]) for column, values in self.columns.items()}
+
+    def streams(self, build):
+        """
+        Opens the streams returned by `build()` on every pair (see
+        `streaming.open_streams`).
+
+        :return: (dict of 2-D arrays keyed by column, indices of the pairs
+                  with too little history for the streams)
+        """
+        columns = None
+        missing = []
+        for j, rows in enumerate(self.rows):
+            streams = build()
+            if columns is None:
+                names = [column for stream in streams for column in stream.columns]
+                columns = {name: np.full(self.position.shape, np.nan, order='F') for name in names}
+            try:
+                values = streaming.open_streams(streams, self.candles(j), rows.size)
+            except _InsufficientHistory:
+                missing.append(j)
+                continue
+            for name, row in zip(columns, values):
+                columns[name][rows, j] = row
+        return columns or {}, missing
+
+    def shift(self, values):
+        """
+        Previous candle of the same pair (`Series.shift(1)` of every pair)
+        """
+        shifted = np.full(values.shape, np.nan)
+        for j, rows in enumerate(self.rows):
+            shifted[rows[1:], j] = values[rows[:-1], j]
+        return shifted
+
+    def split(self, j, columns):
+        """
+        Values of pair number `j` in `columns` (dict of 2-D arrays)
+        """
+        rows = self.rows[j]
+        return {name: values[rows, j] for name, values in columns.items()}
+
+
+class _PairResults:
+    __slots__ = ('dates', 'groups', 'key')
+
+    def __init__(self, dates, groups, key):
+        self.dates = dates
+        self.groups = groups
+        self.key = key
+
+
+class PanelAnalysis:
+    """
+    Results of the last batch analysis, per pair.
+
+    :param analyze: Called with a `Panel`, returns the results (dict group
+                    name -> dict of 2-D arrays) and the indices of the pairs
+                    to leave to the per-pair analysis
+    """
+
+    def __init__(self, analyze):
+        self.analyze = analyze
+        self._pairs = {}
+
+    @classmethod
+    def from_config(cls, config, analyze):
+        """
+        Batch analysis for the running Freqtrade config, None when disabled
+        """
+        if not config.get('pochteca', {}).get('batch_analysis', False):
+            return None
+        if not streaming.HAS_TALIB_STREAMS:
+            logger.warning(f"TA-Lib {talib.__version__} has no stream handles, batch analysis disabled")
+            return None
+        logger.info("Batch analysis of all pairs enabled")
+        return cls(analyze)
+
+    def prepare(self, frames, key=None):
+        """
+        Analyzes the candles of all pairs at once.
+
+        :param frames: dict pair -> candle dataframe, as the per-pair calls will see it
+        :param key: Parameter values the results depend on, see `get`
+        """
+        self._pairs.clear()
+        frames = {pair: dataframe for pair, dataframe in frames.items() if len(dataframe)}
+        if not frames:
+            return
+        panel = Panel(frames)
+        groups, skip = self.analyze(panel)
+        skip = set(skip)
+        for j, pair in enumerate(panel.pairs):
+            if j not in skip:
+                self._pairs[pair] = _PairResults(
+                    panel.dates[panel.rows[j]],
+                    {name: panel.split(j, columns) for name, columns in groups.items()}, key)
+
+    def get(self, pair, dataframe, group, key=None):
+        """
+        Columns of `group` for `dataframe`, None if it is not the dataframe
+        analyzed.
+
+        :param key: When given, None as well if the parameter values changed
+                    since `prepare`
+        """
+        results = self._pairs.get(pair)
+        if results is None or (key is not None and results.key != key):
+            return None
+        if not np.array_equal(results.dates, _dates(dataframe)):
+            return None
+        return dict(results.groups[group])
@@ -0,0 +1,176 @@
+"""
+Compact column dtypes for analyzed dataframes.
+
+Freqtrade keeps the analyzed dataframe of every pair in memory (and
+hyperopt pickles them to its workers). Signal flags stored with
+`.astype(int)` take 8 bytes per candle each; as uint8 they take one. Scores
+built from those flags fit in int8. Indicator columns can optionally be
+stored as float32, which halves them again at the cost of precision.
+
+float32 is only applied to the columns of `float32_columns` (names or
+fnmatch patterns; the strategy passes its defaults, the config overrides
+them) and only when the measured rounding error stays within
+`float32_tolerance` of the column's median change between consecutive
+candles, the resolution its rules compare at, and no value overflows or
+underflows. Relative to the values themselves float32 rounding is always
+~6e-8, which would accept anything, including cumulative sums whose
+candle-to-candle changes get lost in it. Other columns stay float64.
+`compare_precision` runs a strategy both ways and reports how far
+indicators and signals move, to decide which columns to list.
+
+Configuration (all keys optional, everything off by default):
+
+    "pochteca": {
+        "compact_dtypes": {
+            "flags": true,
+            "float32": false,
+            "float32_columns": ["atr", "bb_*"],
+            "float32_tolerance": 0.01
+        }
+    }
+
+`"compact_dtypes": true` enables the flags/score part only.
+"""
+import fnmatch
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SIGNAL_COLUMNS = ('enter_long', 'enter_short', 'exit_long', 'exit_short')
+# Largest float32 rounding error, as a fraction of the median candle-to-candle change
+FLOAT32_TOLERANCE = 0.01
+
+
+class CompactDtypes:
+    def __init__(self, flags=False, float32=False, float32_tolerance=FLOAT32_TOLERANCE, float32_columns=()):
+        self.flags = flags
+        self.float32 = float32
+        self.float32_tolerance = float32_tolerance
+        self.float32_columns = tuple(float32_columns)
+        # uint8 rather than bool: flags are added up into scores, bool + bool is a logical or
+        self.flag_dtype = np.uint8 if flags else int
+        self.score_dtype = np.int8 if flags else None
+
+    @classmethod
+    def from_config(cls, config, float32_columns=()):
+        """
+        :param float32_columns: The strategy's columns allowed as float32,
+                                unless the config lists its own
+        """
+        settings = config.get('pochteca', {}).get('compact_dtypes', {})
+        if isinstance(settings, bool):
+            return cls(flags=settings)
+        return cls(
+            flags=settings.get('flags', False),
+            float32=settings.get('float32', False),
+            float32_tolerance=settings.get('float32_tolerance', FLOAT32_TOLERANCE),
+            float32_columns=settings.get('float32_columns', float32_columns),
+        )
+
+    def score(self, values):
+        """
+        Sum of flag columns in the score dtype
+        """
+        return values if self.score_dtype is None else values.astype(self.score_dtype)
+
+    def indicators(self, grid):
+        """
+        Allowed indicator columns as float32 where the tolerance allows it
+        """
+        if not self.float32:
+            return grid
+        return downcast_float32(grid, self.float32_tolerance, self.float32_columns)
+
+
+def float32_error(values):
+    """
+    Largest absolute error of storing `values` as float32, as a fraction of
+    their median non-zero change between consecutive values; inf when a
+    value overflows, a non-zero value underflows to zero, or the values
+    never change but do not round exactly
+    """
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(over='ignore'):
+        converted = values.astype(np.float32)
+    finite = np.isfinite(values)
+    if not np.array_equal(finite, np.isfinite(converted)):
+        return float('inf')
+    values = values[finite]
+    converted = converted[finite].astype(np.float64)
+    if np.any((converted == 0) & (values != 0)):
+        return float('inf')
+    error = float(np.max(np.abs(converted - values), initial=0.0))
+    if error == 0:
+        return 0.0
+    steps = np.abs(np.diff(values))
+    steps = steps[steps != 0]
+    if not steps.size:
+        return float('inf')
+    return error / float(np.median(steps))
+
+
+def downcast_float32(grid, tolerance, columns=('*',)):
+    """
+    :param grid: dict of indicator columns (arrays or Series)
+    :param columns: Names or fnmatch patterns of the columns allowed as float32
+    :return: new dict, allowed float64 columns within `tolerance` converted to float32
+    """
+    out = {}
+    for column, values in grid.items():
+        if getattr(values, 'dtype', None) == np.float64 and any(
+                fnmatch.fnmatchcase(column, pattern) for pattern in columns):
+            error = float32_error(values)
+            if error <= tolerance:
+                values = values.astype(np.float32)
+            else:
+                logger.debug(f"Keeping {column} as float64, float32 error {error:.3g} > {tolerance:g}")
+        out[column] = values
+    return out
+
+
+def compare_precision(strategy_factory, dataframe, metadata):
+    """
+    Runs a strategy with float64 and with float32 indicators on the same
+    candles and measures the difference.
+
+    :param strategy_factory: Called with a `compact_dtypes` config section,
+                             returns a strategy instance
+    :return: dict with the largest relative error per indicator column (all
+             of them converted, whatever `float32_columns` allows), the
+             number of candles whose entry/exit signals differ and the
+             memory of both analyzed dataframes
+    """
+    def analyze(settings):
+        strategy = strategy_factory(settings)
+        df = strategy.populate_indicators(dataframe.copy(), metadata)
+        df = strategy.populate_entry_trend(df, metadata)
+        return strategy.populate_exit_trend(df, metadata)
+
+    wide = analyze({'flags': True})
+    compact = analyze({'flags': True, 'float32': True, 'float32_tolerance': float('inf'),
+                       'float32_columns': ['*']})
+
+    errors = {}
+    for column in compact.columns:
+        if compact[column].dtype == np.float32:
+            reference = wide[column].to_numpy(dtype=np.float64)
+            values = compact[column].to_numpy(dtype=np.float64)
+            both = np.isfinite(reference) & np.isfinite(values) & (reference != 0)
+            errors[column] = float(np.max(np.abs(values[both] - reference[both]) / np.abs(reference[both]),
+                                          initial=0.0))
+
+    signal_diffs = {}
+    for column in SIGNAL_COLUMNS:
+        if column in wide.columns or column in compact.columns:
+            a = wide[column].fillna(0).to_numpy() if column in wide.columns else np.zeros(len(wide))
+            b = compact[column].fillna(0).to_numpy() if column in compact.columns else np.zeros(len(compact))
+            signal_diffs[column] = int(np.count_nonzero(a != b))
+
+    return {
+        'indicator_error': errors,
+        'signal_differences': signal_diffs,
+        'memory_float64': int(wide.memory_usage(deep=True).sum()),
+        'memory_float32': int(compact.memory_usage(deep=True).sum()),
+    }
@@ -0,0 +1,415 @@
+"""
+Fast screening backtest for long-only strategies with ROI, stoploss,
+trailing stop and time-based custom exits.
+
+Freqtrade's backtesting walks every candle of every pair through the
+strategy callbacks. For screening parameter sets, `ExitModel` replays the
+same exit rules on the analyzed dataframes (`enter_long` / `exit_long`)
+with numpy: the exit of every possible entry is found at once, with 2-D
+arrays (entry x candles after it) for the exit signal, custom exit rules
+by duration, ROI tiers by candle offset and the trailing stop (running
+maximum). Trades are then chained per pair, one at a time, each next
+entry coming after the previous exit.
+
+It follows Freqtrade's backtesting conventions:
+
+- Signals act on the next candle: entry at its open, if it has no exit
+  signal; not on the last candle.
+- Exits are checked on every candle from the entry candle on, in
+  Freqtrade's order: exit signal / custom exit (at the open), stoploss,
+  ROI (on the candle high), trailing stop; stop and ROI close rates as
+  Freqtrade computes them. Trades left open are closed at the open of the
+  last candle.
+- Profits include the entry and exit fee.
+
+What it does not model: `max_open_trades` and the wallet (every pair
+trades independently, with a fixed stake), protections and pair locks,
+exchange price precision, order timeouts and `custom_stoploss` (a strategy
+with `use_custom_stoploss` is rejected). Results match the full engine
+within those limits; `compare_trades` lists the differences against a
+Freqtrade backtest of the same data, check a strategy with it before
+relying on the screen.
+
+The returned metrics are the Definition-of-Done metrics of ROADMAP.md:
+win rate, profit factor, max drawdown, Sharpe ratio and trade count.
+"""
+import numpy as np
+import pandas as pd
+
+# Freqtrade's default fee when the exchange is unknown
+DEFAULT_FEE = 0.001
+# Candles examined after each entry before looking further, and entries
+# examined at once (WINDOW x CHUNK arrays)
+WINDOW = 64
+CHUNK = 4096
+
+# Exit kinds
+EXIT_SIGNAL, CUSTOM_EXIT, STOP_LOSS, ROI, TRAILING_STOP_LOSS, FORCE_EXIT = range(6)
+
+TRADE_COLUMNS = ('pair', 'open_date', 'close_date', 'open_rate', 'close_rate', 'profit_ratio', 'exit_reason')
+
+
+class ExitModel:
+    """
+    Exit rules of a strategy.
+
+    :param minimal_roi: Freqtrade ROI table, minutes -> profit ratio
+    :param custom_exits: (hours, profit, reason) rules of `custom_exit`, in
+                         order: exit when the trade is older than `hours`
+                         (None: any age) and its profit at the candle open
+                         is above `profit`
+    """
+
+    def __init__(self, timeframe_minutes, minimal_roi, stoploss, trailing_stop=False,
+                 trailing_stop_positive=None, trailing_stop_positive_offset=0.0,
+                 trailing_only_offset_is_reached=False, use_exit_signal=True, custom_exits=(),
+                 fee=DEFAULT_FEE):
+        self.timeframe_minutes = timeframe_minutes
+        roi = sorted((int(minutes), ratio) for minutes, ratio in minimal_roi.items())
+        self.roi_minutes = np.array([minutes for minutes, _ in roi], dtype=np.int64)
+        self.roi_ratios = np.array([ratio for _, ratio in roi], dtype=np.float64)
+        self.stoploss = abs(stoploss)
+        self.trailing_stop = trailing_stop
+        self.trailing_stop_positive = trailing_stop_positive
+        self.trailing_stop_positive_offset = trailing_stop_positive_offset or 0.0
+        self.trailing_only_offset_is_reached = trailing_only_offset_is_reached
+        self.use_exit_signal = use_exit_signal
+        self.custom_exits = tuple(custom_exits)
+        self.fee = fee
+
+    @classmethod
+    def from_strategy(cls, strategy, fee=DEFAULT_FEE):
+        """
+        Exit model of a strategy instance; its `custom_exit` rules are read
+        from a `custom_exit_rules` attribute
+        """
+        if getattr(strategy, 'use_custom_stoploss', False):
+            raise ValueError(f"{type(strategy).__name__} uses custom_stoploss, which the fast backtest does not model")
+        from freqtrade.exchange import timeframe_to_minutes
+
+        return cls(
+            timeframe_to_minutes(strategy.timeframe), strategy.minimal_roi, strategy.stoploss,
+            trailing_stop=strategy.trailing_stop,
+            trailing_stop_positive=strategy.trailing_stop_positive,
+            trailing_stop_positive_offset=strategy.trailing_stop_positive_offset,
+            trailing_only_offset_is_reached=strategy.trailing_only_offset_is_reached,
+            use_exit_signal=getattr(strategy, 'use_exit_signal', True),
+            custom_exits=getattr(strategy, 'custom_exit_rules', ()),
+            fee=fee,
+        )
+
+    def profit(self, open_rate, rate):
+        open_cost = open_rate * (1 + self.fee)
+        return (rate * (1 - self.fee) - open_cost) / open_cost
+
+    def trades(self, dataframe, pair):
+        """
+        Trades of one pair.
+
+        :param dataframe: Analyzed candles with `enter_long` / `exit_long`
+        :return: DataFrame with TRADE_COLUMNS
+        """
+        candles = _Candles(dataframe)
+        n = len(candles.open)
+        entries = np.flatnonzero(candles.enter & ~candles.exit)
+        entries = entries[entries < n - 1]
+        exits = _Exits(entries.size, n)
+        for start in range(0, entries.size, CHUNK):
+            self._find_exits(candles, entries, exits, np.arange(start, min(start + CHUNK, entries.size)))
+
+        # One trade at a time: the next entry comes after the exit candle
+        taken = []
+        i = 0
+        while i < entries.size:
+            taken.append(i)
+            i = np.searchsorted(entries, exits.index[i] + 1)
+
+        opened = entries[taken]
+        closed = exits.index[taken]
+        rates, reasons = zip(*(self._close(candles, entries[i], exits, i) for i in taken)) if taken else ((), ())
+        rates = np.array(rates, dtype=np.float64)
+        return pd.DataFrame({
+            'pair': pair,
+            'open_date': pd.to_datetime(candles.dates[opened], utc=True),
+            'close_date': pd.to_datetime(candles.dates[closed], utc=True),
+            'open_rate': candles.open[opened],
+            'close_rate': rates,
+            'profit_ratio': self.profit(candles.open[opened], rates),
+            'exit_reason': list(reasons),
+        }, columns=list(TRADE_COLUMNS))
+
+    def _find_exits(self, candles, entries, exits, pending):
+        """
+        Exit candle of every possible entry in `pending` (indices into
+        `entries`): windows of the candles after the entries, growing until
+        every trade has exited, carrying the trailing stop over
+        """
+        n = len(candles.open)
+        open_rates = candles.open[entries[pending]]
+        initial_stops = open_rates * (1 - self.stoploss)
+        stops = initial_stops
+        start = 0
+        width = WINDOW
+        while pending.size:
+            offsets = np.arange(start, start + width)
+            found, stops = self._first_exits(candles, entries[pending], exits, pending, offsets,
+                                             open_rates, initial_stops, stops)
+            start += width
+            width *= 2
+            # Trades without an exit and without candles left are closed at the end
+            keep = ~found & (entries[pending] + start < n)
+            pending, open_rates, initial_stops, stops = (
+                pending[keep], open_rates[keep], initial_stops[keep], stops[keep])
+
+    def _first_exits(self, candles, entries, exits, pending, offsets, open_rates, initial_stops, stops):
+        """
+        First exit of each trade within `offsets` candles from its entry
+        (one row per trade), stored into `exits`.
+
+        :return: (which trades exited, stop after the window)
+        """
+        n = len(candles.open)
+        index = entries[:, None] + offsets
+        valid = index < n
+        np.minimum(index, n - 1, out=index)
+        open_, high, low = candles.open[index], candles.high[index], candles.low[index]
+        open_rate = open_rates[:, None]
+        minutes = offsets * self.timeframe_minutes
+
+        # Exit signal, else custom_exit, at the candle open
+        signal = np.zeros(index.shape, dtype=bool)
+        custom = np.full(index.shape, -1)
+        if self.use_exit_signal:
+            signal = candles.exit[index] & ~candles.enter[index]
+            open_profit = self.profit(open_rate, open_)
+            for rule, (min_hours, min_profit, _) in reversed(list(enumerate(self.custom_exits))):
+                matches = open_profit > min_profit
+                if min_hours is not None:
+                    matches &= minutes / 60 > min_hours
+                custom[matches] = rule
+            custom[signal] = -1
+
+        # Stoploss: the stop is raised with the candle high, then hit by the
+        # low; a stop already above the low is not raised first
+        window_stops = self._stops(high, open_rate, stops)
+        previous = np.concatenate([stops[:, None], window_stops[:, :-1]], axis=1)
+        stop_price = np.where(previous >= low, previous, window_stops)
+        stop_hit = stop_price >= low
+        trailing = stop_price > initial_stops[:, None]
+
+        # ROI on the candle high
+        tier = np.searchsorted(self.roi_minutes, minutes, side='right') - 1
+        roi = np.where(tier >= 0, self.roi_ratios[np.maximum(tier, 0)], np.inf)
+        roi_hit = self.profit(open_rate, high) > roi
+
+        hit = (signal | (custom >= 0) | stop_hit | roi_hit) & valid
+        found = hit.any(axis=1)
+        rows = np.flatnonzero(found)
+        k = hit[rows].argmax(axis=1)
+        # Freqtrade's order: exit signal / custom exit, stoploss, ROI, trailing stop
+        kind = np.select(
+            [signal[rows, k], custom[rows, k] >= 0, stop_hit[rows, k] & ~trailing[rows, k], roi_hit[rows, k]],
+            [EXIT_SIGNAL, CUSTOM_EXIT, STOP_LOSS, ROI], TRAILING_STOP_LOSS)
+        target = pending[rows]
+        exits.index[target] = index[rows, k]
+        exits.kind[target] = kind
+        exits.rule[target] = custom[rows, k]
+        exits.stop[target] = stop_price[rows, k]
+        exits.tier[target] = tier[k]
+        return found, window_stops[:, -1]
+
+    def _stops(self, high, open_rate, stops):
+        """
+        Stop price after each candle's trailing update (running maximum)
+        """
+        if not self.trailing_stop:
+            return np.broadcast_to(stops[:, None], high.shape)
+        high_profit = self.profit(open_rate, high)
+        offset = self.trailing_stop_positive_offset
+        ratio = np.full(high.shape, self.stoploss)
+        if self.trailing_stop_positive is not None:
+            ratio[high_profit > offset] = self.trailing_stop_positive
+        candidates = high * (1 - ratio)
+        if self.trailing_only_offset_is_reached:
+            candidates[high_profit < offset] = -np.inf
+        return np.maximum.accumulate(np.maximum(candidates, stops[:, None]), axis=1)
+
+    def _close(self, candles, entry, exits, i):
+        """
+        (close rate, exit reason) of trade `i` of `exits`
+        """
+        index = exits.index[i]
+        kind = exits.kind[i]
+        offset = index - entry
+        if kind == EXIT_SIGNAL:
+            return candles.open[index], 'exit_signal'
+        if kind == CUSTOM_EXIT:
+            return candles.open[index], self.custom_exits[exits.rule[i]][2]
+        if kind == STOP_LOSS:
+            return self._stop_rate(candles, index, offset, exits.stop[i], False), 'stop_loss'
+        if kind == ROI:
+            return self._roi_rate(candles, index, offset, candles.open[entry], exits.tier[i]), 'roi'
+        if kind == TRAILING_STOP_LOSS:
+            return self._stop_rate(candles, index, offset, exits.stop[i], True), 'trailing_stop_loss'
+        return candles.open[index], 'force_exit'
+
+    def _stop_rate(self, candles, index, offset, stop_price, trailing):
+        open_, high, low = candles.open[index], candles.high[index], candles.low[index]
+        if stop_price > high:
+            # Gap below the stop
+            return open_
+        if trailing and offset == 0:
+            # Trailing stop on the entry candle: most pessimistic path
+            if (self.trailing_only_offset_is_reached and self.trailing_stop_positive
+                    and self.trailing_stop_positive_offset):
+                rate = open_ * (1 + self.trailing_stop_positive_offset - self.trailing_stop_positive)
+            else:
+                high_profit = self.profit(open_, high)
+                ratio = (self.trailing_stop_positive if self.trailing_stop_positive is not None
+                         and high_profit > self.trailing_stop_positive_offset else self.stoploss)
+                rate = open_ * (1 - ratio)
+            return max(low, rate)
+        return stop_price
+
+    def _roi_rate(self, candles, index, offset, open_rate, tier):
+        open_, high, low = candles.open[index], candles.high[index], candles.low[index]
+        roi_minutes = self.roi_minutes[tier]
+        rate = open_rate * (1 + self.fee) * (1 + self.roi_ratios[tier]) / (1 - self.fee)
+        if (offset > 0 and offset * self.timeframe_minutes == roi_minutes
+                and roi_minutes % self.timeframe_minutes == 0 and open_ > rate):
+            # A new ROI tier starts at this candle's open
+            return open_
+        return min(max(rate, low), high)
+
+
+class _Exits:
+    """
+    Exit of every possible entry of a pair: candle, kind and what its close
+    rate depends on. Force exit at the last candle until found.
+    """
+    __slots__ = ('index', 'kind', 'rule', 'stop', 'tier')
+
+    def __init__(self, count, candles):
+        self.index = np.full(count, candles - 1)
+        self.kind = np.full(count, FORCE_EXIT)
+        self.rule = np.zeros(count, dtype=np.int64)
+        self.stop = np.zeros(count)
+        self.tier = np.zeros(count, dtype=np.int64)
+
+
+class _Candles:
+    """
+    Candle arrays of one pair, with the signals of the previous candle
+    """
+
+    def __init__(self, dataframe):
+        # datetime64 (UTC), not Timestamp objects
+        self.dates = dataframe['date'].values
+        self.open = dataframe['open'].to_numpy(dtype=np.float64)
+        self.high = dataframe['high'].to_numpy(dtype=np.float64)
+        self.low = dataframe['low'].to_numpy(dtype=np.float64)
+        self.enter = _previous(dataframe, 'enter_long')
+        self.exit = _previous(dataframe, 'exit_long')
+
+
+def _previous(dataframe, column):
+    signal = np.zeros(len(dataframe), dtype=bool)
+    if column in dataframe.columns:
+        signal[1:] = dataframe[column].to_numpy(dtype=np.float64)[:-1] == 1
+    return signal
+
+
+def backtest(model, frames, starting_balance=1000.0, stake_amount=100.0):
+    """
+    Fast backtest of all pairs.
+
+    :param frames: dict pair -> analyzed dataframe
+    :return: (trades DataFrame, metrics dict)
+    """
+    trades = [model.trades(dataframe, pair) for pair, dataframe in frames.items() if len(dataframe)]
+    trades = (pd.concat(trades, ignore_index=True) if trades else pd.DataFrame(columns=TRADE_COLUMNS))
+    trades['profit_abs'] = trades['profit_ratio'].astype(np.float64) * stake_amount
+    trades = trades.sort_values(['close_date', 'pair'], ignore_index=True)
+    dates = [dataframe['date'] for dataframe in frames.values() if len(dataframe)]
+    min_date = min(date.iloc[0] for date in dates) if dates else None
+    max_date = max(date.iloc[-1] for date in dates) if dates else None
+    return trades, metrics(trades, min_date, max_date, starting_balance)
+
+
+def metrics(trades, min_date, max_date, starting_balance):
+    """
+    Definition-of-Done metrics of a trade list (`profit_ratio`,
+    `profit_abs`, ordered by close date). Drawdown and Sharpe ratio are
+    computed like Freqtrade's backtest report.
+    """
+    count = len(trades)
+    profit = trades['profit_abs'].to_numpy(dtype=np.float64)
+    wins = profit[profit > 0].sum()
+    losses = -profit[profit < 0].sum()
+
+    balance = starting_balance + np.cumsum(profit)
+    peak = np.maximum.accumulate(np.r_[starting_balance, balance])[1:]
+    drawdown = float(np.max((peak - balance) / peak)) if count else 0.0
+
+    returns = profit / starting_balance
+    days = max(1, (max_date - min_date).days) if count else 1
+    deviation = np.std(returns) if count else 0.0
+    sharpe = float(returns.sum() / days / deviation * np.sqrt(365)) if deviation else -100.0
+
+    return {
+        'trades': count,
+        'win_rate': float((trades['profit_ratio'] > 0).mean()) if count else 0.0,
+        'profit_factor': float(wins / losses) if losses else (float('inf') if wins else 0.0),
+        'max_drawdown': drawdown,
+        'sharpe': sharpe,
+        'profit_total': float(profit.sum() / starting_balance),
+    }
+
+
+def screen(strategy, frames, parameter_sets, model=None, **kwargs):
+    """
+    Fast backtest of every parameter set.
+
+    :param frames: dict pair -> dataframe with the indicators of every
+                   parameter value (populate_indicators in hyperopt mode)
+    :param parameter_sets: Iterable of dicts parameter name -> value
+    :return: Yields (parameters, metrics)
+    """
+    model = model or ExitModel.from_strategy(strategy)
+    for parameters in parameter_sets:
+        for name, value in parameters.items():
+            getattr(strategy, name).value = value
+        analyzed = {}
+        for pair, dataframe in frames.items():
+            metadata = {'pair': pair}
+            dataframe = strategy.populate_entry_trend(dataframe.copy(), metadata)
+            analyzed[pair] = strategy.populate_exit_trend(dataframe, metadata)
+        yield parameters, backtest(model, analyzed, **kwargs)[1]
+
+
+def compare_trades(fast, full, rate_tolerance=1e-6):
+    """
+    Differences between fast trades and the trades of a Freqtrade backtest
+    of the same data (`freqtrade.data.btanalysis.load_backtest_data`).
+
+    :return: dict with the number of matched trades, the trades found by
+             only one of them, and the matched trades whose exit differs
+    """
+    key = ['pair', 'open_date']
+    full = full[list(TRADE_COLUMNS)].copy()
+    full['open_date'] = pd.to_datetime(full['open_date'], utc=True)
+    full['close_date'] = pd.to_datetime(full['close_date'], utc=True)
+    merged = fast[list(TRADE_COLUMNS)].merge(full, on=key, how='outer', suffixes=('', '_full'), indicator=True)
+    both = merged[merged['_merge'] == 'both']
+    differs = both[
+        (both['close_date'] != both['close_date_full'])
+        | (both['exit_reason'] != both['exit_reason_full'])
+        | ~np.isclose(both['close_rate'].astype(float), both['close_rate_full'].astype(float),
+                      rtol=rate_tolerance, atol=0)
+    ]
+    return {
+        'matched': len(both),
+        'only_fast': merged.loc[merged['_merge'] == 'left_only', key].reset_index(drop=True),
+        'only_full': merged.loc[merged['_merge'] == 'right_only', key].reset_index(drop=True),
+        'different_exits': differs.drop(columns='_merge').reset_index(drop=True),
+    }
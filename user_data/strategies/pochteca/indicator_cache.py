@@ -0,0 +1,241 @@
+"""
+Persistent on-disk indicator cache.
+
+Backtests and hyperopt runs recompute the same indicators on the same,
+unchanged historical candles. Results are stored as `.npz` files keyed by
+pair, timeframe, indicator name, parameters and a hash of the input
+candles, so a repeated run only pays for loading the arrays. When the
+candles change (new data, different timerange) the hash changes and the
+indicator is recomputed.
+
+The cache directory is bounded: once it grows past `max_size_mb` the least
+recently used entries are removed.
+
+Configuration (all keys optional):
+
+    "pochteca": {
+        "indicator_cache": {
+            "enabled": true,
+            "path": "user_data/indicator_cache",
+            "max_size_mb": 1024
+        }
+    }
+
+By default it is only enabled for backtesting, hyperopt and plotting. In
+dry/live runs every new candle changes the hash, so caching would only
+add disk writes.
+"""
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import talib
+import talib.abstract as ta
+
+logger = logging.getLogger(__name__)
+
+# Bump when an indicator implementation changes in a way the key can't see
+CACHE_VERSION = 1
+
+CACHED_RUNMODES = ('backtest', 'hyperopt', 'plot')
+DEFAULT_MAX_SIZE_MB = 1024
+HASHED_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Eviction removes entries until the cache is back under this share of the limit
+_LOW_WATER = 0.9
+_SINGLE = '__value__'
+
+
+def candles_hash(dataframe):
+    """
+    Content hash of the candle dates and OHLCV columns
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(dataframe['date'].values).view(np.int64).tobytes())
+    for column in HASHED_COLUMNS:
+        digest.update(np.ascontiguousarray(dataframe[column].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def _to_arrays(result):
+    """
+    Indicator output as a dict of arrays. Single outputs use one key.
+    """
+    if hasattr(result, 'columns'):
+        return {str(column): result[column].to_numpy() for column in result.columns}
+    if isinstance(result, dict):
+        return {str(key): np.asarray(value) for key, value in result.items()}
+    return {_SINGLE: np.asarray(result)}
+
+
+def _from_arrays(arrays):
+    if list(arrays) == [_SINGLE]:
+        return arrays[_SINGLE]
+    return arrays
+
+
+class NullIndicatorCache:
+    """
+    Disabled cache: computes every indicator, same return types
+    """
+
+    def bind(self, dataframe, pair, timeframe):
+        return BoundIndicators(None, dataframe, pair, timeframe)
+
+
+NO_CACHE = NullIndicatorCache()
+
+
+class IndicatorCache:
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_SIZE_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._size = None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Cache for the running Freqtrade config, `NO_CACHE` when disabled
+        """
+        settings = config.get('pochteca', {}).get('indicator_cache', {})
+        runmode = config.get('runmode')
+        runmode = getattr(runmode, 'value', runmode)
+        if not settings.get('enabled', runmode in CACHED_RUNMODES):
+            return NO_CACHE
+
+        path = settings.get('path') or Path(config.get('user_data_dir', 'user_data')) / 'indicator_cache'
+        max_bytes = int(settings.get('max_size_mb', DEFAULT_MAX_SIZE_MB) * 1024 * 1024)
+        logger.info(f"Indicator cache enabled in {path} ({max_bytes // (1024 * 1024)} MB)")
+        return cls(path, max_bytes)
+
+    def bind(self, dataframe, pair, timeframe):
+        """
+        Indicator accessor for one pair's candles
+        """
+        return BoundIndicators(self, dataframe, pair, timeframe)
+
+    def key(self, pair, timeframe, name, params, data_hash):
+        params = ','.join(f'{k}={params[k]!r}' for k in sorted(params))
+        material = f'{CACHE_VERSION}|{talib.__version__}|{pair}|{timeframe}|{name}|{params}|{data_hash}'
+        return hashlib.blake2b(material.encode(), digest_size=16).hexdigest()
+
+    def path(self, key):
+        return self.cache_dir / f'{key}.npz'
+
+    def load(self, key):
+        """
+        Stored arrays for `key`, None on a miss
+        """
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                arrays = {name: stored[name] for name in stored.files}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            # Truncated or unreadable entry: drop it and recompute
+            logger.warning(f"Discarding unreadable indicator cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        # mtime doubles as the LRU timestamp
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return arrays
+
+    def store(self, key, arrays):
+        if any(values.dtype == object for values in arrays.values()):
+            return
+        path = self.path(key)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        # Other hyperopt/backtest processes may share the directory
+        os.replace(tmp, path)
+
+        if self._size is None:
+            self._size = self._total_size()
+        else:
+            self._size += path.stat().st_size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.npz'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _total_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache is under the limit
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * _LOW_WATER
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            logger.info(f"Indicator cache: evicted {removed} entries, {total / 1024 / 1024:.1f} MB left")
+
+
+class BoundIndicators:
+    """
+    Indicator calls for one dataframe. Single outputs are returned as arrays,
+    multi-output indicators as dicts of arrays keyed like their DataFrame
+    columns, whether they come from the cache or not.
+    """
+
+    def __init__(self, cache, dataframe, pair, timeframe):
+        self.cache = cache
+        self.dataframe = dataframe
+        self.pair = pair
+        self.timeframe = timeframe
+        self._data_hash = None
+
+    def talib(self, name, **params):
+        """
+        `ta.<name>(dataframe, **params)` through the cache
+        """
+        return self.get(name, params, lambda: getattr(ta, name)(self.dataframe, **params))
+
+    def get(self, name, params, compute):
+        """
+        Cached result of `compute()`, an indicator of this dataframe's candles.
+
+        :param name: Indicator name, unique per implementation
+        :param params: Everything besides the candles the result depends on
+        """
+        if self.cache is None:
+            return _from_arrays(_to_arrays(compute()))
+
+        if self._data_hash is None:
+            self._data_hash = candles_hash(self.dataframe)
+        key = self.cache.key(self.pair, self.timeframe, name, params, self._data_hash)
+        arrays = self.cache.load(key)
+        if arrays is None:
+            arrays = _to_arrays(compute())
+            self.cache.store(key, arrays)
+        return _from_arrays(arrays)
@@ -0,0 +1,199 @@
+"""
+Fused numeric kernels.
+
+`volume_windows` computes the rolling VWAP for any number of periods and
+the volume SMA in one pass over the candles: one running sum of typical
+price * volume and one of volume, every window being the difference of two
+running sums. The pandas version computes typical price, price * volume, two
+rolling sums and the division as separate full-length Series for each
+period, and the volume SMA with another rolling pass.
+
+The running sums restart every `BLOCK` candles, so a window spans at most
+two blocks and the rounding error depends on the volume of the neighbouring
+candles, not on the length of the history. With a fixed block a period gives
+the same values whichever other periods are computed with it. The
+results are not bit-identical to pandas' compensated rolling sums: the
+relative difference is around 1e-14 on ordinary windows and grows towards
+1e-9 on windows with a tiny fraction of the volume of the candles just
+before them. Windows without any traded volume are detected exactly and
+give NaN like pandas.
+
+`VolumeWindows` continues the same running sums candle by candle, so
+streaming updates match the batch kernel exactly.
+"""
+from collections import deque
+
+import numpy as np
+
+NAN = float('nan')
+
+# Candles per block of running sums; longer periods use their own length
+BLOCK = 256
+
+
+class _RunningSums:
+    """
+    Running sums of typical price * volume and of volume, restarted every
+    `block` candles, and the (exact, integer) running counts of candles with
+    volume and with missing values
+    """
+
+    def __init__(self, high, low, close, volume, block):
+        n = len(close)
+        self.block = block
+        price_volume = np.add(high, low)
+        price_volume += close
+        price_volume /= 3
+        price_volume *= volume
+
+        self.traded = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(volume != 0, out=self.traded[1:])
+        self.missing = None
+        invalid = np.isnan(price_volume)
+        if invalid.any():
+            self.missing = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(invalid, out=self.missing[1:])
+            price_volume[invalid] = 0
+            volume = np.where(invalid, 0, volume)
+
+        self.price_volume, self.price_volume_totals = self._block_sums(price_volume)
+        self.volume, self.volume_totals = self._block_sums(volume)
+
+    def _block_sums(self, values):
+        n = len(values)
+        blocks = -(-n // self.block)
+        padded = np.zeros(blocks * self.block)
+        padded[:n] = values
+        local = np.cumsum(padded.reshape(blocks, self.block), axis=1)
+        return local.ravel()[:n], local[:, -1]
+
+    def windows(self, sums, totals, period):
+        """
+        Sums over `period` candles, aligned with the last candle of each window
+        """
+        end = np.arange(period - 1, len(sums))
+        before = end - period
+        # Window inside one block: difference of its running sums. Across two
+        # blocks: rest of the first block plus the start of the second one
+        result = sums[end]
+        first = before >= 0
+        same = first & (before // self.block == end // self.block)
+        result[same] -= sums[before[same]]
+        cross = first & ~same
+        result[cross] += totals[before[cross] // self.block] - sums[before[cross]]
+        return result
+
+    @staticmethod
+    def counts(running, period):
+        return running[period:] - running[:-period]
+
+
+def volume_windows(high, low, close, volume, vwap_periods=(), sma_periods=()):
+    """
+    Rolling VWAP and volume SMA for several periods.
+
+    :param high, low, close, volume: float64 arrays
+    :param vwap_periods: Periods of sum(typical price * volume) / sum(volume)
+    :param sma_periods: Periods of the volume moving average
+    :return: (dict period -> vwap array, dict period -> volume sma array)
+    """
+    block = max(BLOCK, *vwap_periods, *sma_periods)
+    return _volume_windows(_RunningSums(high, low, close, volume, block), vwap_periods, sma_periods)
+
+
+def _volume_windows(sums, vwap_periods, sma_periods):
+    n = len(sums.traded) - 1
+
+    vwap = {}
+    for period in vwap_periods:
+        values = np.full(n, NAN)
+        if period <= n:
+            window = values[period - 1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                np.divide(sums.windows(sums.price_volume, sums.price_volume_totals, period),
+                          sums.windows(sums.volume, sums.volume_totals, period), out=window)
+            # No volume in the window: 0 / 0 as in pandas
+            window[sums.counts(sums.traded, period) == 0] = NAN
+            if sums.missing is not None:
+                window[sums.counts(sums.missing, period) > 0] = NAN
+        vwap[period] = values
+
+    sma = {}
+    for period in sma_periods:
+        values = np.full(n, NAN)
+        if period <= n:
+            window = values[period - 1:]
+            np.divide(sums.windows(sums.volume, sums.volume_totals, period), period, out=window)
+            window[sums.counts(sums.traded, period) == 0] = 0.0
+            if sums.missing is not None:
+                window[sums.counts(sums.missing, period) > 0] = NAN
+        sma[period] = values
+    return vwap, sma
+
+
+class VolumeWindows:
+    """
+    `volume_windows` one candle at a time. `open` runs the batch kernel and
+    keeps the running sums of the last `block + 1` candles; `update` extends
+    them with the same operations in the same order.
+    """
+
+    def __init__(self, vwap_periods=(), sma_periods=()):
+        self.vwap_periods = tuple(vwap_periods)
+        self.sma_periods = tuple(sma_periods)
+        self.block = max(BLOCK, *self.vwap_periods, *self.sma_periods)
+
+    def open(self, high, low, close, volume):
+        sums = _RunningSums(high, low, close, volume, self.block)
+        if sums.missing is not None:
+            raise ValueError("Streaming volume windows need complete candles")
+        self.count = len(close)
+        keep = self.block + 1
+        self.price_volume = deque(sums.price_volume[-keep:].tolist(), maxlen=keep)
+        self.volume = deque(sums.volume[-keep:].tolist(), maxlen=keep)
+        self.traded = deque(sums.traded[-keep:].tolist(), maxlen=keep)
+        # Totals of the block before the current one
+        previous = (self.count - 1) // self.block - 1
+        self.price_volume_total = float(sums.price_volume_totals[previous]) if previous >= 0 else 0.0
+        self.volume_total = float(sums.volume_totals[previous]) if previous >= 0 else 0.0
+        return _volume_windows(sums, self.vwap_periods, self.sma_periods)
+
+    def update(self, high, low, close, volume):
+        price_volume = (high + low + close) / 3 * volume
+        if self.count % self.block == 0:
+            # New block: the running sums restart
+            self.price_volume_total = self.price_volume[-1]
+            self.volume_total = self.volume[-1]
+            self.price_volume.append(price_volume)
+            self.volume.append(volume)
+        else:
+            self.price_volume.append(self.price_volume[-1] + price_volume)
+            self.volume.append(self.volume[-1] + volume)
+        self.traded.append(self.traded[-1] + (volume != 0))
+        self.count += 1
+
+        vwap = {}
+        for period in self.vwap_periods:
+            if self.count < period or self.traded[-1] == self.traded[-1 - period]:
+                vwap[period] = NAN
+                continue
+            vwap[period] = (self._window(self.price_volume, self.price_volume_total, period)
+                            / self._window(self.volume, self.volume_total, period))
+        sma = {}
+        for period in self.sma_periods:
+            if self.count < period:
+                sma[period] = NAN
+            elif self.traded[-1] == self.traded[-1 - period]:
+                sma[period] = 0.0
+            else:
+                sma[period] = self._window(self.volume, self.volume_total, period) / period
+        return vwap, sma
+
+    def _window(self, sums, total, period):
+        end = self.count - 1
+        before = end - period
+        if before < 0:
+            return sums[-1]
+        if before // self.block == end // self.block:
+            return sums[-1] - sums[-1 - period]
+        return sums[-1] + (total - sums[-1 - period])
@@ -0,0 +1,152 @@
+"""
+Warm-up (startup candles) a strategy needs, from its indicator definitions.
+
+Every indicator registered in `IndicatorRegistry` declares its lookback:
+how many candles it needs before its first value can be used. For TA-Lib
+functions `talib()` measures it with TA-Lib itself:
+
+- the function's own lookback (first non-NaN output, `Function.lookback`)
+- plus, for recursive indicators (EMA, Wilder RSI/ATR, MACD, TEMA, ...),
+  the candles until the value no longer depends on where the history
+  starts: the output over the last `n` candles of a long reference series
+  has to match the output over the whole series within `tolerance`
+  (relative to the output's mean magnitude).
+
+The indicators feed threshold crossings (RSI > 30, EMA crosses), where a
+small difference flips a signal, so the tolerance is strict.
+
+The strategy's warm-up is the longest chain of lookbacks behind the
+columns its rules read (`IndicatorRegistry.lookback`), with hyperopt
+parameters at every value of their range (`hyperopt_values`), so the same
+`startup_candle_count` covers backtesting, hyperopt and dry/live. Freqtrade
+loads that many candles before the backtest timerange and sizes the
+initial live download with it.
+
+Configuration (optional):
+
+    "pochteca": {"lookback": {"tolerance": 1e-6}}
+
+`"tolerance": 0` only counts the candles before the first value.
+"""
+import functools
+import logging
+
+import numpy as np
+import talib.abstract as ta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE = 1e-6
+# Longest warm-up that can be measured (an EMA 200 settles in ~1300 candles at 1e-6)
+REFERENCE_CANDLES = 8192
+# Candles after the warm-up that must all match the reference
+VERIFY_CANDLES = 16
+
+
+@functools.lru_cache(maxsize=1)
+def _reference_candles():
+    """
+    Deterministic random-walk candles (hourly-like volatility)
+    """
+    rng = np.random.default_rng(20260101)
+    close = 100 * np.exp(np.cumsum(rng.standard_normal(REFERENCE_CANDLES) * 0.01))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.standard_normal(REFERENCE_CANDLES)) * 0.005
+    return {
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + spread),
+        'low': np.minimum(open_, close) * (1 - spread),
+        'close': close,
+        'volume': rng.uniform(100, 1000, REFERENCE_CANDLES),
+    }
+
+
+def _outputs(function, candles):
+    result = function(candles)
+    return result if isinstance(result, list) else [result]
+
+
+def _matches(function, reference, scales, start, tolerance):
+    """
+    True when `start` candles of history give the reference output, within
+    tolerance, on every one of the next VERIFY_CANDLES candles
+    """
+    candles = {column: values[-(start + VERIFY_CANDLES):] for column, values in _reference_candles().items()}
+    for output, full, scale in zip(_outputs(function, candles), reference, scales):
+        tail = full[-VERIFY_CANDLES:]
+        if not np.all(np.abs(output[-VERIFY_CANDLES:] - tail) <= tolerance * scale):
+            return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _talib(name, params, tolerance):
+    function = ta.Function(name)
+    function.set_parameters(dict(params))
+    first = function.lookback
+    if not tolerance:
+        return first
+
+    reference = _outputs(function, _reference_candles())
+    with np.errstate(invalid='ignore'):
+        scales = [max(float(np.nanmean(np.abs(values))), np.finfo(np.float64).tiny) for values in reference]
+    low, high = first, REFERENCE_CANDLES - VERIFY_CANDLES
+    if not _matches(function, reference, scales, high, tolerance):
+        logger.warning(f"{name}{dict(params)} does not settle within {high} candles, using that")
+        return high
+    # Fewest candles of history that already match
+    while low < high:
+        middle = (low + high) // 2
+        if _matches(function, reference, scales, middle, tolerance):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def talib(name, tolerance=DEFAULT_TOLERANCE, **params):
+    """
+    Candles a TA-Lib function needs before its output can be used
+    """
+    return _talib(name, tuple(sorted(params.items())), tolerance)
+
+
+def window(period):
+    """
+    Rolling windows (sums, means): the first value needs the whole window
+    """
+    return period - 1
+
+
+def tolerance_from_config(config):
+    settings = config.get('pochteca', {}).get('lookback', {})
+    return settings.get('tolerance', DEFAULT_TOLERANCE)
+
+
+def hyperopt_values(strategy):
+    """
+    `values(name)` for `expand_columns` and friends: every value a hyperopt
+    parameter can take, the current value for parameters not optimized
+    """
+    def values(name):
+        parameter = getattr(strategy, name)
+        if not getattr(parameter, 'optimize', False):
+            return [parameter.value]
+        categories = getattr(parameter, 'opt_range', None) or getattr(parameter, 'categories', None)
+        if categories is not None:
+            return list(categories)
+        if isinstance(parameter.low, int) and isinstance(parameter.high, int):
+            return range(parameter.low, parameter.high + 1)
+        return [parameter.low, parameter.high]
+    return values
+
+
+def startup_candle_count(strategy):
+    """
+    Warm-up of the strategy (`strategy.warmup_candles(values)`) over the
+    whole hyperopt range of its parameters
+    """
+    candles = strategy.warmup_candles(hyperopt_values(strategy))
+    logger.info(f"{type(strategy).__name__}: startup_candle_count {candles} "
+                f"(tolerance {tolerance_from_config(strategy.config)})")
+    return candles
@@ -0,0 +1,272 @@
+"""
+Latency metrics for the hot paths.
+
+`timed` (decorator) and `Metrics.timer` (context manager) record how long
+an entry point takes: a latency histogram and call count per stage, and
+the total time and call count per pair. Recording is a couple of
+`perf_counter()` calls and a bucket increment; when metrics are disabled
+the decorator only checks a flag.
+
+The metrics are rendered in the Prometheus text format (`render`) and
+summarized in the log every `log_interval` seconds. The bot and the
+webhook listener are different processes: the strategy writes its metrics
+to `user_data/metrics/<name>.prom` every `export_interval` seconds, and the
+listener serves them together with its own on `GET /metrics`.
+
+Configuration (optional, disabled by default):
+
+    "pochteca": {"metrics": {"enabled": true, "log_interval": 300, "export_interval": 15}}
+
+Only the standard library: the webhook listener imports it as well.
+"""
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from sub-millisecond callbacks to data downloads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+LOG_INTERVAL = 300
+EXPORT_INTERVAL = 15
+# Pairs listed in the log summary
+SLOWEST_PAIRS = 5
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count', 'max')
+
+    def __init__(self, buckets):
+        # One count per bucket plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def quantile(self, q, buckets):
+        """
+        Estimated from the buckets, interpolating inside the bucket
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = buckets[i - 1] if i else 0.0
+                # The largest value seen bounds the last bucket used
+                high = min(buckets[i], self.max) if i < len(buckets) else self.max
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'pair', 'start')
+
+    def __init__(self, metrics, stage, pair):
+        self.metrics = metrics
+        self.stage = stage
+        self.pair = pair
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, self.pair)
+
+
+class Metrics:
+    """
+    Latency histograms per stage and totals per (stage, pair).
+
+    :param namespace: Prefix of the Prometheus metric names
+    :param report: Called with the periodic summary, defaults to the log
+    """
+
+    def __init__(self, namespace, buckets=DEFAULT_BUCKETS, enabled=True, log_interval=LOG_INTERVAL,
+                 export_path=None, export_interval=EXPORT_INTERVAL, report=None):
+        self.namespace = namespace
+        self.report = report or logger.info
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self.export_path = Path(export_path) if export_path else None
+        self.export_interval = export_interval
+        self._stages = {}
+        self._pairs = {}
+        self._lock = threading.Lock()
+        self._logged_at = self._exported_at = time.monotonic()
+
+    def configure(self, config, name):
+        """
+        Applies the `pochteca.metrics` settings of a Freqtrade config; the
+        metrics file is `user_data/metrics/<name>.prom`
+        """
+        settings = config.get('pochteca', {}).get('metrics', False)
+        if isinstance(settings, bool):
+            settings = {'enabled': settings}
+        self.enabled = settings.get('enabled', True)
+        if not self.enabled:
+            return
+        self.log_interval = settings.get('log_interval', LOG_INTERVAL)
+        self.export_interval = settings.get('export_interval', EXPORT_INTERVAL)
+        self.export_path = Path(config.get('user_data_dir', 'user_data')) / 'metrics' / f'{name}.prom'
+        logger.info(f"Metrics enabled, exported to {self.export_path}")
+
+    def observe(self, stage, seconds, pair=None):
+        now = time.monotonic()
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(self.buckets)
+            histogram.counts[bisect_left(self.buckets, seconds)] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+            if seconds > histogram.max:
+                histogram.max = seconds
+            if pair is not None:
+                totals = self._pairs.get((stage, pair))
+                if totals is None:
+                    self._pairs[(stage, pair)] = [seconds, 1]
+                else:
+                    totals[0] += seconds
+                    totals[1] += 1
+            report = now - self._logged_at >= self.log_interval
+            export = self.export_path is not None and now - self._exported_at >= self.export_interval
+            if report:
+                self._logged_at = now
+            if export:
+                self._exported_at = now
+        if report:
+            self.report(self.summary())
+        if export:
+            self.export()
+
+    def timer(self, stage, pair=None):
+        """
+        Context manager timing its block
+        """
+        return _Timer(self, stage, pair)
+
+    def render(self):
+        """
+        Metrics in the Prometheus text format
+        """
+        with self._lock:
+            stages = {stage: (list(h.counts), h.sum, h.count) for stage, h in self._stages.items()}
+            pairs = {key: tuple(totals) for key, totals in self._pairs.items()}
+        name = f'{self.namespace}_latency_seconds'
+        lines = [f'# HELP {name} Latency of the instrumented stages',
+                 f'# TYPE {name} histogram']
+        for stage, (counts, total, count) in sorted(stages.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        if pairs:
+            name = f'{self.namespace}_pair_latency_seconds'
+            lines += [f'# HELP {name} Latency of the instrumented stages per pair',
+                      f'# TYPE {name} summary']
+            for (stage, pair), (total, count) in sorted(pairs.items()):
+                labels = f'stage="{stage}",pair="{_escape(pair)}"'
+                lines.append(f'{name}_sum{{{labels}}} {total}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        name = f'{self.namespace}_rendered_timestamp_seconds'
+        lines += [f'# HELP {name} When these metrics were rendered',
+                  f'# TYPE {name} gauge',
+                  f'{name} {time.time()}']
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        One line per stage: calls, mean, p50/p95/max and the slowest pairs
+        """
+        with self._lock:
+            lines = [f"{self.namespace} latency summary:"]
+            for stage, histogram in sorted(self._stages.items()):
+                line = (f"  {stage}: {histogram.count} calls, mean {_ms(histogram.sum / histogram.count)}, "
+                        f"p50 {_ms(histogram.quantile(0.5, self.buckets))}, "
+                        f"p95 {_ms(histogram.quantile(0.95, self.buckets))}, max {_ms(histogram.max)}")
+                pairs = sorted(((totals[0] / totals[1], pair) for (name, pair), totals in self._pairs.items()
+                                if name == stage), reverse=True)[:SLOWEST_PAIRS]
+                if pairs:
+                    line += "; slowest pairs " + ", ".join(f"{pair} {_ms(mean)}" for mean, pair in pairs)
+                lines.append(line)
+        return '\n'.join(lines)
+
+    def export(self):
+        """
+        Writes `render()` to the export file (atomically)
+        """
+        try:
+            self.export_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.export_path.with_suffix('.tmp')
+            tmp_path.write_text(self.render())
+            os.replace(tmp_path, self.export_path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.export_path}: {e}")
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.2f}ms"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def read_exported(directory):
+    """
+    Contents of the metrics files exported by other processes
+    """
+    texts = []
+    for path in sorted(Path(directory).glob('*.prom')):
+        try:
+            texts.append(path.read_text())
+        except OSError as e:
+            logger.warning(f"Could not read metrics from {path}: {e}")
+    return ''.join(texts)
+
+
+# Metrics of the strategy process, configured in bot_start
+STRATEGY_METRICS = Metrics('pochteca_strategy', enabled=False)
+
+
+def timed(stage, pair=None, metrics=STRATEGY_METRICS):
+    """
+    Decorator timing every call of a function or method.
+
+    :param pair: Name of the argument holding the pair, or a metadata dict
+                 with a 'pair' key, for the per-pair timings
+    """
+    def decorator(func):
+        index = None
+        if pair is not None:
+            index = list(inspect.signature(func).parameters).index(pair)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            key = None
+            if index is not None:
+                key = args[index] if index < len(args) else kwargs.get(pair)
+                if isinstance(key, dict):
+                    key = key.get('pair')
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(stage, time.perf_counter() - start, key)
+        return wrapper
+    return decorator
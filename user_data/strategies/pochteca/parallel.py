@@ -0,0 +1,209 @@
+"""
+Parallel batch analysis in a process pool.
+
+Extends the batch analysis (`batch.PanelAnalysis`) to several processes:
+the pairs of the panel are split into one slice per worker and every worker
+runs the strategy's panel analysis on its slice. The candle arrays go to
+the workers through one shared memory block, so only the block name and the
+slice bounds are pickled per task; the results come back as arrays.
+
+Every pair is still computed on its own candles with the same code, and
+the slices are merged back in pair order, so the results are identical to
+the serial analysis whatever the number of workers. Workers are spawned
+(not forked from the running bot) and load the strategy once from its file.
+If the pool fails, the analysis runs in-process.
+
+Configuration (optional, disabled by default; `workers` defaults to the
+number of CPUs):
+
+    "pochteca": {"parallel_analysis": {"workers": 4}}
+"""
+import importlib.util
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from . import streaming
+from .batch import Panel, PanelAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Config keys a worker needs to rebuild the strategy
+WORKER_CONFIG_KEYS = ('runmode', 'timeframe', 'api_server', 'pochteca')
+
+_strategies = {}
+
+
+def _parameters(strategy):
+    """
+    Current values of the strategy's hyperopt parameters
+    """
+    values = {}
+    for cls in reversed(type(strategy).__mro__):
+        for name, attribute in vars(cls).items():
+            if hasattr(attribute, 'space') and hasattr(attribute, 'value'):
+                values[name] = getattr(strategy, name).value
+    return values
+
+
+class StrategyReference:
+    """
+    Picklable stand-in for a strategy instance: file, class, the config
+    keys it needs and its parameter values
+    """
+
+    def __init__(self, strategy, method):
+        # Freqtrade loads strategies from their file without registering the module
+        self.path = getattr(strategy, '__file__', None) or getattr(type(strategy), method).__code__.co_filename
+        self.name = type(strategy).__name__
+        self.method = method
+        config = {key: strategy.config[key] for key in WORKER_CONFIG_KEYS if key in strategy.config}
+        settings = dict(config.get('pochteca', {}))
+        # Workers analyze in-process, without caches, streams, metrics or signal feeds of their own
+        for key in ('parallel_analysis', 'batch_analysis', 'metrics', 'signals'):
+            settings.pop(key, None)
+        settings['indicator_cache'] = {'enabled': False}
+        settings['streaming_indicators'] = False
+        config['pochteca'] = settings
+        self.config = config
+        self.parameters = {}
+
+    def strategy(self):
+        """
+        Strategy instance of this process, created on first use
+        """
+        key = (self.path, self.name, repr(self.config))
+        strategy = _strategies.get(key)
+        if strategy is None:
+            spec = importlib.util.spec_from_file_location(f'_pochteca_worker_{self.name}', self.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            strategy = getattr(module, self.name)(self.config)
+            strategy.bot_start()
+            _strategies[key] = strategy
+        for name, value in self.parameters.items():
+            getattr(strategy, name).value = value
+        return strategy
+
+
+def _views(buffer, shape):
+    """
+    Candle columns and candle positions laid out in a shared memory block
+    """
+    size = shape[0] * shape[1] * 8
+    columns = {
+        column: np.ndarray(shape, dtype=np.float64, buffer=buffer, offset=i * size, order='F')
+        for i, column in enumerate(streaming.CANDLE_COLUMNS)
+    }
+    position = np.ndarray(shape, dtype=np.int64, buffer=buffer,
+                          offset=len(streaming.CANDLE_COLUMNS) * size, order='F')
+    return columns, position
+
+
+def _share(buffer, panel):
+    columns, position = _views(buffer, panel.position.shape)
+    for column, values in columns.items():
+        values[...] = panel[column]
+    position[...] = panel.position
+
+
+def _analyze_slice(reference, name, shape, start, stop):
+    """
+    Worker: panel analysis of pairs `start:stop` of the shared panel
+    """
+    block = SharedMemory(name=name)
+    try:
+        columns, position = _views(block.buf, shape)
+        # Own copies of the slice, nothing may point into the block once it is closed
+        columns = {column: np.array(values[:, start:stop], order='F') for column, values in columns.items()}
+        position = np.array(position[:, start:stop], order='F')
+    finally:
+        block.close()
+    panel = Panel.from_arrays(columns, position)
+    return getattr(reference.strategy(), reference.method)(panel)
+
+
+class PoolAnalyzer:
+    """
+    Panel analysis of a strategy, split across a process pool.
+
+    :param method: Name of the strategy's panel analysis method, returning
+                   (dict group -> dict of 2-D arrays, skipped pair indices)
+    """
+
+    def __init__(self, strategy, method, workers):
+        self.strategy = strategy
+        self.method = method
+        self.workers = workers
+        self.reference = StrategyReference(strategy, method)
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=get_context('spawn'))
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __call__(self, panel):
+        bounds = [(chunk[0], chunk[-1] + 1) for chunk in np.array_split(np.arange(len(panel.pairs)), self.workers)
+                  if chunk.size]
+        if len(bounds) < 2:
+            return getattr(self.strategy, self.method)(panel)
+
+        shape = panel.position.shape
+        block = SharedMemory(create=True, size=max((len(streaming.CANDLE_COLUMNS) + 1) * shape[0] * shape[1] * 8, 1))
+        try:
+            _share(block.buf, panel)
+            self.reference.parameters = _parameters(self.strategy)
+            futures = [self._pool().submit(_analyze_slice, self.reference, block.name, shape, start, stop)
+                       for start, stop in bounds]
+            results = [future.result() for future in futures]
+        except Exception:
+            logger.exception("Parallel analysis failed, analyzing in-process")
+            self.close()
+            return getattr(self.strategy, self.method)(panel)
+        finally:
+            block.close()
+            block.unlink()
+
+        # Slices back together in pair order
+        groups = {
+            group: {column: np.concatenate([result[0][group][column] for result in results], axis=1)
+                    for column in first}
+            for group, first in results[0][0].items()
+        }
+        skip = [start + j for (start, _), result in zip(bounds, results) for j in result[1]]
+        return groups, skip
+
+
+class ParallelAnalysis(PanelAnalysis):
+    """
+    `PanelAnalysis` running the strategy's panel analysis in a process pool
+    """
+
+    def __init__(self, strategy, method, workers):
+        super().__init__(PoolAnalyzer(strategy, method, workers))
+
+    @classmethod
+    def from_config(cls, config, strategy, method):
+        """
+        Parallel analysis for the running Freqtrade config, None when disabled
+        """
+        settings = config.get('pochteca', {}).get('parallel_analysis')
+        if not settings:
+            return None
+        if not streaming.HAS_TALIB_STREAMS:
+            logger.warning("TA-Lib has no stream handles, parallel analysis disabled")
+            return None
+        workers = settings.get('workers') if isinstance(settings, dict) else None
+        workers = workers or os.cpu_count() or 1
+        logger.info(f"Parallel analysis of all pairs enabled, {workers} workers")
+        return cls(strategy, method, workers)
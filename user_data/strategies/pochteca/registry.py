@@ -0,0 +1,167 @@
+"""
+Declarative indicator registry.
+
+Strategies register every indicator they can compute together with the
+columns it produces, and declare the columns their entry/exit rules and
+callbacks read. Only the indicators needed for those columns (and their
+dependencies) are computed; columns that are only useful on a chart are
+added when plotting: `plot-dataframe`, the webserver, or a bot with the API
+server (FreqUI) enabled.
+
+`"pochteca": {"all_indicators": true}` in the config computes everything.
+
+Indicators also declare their lookback, which gives the warm-up the
+strategy needs (`lookback()`, see pochteca/lookback.py).
+"""
+from itertools import product
+from string import Formatter
+
+PLOT_RUNMODES = ('plot', 'webserver')
+
+
+def plotting_enabled(config):
+    runmode = config.get('runmode')
+    runmode = getattr(runmode, 'value', runmode)
+    return runmode in PLOT_RUNMODES or config.get('api_server', {}).get('enabled', False)
+
+
+def plot_columns(plot_config, config=None):
+    """
+    Columns referenced by a strategy's `plot_config`, plus the
+    `--indicators1/2` of plot-dataframe
+    """
+    columns = set((plot_config or {}).get('main_plot', {}))
+    for subplot in (plot_config or {}).get('subplots', {}).values():
+        columns.update(subplot)
+    if config:
+        columns.update(config.get('indicators1') or [])
+        columns.update(config.get('indicators2') or [])
+    return columns
+
+
+def expand_columns(templates, values):
+    """
+    Column names from templates with parameter fields.
+
+    'macd_{buy_macd_fast}_{buy_macd_slow}' becomes one column per combination
+    of `values('buy_macd_fast')` and `values('buy_macd_slow')`.
+    """
+    columns = set()
+    for template in templates:
+        fields = sorted({field for _, field, _, _ in Formatter().parse(template) if field})
+        for combination in product(*(values(field) for field in fields)):
+            columns.add(template.format(**dict(zip(fields, combination))))
+    return columns
+
+
+def wanted_columns(strategy, templates, values=None):
+    """
+    Columns a strategy has to compute, None for all of them.
+
+    :param templates: Columns read by the strategy's rules; fields name
+                      hyperopt parameters and expand to their whole `.range`
+    :param values: Values of a parameter by name, defaults to its `.range`
+    """
+    config = strategy.config
+    if config.get('pochteca', {}).get('all_indicators', False):
+        return None
+    wanted = expand_columns(templates, values or (lambda name: getattr(strategy, name).range))
+    if plotting_enabled(config):
+        wanted |= plot_columns(getattr(strategy, 'plot_config', None), config)
+    return wanted
+
+
+class _Indicator:
+    __slots__ = ('columns', 'compute', 'requires', 'lookback')
+
+    def __init__(self, columns, compute, requires, lookback):
+        self.columns = columns
+        self.compute = compute
+        self.requires = requires
+        self.lookback = lookback
+
+
+class IndicatorRegistry:
+    def __init__(self):
+        self._indicators = []
+        self._producers = {}
+
+    def add(self, columns, compute, requires=(), lookback=0):
+        """
+        :param columns: Column name, or tuple of names for multi-output indicators
+        :param compute: Called with the columns computed so far; returns the
+                        values, or a mapping keyed by column for multi-output
+        :param requires: Columns `compute` reads from that mapping
+        :param lookback: Candles it needs before its first usable value, on
+                         top of the lookback of `requires`
+        """
+        if isinstance(columns, str):
+            columns = (columns,)
+        indicator = _Indicator(tuple(columns), compute, tuple(requires), lookback)
+        self._indicators.append(indicator)
+        for column in indicator.columns:
+            self._producers[column] = indicator
+
+    @property
+    def columns(self):
+        return list(self._producers)
+
+    def resolve(self, wanted):
+        """
+        Indicators needed for `wanted` columns, in registration order.
+        Columns nobody produces (OHLCV, signal columns) are ignored.
+        """
+        if wanted is None:
+            return list(self._indicators)
+        needed = set()
+        pending = [self._producers[c] for c in wanted if c in self._producers]
+        while pending:
+            indicator = pending.pop()
+            if id(indicator) in needed:
+                continue
+            needed.add(id(indicator))
+            pending.extend(self._producers[c] for c in indicator.requires if c in self._producers)
+        return [indicator for indicator in self._indicators if id(indicator) in needed]
+
+    def lookback(self, wanted=None):
+        """
+        Candles needed before every `wanted` column (None for all) is usable:
+        the longest chain of lookbacks through their dependencies
+        """
+        totals = {}
+
+        def total(indicator):
+            if id(indicator) not in totals:
+                totals[id(indicator)] = indicator.lookback + max(
+                    (total(self._producers[c]) for c in indicator.requires if c in self._producers), default=0)
+            return totals[id(indicator)]
+
+        return max((total(indicator) for indicator in self.resolve(wanted)), default=0)
+
+    def compute(self, wanted=None, grid=None):
+        """
+        Computes the indicators behind `wanted` (None for all).
+
+        :param grid: Columns already available (e.g. from streaming updates);
+                     indicators producing only those are skipped
+        :return: dict of computed columns, including those of `grid` that
+                 `wanted` needs
+        """
+        grid = dict(grid or {})
+        indicators = self.resolve(wanted)
+        keep = None
+        if wanted is not None:
+            keep = set(wanted).union(*(indicator.requires for indicator in indicators))
+            # Same columns as computing from scratch, whatever else was given
+            grid = {column: values for column, values in grid.items() if column in keep}
+        for indicator in indicators:
+            if all(column in grid for column in indicator.columns if keep is None or column in keep):
+                continue
+            result = indicator.compute(grid)
+            if len(indicator.columns) == 1:
+                grid[indicator.columns[0]] = result
+                continue
+            for column in indicator.columns:
+                if keep is None or column in keep:
+                    grid[column] = result[column]
+        return grid
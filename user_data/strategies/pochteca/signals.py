@@ -0,0 +1,284 @@
+"""
+External signals (TradingView alerts, n8n workflows) for the strategies.
+
+The webhook listener accepts signals on `POST /signal` into a `SignalStore`
+and publishes them on a Unix socket (`user_data/signals.sock`, visible to
+the bot through the user_data mount). The strategy's `SignalFeed` follows
+that socket from a background thread into its own `SignalStore`, so a
+lookup from the trade loop is one dict read, with no file or network I/O.
+
+A signal is active from when the listener receives it until it expires
+(`ttl` seconds, default one hour); expired signals are evicted in expiry
+order as new ones come in, and never returned.
+
+Wire format: one JSON object per line (`Signal.to_dict()`); on connect the
+listener first sends every active signal.
+
+Configuration (optional, disabled by default; only used in dry/live):
+
+    "pochteca": {"signals": true}
+    "pochteca": {"signals": {"socket": "user_data/signals.sock"}}
+
+Only the standard library: the webhook listener imports it as well.
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SIGNAL_RUNMODES = ('dry_run', 'live')
+SOCKET_NAME = 'signals.sock'
+DEFAULT_TTL = 3600
+MAX_TTL = 7 * 24 * 3600
+# Payload spellings of the actions (TradingView's {{strategy.order.action}} is buy/sell)
+ACTIONS = {
+    'enter_long': 'enter_long', 'buy': 'enter_long', 'long': 'enter_long',
+    'exit_long': 'exit_long', 'sell': 'exit_long', 'close': 'exit_long',
+}
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+SEND_TIMEOUT = 1.0
+
+
+class Signal:
+    __slots__ = ('pair', 'action', 'source', 'tag', 'received', 'expires')
+
+    def __init__(self, pair, action, source, tag, received, expires):
+        self.pair = pair
+        self.action = action
+        self.source = source
+        self.tag = tag
+        self.received = received
+        self.expires = expires
+
+    @classmethod
+    def from_payload(cls, data, now=None, default_ttl=DEFAULT_TTL):
+        """
+        Signal from a webhook payload, e.g.
+        `{"pair": "BTC/USDT", "action": "buy", "source": "tradingview", "ttl": 900}`
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid signal: {data!r}")
+        pair = str(data.get('pair', '')).strip().upper()
+        if '/' not in pair:
+            raise ValueError(f"Invalid pair: {data.get('pair')!r}, expected e.g. BTC/USDT")
+        action = ACTIONS.get(str(data.get('action', '')).strip().lower())
+        if action is None:
+            raise ValueError(f"Invalid action: {data.get('action')!r}, expected one of {sorted(ACTIONS)}")
+        try:
+            ttl = float(data.get('ttl', default_ttl))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid ttl: {data.get('ttl')!r}")
+        if not 0 < ttl <= MAX_TTL:
+            raise ValueError(f"Invalid ttl: {ttl}, expected 0 < ttl <= {MAX_TTL}")
+        now = time.time() if now is None else now
+        return cls(pair, action, str(data.get('source', 'webhook')), data.get('tag'), now, now + ttl)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['pair'], data['action'], data['source'], data.get('tag'),
+                   float(data['received']), float(data['expires']))
+
+    def to_dict(self):
+        return {'pair': self.pair, 'action': self.action, 'source': self.source, 'tag': self.tag,
+                'received': self.received, 'expires': self.expires}
+
+
+class SignalStore:
+    """
+    Latest signal per (pair, action), with an expiry heap for eviction
+    """
+
+    def __init__(self):
+        self._latest = {}
+        self._expiry = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def put(self, signal):
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            if signal.expires <= now:
+                return
+            key = (signal.pair, signal.action)
+            self._latest[key] = signal
+            heapq.heappush(self._expiry, (signal.expires, next(self._sequence), key, signal))
+
+    def get(self, pair, action, now=None):
+        """
+        Active signal for the pair and action, or None
+        """
+        signal = self._latest.get((pair, action))
+        if signal is None or signal.expires <= (time.time() if now is None else now):
+            return None
+        return signal
+
+    def evict(self, now=None):
+        with self._lock:
+            self._evict(time.time() if now is None else now)
+
+    def _evict(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, _, key, signal = heapq.heappop(self._expiry)
+            if self._latest.get(key) is signal:
+                del self._latest[key]
+
+    def active(self):
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            return sorted(self._latest.values(), key=lambda signal: signal.received)
+
+
+def _encode(signal):
+    return (json.dumps(signal.to_dict()) + '\n').encode('utf-8')
+
+
+def _gid(group):
+    if isinstance(group, int) or str(group).isdigit():
+        return int(group)
+    import grp
+    return grp.getgrnam(group).gr_gid
+
+
+class SignalServer:
+    """
+    Listener side: stores the signals and pushes them to the connected feeds
+
+    :param group: Group (name or gid) allowed to follow the socket, for a bot
+                  running as another user; None keeps it to the owner only
+    """
+
+    def __init__(self, path, store=None, group=None):
+        self.path = Path(path)
+        self.store = store if store is not None else SignalStore()
+        self.group = group
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._socket = None
+
+    def start(self):
+        self.path.unlink(missing_ok=True)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(str(self.path))
+        # Nobody can connect before listen(): restrict it first
+        if self.group is None:
+            self.path.chmod(0o600)
+        else:
+            os.chown(self.path, -1, _gid(self.group))
+            self.path.chmod(0o660)
+        self._socket.listen()
+        threading.Thread(target=self._accept, name="signal-server", daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return
+            # A stalled feed must not hold up the webhook requests
+            connection.settimeout(SEND_TIMEOUT)
+            # Subscribed under the lock so no signal falls between the snapshot and the stream
+            with self._lock:
+                try:
+                    connection.sendall(b''.join(_encode(signal) for signal in self.store.active()))
+                except OSError:
+                    connection.close()
+                    continue
+                self._subscribers.append(connection)
+
+    def publish(self, signal):
+        """
+        Stores the signal and sends it to every feed
+
+        :return: Number of feeds it was sent to
+        """
+        self.store.put(signal)
+        line = _encode(signal)
+        with self._lock:
+            for connection in list(self._subscribers):
+                try:
+                    connection.sendall(line)
+                except OSError:
+                    connection.close()
+                    self._subscribers.remove(connection)
+            return len(self._subscribers)
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self.path.unlink(missing_ok=True)
+        with self._lock:
+            for connection in self._subscribers:
+                connection.close()
+            self._subscribers.clear()
+
+
+class SignalFeed:
+    """
+    Strategy side: follows the listener's socket into a local store.
+
+    `get(pair, action)` never blocks; while the listener is down the feed
+    keeps the signals it has (until they expire) and reconnects.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.store = SignalStore()
+        self.connected = False
+        self._thread = threading.Thread(target=self._follow, name="signal-feed", daemon=True)
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Started feed for the running Freqtrade config, None when disabled or
+        outside dry/live
+        """
+        settings = config.get('pochteca', {}).get('signals', False)
+        if isinstance(settings, bool):
+            settings = {'enabled': settings}
+        runmode = config.get('runmode')
+        if not settings.get('enabled', True) or getattr(runmode, 'value', runmode) not in SIGNAL_RUNMODES:
+            return None
+        path = settings.get('socket') or Path(config.get('user_data_dir', 'user_data')) / SOCKET_NAME
+        feed = cls(path)
+        feed.start()
+        logger.info(f"Following external signals on {path}")
+        return feed
+
+    def start(self):
+        self._thread.start()
+
+    def get(self, pair, action, now=None):
+        return self.store.get(pair, action, now)
+
+    def _follow(self):
+        attempt = 0
+        while True:
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                    connection.connect(str(self.path))
+                    self.connected, attempt = True, 0
+                    logger.info(f"Connected to the signal listener on {self.path}")
+                    for line in connection.makefile('r', encoding='utf-8'):
+                        try:
+                            signal = Signal.from_dict(json.loads(line))
+                        except (KeyError, TypeError, ValueError) as e:
+                            logger.warning(f"Ignoring malformed signal {line.strip()!r}: {e}")
+                            continue
+                        self.store.put(signal)
+                        logger.info(f"Signal {signal.action} {signal.pair} from {signal.source}")
+                logger.warning(f"Signal listener on {self.path} closed the connection")
+            except OSError as e:
+                if attempt == 0:
+                    logger.warning(f"Signal listener on {self.path} unavailable: {e}")
+            self.connected = False
+            time.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+            attempt += 1
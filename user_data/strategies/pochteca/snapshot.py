@@ -0,0 +1,78 @@
+"""
+Latest analyzed candle per pair, for the trade-loop callbacks.
+
+`custom_stoploss` and friends run for every open trade on every loop
+iteration. Reading the last candle through `dp.get_analyzed_dataframe()` and
+`dataframe.iloc[-1]` builds a pandas Series each time just to read one or
+two values. The strategy stores the few fields the callbacks need once per
+analyzed candle instead, and the callbacks look them up by pair.
+
+Only used in dry/live: in backtesting the analyzed dataframe the callbacks
+see depends on the simulated time, so they keep using the DataProvider.
+"""
+from datetime import timedelta
+
+SNAPSHOT_RUNMODES = ('dry_run', 'live')
+
+
+class CandleSnapshot:
+    __slots__ = ('date', 'close', 'atr_pct', 'vwap', 'rsi')
+
+    def __init__(self, date, close, atr_pct, vwap, rsi):
+        self.date = date
+        self.close = close
+        self.atr_pct = atr_pct
+        self.vwap = vwap
+        self.rsi = rsi
+
+
+class SnapshotCache:
+    """
+    :param candle_minutes: Strategy timeframe in minutes
+    """
+
+    def __init__(self, candle_minutes):
+        self._snapshots = {}
+        # Once the following candle has closed the snapshot is out of date
+        self._max_age = timedelta(minutes=2 * candle_minutes)
+
+    @classmethod
+    def from_config(cls, config, candle_minutes):
+        """
+        Cache for the running Freqtrade config, None outside dry/live
+        """
+        runmode = config.get('runmode')
+        if getattr(runmode, 'value', runmode) not in SNAPSHOT_RUNMODES:
+            return None
+        return cls(candle_minutes)
+
+    def update(self, pair, dataframe):
+        """
+        Stores the last candle of an analyzed dataframe
+        """
+        if len(dataframe) == 0:
+            self._snapshots.pop(pair, None)
+            return
+
+        def last(column):
+            return float(dataframe[column].to_numpy()[-1]) if column in dataframe.columns else float('nan')
+
+        self._snapshots[pair] = CandleSnapshot(
+            dataframe['date'].iat[-1].to_pydatetime(),
+            last('close'),
+            last('atr_pct'),
+            last('vwap'),
+            last('rsi'),
+        )
+
+    def get(self, pair, current_time=None):
+        """
+        Snapshot of the last analyzed candle, None if missing or stale
+        """
+        snapshot = self._snapshots.get(pair)
+        if snapshot is None:
+            return None
+        if current_time is not None and current_time - snapshot.date >= self._max_age:
+            del self._snapshots[pair]
+            return None
+        return snapshot
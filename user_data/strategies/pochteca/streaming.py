@@ -0,0 +1,300 @@
+"""
+Incremental indicator updates for dry/live runs.
+
+In dry/live every new candle hands `populate_indicators` the whole candle
+history again, and recomputing recursive indicators (EMA, Wilder RSI/ATR)
+and rolling sums over it makes per-candle CPU grow with history length.
+`StreamingIndicators` keeps per-pair state instead (EMA accumulators,
+Wilder averages, rolling window sums) and only feeds it the candles it has
+not seen yet: O(1) work per indicator and new candle.
+
+TA-Lib indicators use TA-Lib's own stream handles (`talib.stream.EMA`
+and friends, with `open_and_fill`/`update`), which run the same C code as
+the batch functions, so the values are bit-identical to `ta.EMA` & co.
+The rolling VWAP and volume SMA continue the running sums of
+`kernels.volume_windows`, so they are identical to the batch kernel too.
+
+Freqtrade drops the oldest candles once its buffer is full; the streams
+keep the recursion going from the first candle they saw, which is what a
+batch run over the longer history computes. State is rebuilt from the
+dataframe when the candles stop lining up with it (restart, gap, revised
+candle), so a resync costs one batch computation, never wrong values.
+
+Needs a TA-Lib version with stream handles; with older versions, or while
+a pair has too little history, `update` returns None and the strategy
+computes its indicators in batch as before.
+
+Configuration (optional, enabled by default in dry_run/live):
+
+    "pochteca": {"streaming_indicators": false}
+"""
+import logging
+
+import numpy as np
+import talib
+import talib.stream as ta_stream
+
+from . import kernels
+
+logger = logging.getLogger(__name__)
+
+STREAMING_RUNMODES = ('dry_run', 'live')
+CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+HAS_TALIB_STREAMS = hasattr(getattr(ta_stream, 'EMA', None), 'open_and_fill')
+_InsufficientHistory = getattr(talib, 'InsufficientHistory', ValueError)
+
+
+class EMA:
+    def __init__(self, period, column, source='close'):
+        self.columns = (column,)
+        self.period = period
+        self.source = source
+
+    def open(self, candles):
+        self.stream, values = ta_stream.EMA.open_and_fill(candles[self.source], timeperiod=self.period)
+        return (values,)
+
+    def update(self, candle):
+        return (self.stream.update(candle[self.source]),)
+
+
+class SMA:
+    def __init__(self, period, column, source='close'):
+        self.columns = (column,)
+        self.period = period
+        self.source = source
+
+    def open(self, candles):
+        self.stream, values = ta_stream.SMA.open_and_fill(candles[self.source], timeperiod=self.period)
+        return (values,)
+
+    def update(self, candle):
+        return (self.stream.update(candle[self.source]),)
+
+
+class RSI:
+    def __init__(self, period, column):
+        self.columns = (column,)
+        self.period = period
+
+    def open(self, candles):
+        self.stream, values = ta_stream.RSI.open_and_fill(candles['close'], timeperiod=self.period)
+        return (values,)
+
+    def update(self, candle):
+        return (self.stream.update(candle['close']),)
+
+
+class ATR:
+    def __init__(self, period, column):
+        self.columns = (column,)
+        self.period = period
+
+    def open(self, candles):
+        self.stream, values = ta_stream.ATR.open_and_fill(
+            candles['high'], candles['low'], candles['close'], timeperiod=self.period)
+        return (values,)
+
+    def update(self, candle):
+        return (self.stream.update(candle['high'], candle['low'], candle['close']),)
+
+
+class BBands:
+    """
+    Outputs upper, middle and lower band, in that order
+    """
+
+    def __init__(self, period, nbdev, columns):
+        self.columns = tuple(columns)
+        self.period = period
+        self.nbdev = nbdev
+
+    def open(self, candles):
+        self.stream, values = ta_stream.BBANDS.open_and_fill(
+            candles['close'], timeperiod=self.period, nbdevup=self.nbdev, nbdevdn=self.nbdev)
+        return values
+
+    def update(self, candle):
+        return self.stream.update(candle['close'])
+
+
+class MACD:
+    """
+    MACD line and signal as ta.MACD: the fast EMA starts `slow - fast`
+    candles late so both EMAs produce their first value on the same candle,
+    and the signal EMA starts with the first MACD value
+    """
+
+    def __init__(self, fast, slow, signal, columns):
+        self.columns = tuple(columns)
+        self.fast_period = fast
+        self.slow_period = slow
+        self.signal_period = signal
+
+    def open(self, candles):
+        close = candles['close']
+        offset = self.slow_period - self.fast_period
+        self.fast, fast = ta_stream.EMA.open_and_fill(close[offset:], timeperiod=self.fast_period)
+        self.slow, slow = ta_stream.EMA.open_and_fill(close, timeperiod=self.slow_period)
+        line = np.r_[np.full(offset, np.nan), fast] - slow
+        self.signal, signal = ta_stream.EMA.open_and_fill(line, timeperiod=self.signal_period)
+        return line, signal
+
+    def update(self, candle):
+        line = self.fast.update(candle['close']) - self.slow.update(candle['close'])
+        return line, self.signal.update(line)
+
+
+class VolumeWindows:
+    """
+    Rolling VWAP and volume SMA from `kernels.volume_windows`, continued
+    with the same running sums
+
+    :param vwap: dict period -> column
+    :param sma: dict period -> column of the volume SMA
+    """
+
+    def __init__(self, vwap, sma=None):
+        self.vwap = dict(vwap)
+        self.sma = dict(sma or {})
+        self.columns = (*self.vwap.values(), *self.sma.values())
+        self.windows = kernels.VolumeWindows(self.vwap, self.sma)
+
+    def _outputs(self, vwap, sma):
+        return [vwap[period] for period in self.vwap] + [sma[period] for period in self.sma]
+
+    def open(self, candles):
+        return self._outputs(*self.windows.open(
+            candles['high'], candles['low'], candles['close'], candles['volume']))
+
+    def update(self, candle):
+        return self._outputs(*self.windows.update(
+            candle['high'], candle['low'], candle['close'], candle['volume']))
+
+
+def open_streams(streams, candles, size):
+    """
+    Opens `streams` on a whole candle history (batch computation).
+
+    :param candles: dict of float64 arrays keyed by candle column
+    :return: 2-D array, one row per stream column
+    """
+    outputs = []
+    for stream in streams:
+        outputs.extend(stream.open(candles))
+    columns = sum(len(stream.columns) for stream in streams)
+    return np.array(outputs, dtype=np.float64).reshape(columns, size)
+
+
+class _PairState:
+    def __init__(self, streams):
+        self.streams = streams
+        self.columns = [column for stream in streams for column in stream.columns]
+        self.dates = None
+        self.values = None
+        self.last_candle = None
+
+    def first_new(self, dates, candles):
+        """
+        Index of the first candle not fed yet, None if the dataframe no longer
+        continues what the streams have seen
+        """
+        last = self.dates[-1]
+        k = int(np.searchsorted(dates, last))
+        if k >= dates.size or dates[k] != last or dates[0] < self.dates[0]:
+            return None
+        start = int(np.searchsorted(self.dates, dates[0]))
+        if self.dates.size - start != k + 1:
+            return None
+        if tuple(float(candles[column][k]) for column in CANDLE_COLUMNS) != self.last_candle:
+            return None
+        return k + 1
+
+    def open(self, dates, candles):
+        self.values = open_streams(self.streams, candles, dates.size)
+        self._seen(dates, candles)
+
+    def advance(self, dates, candles, first_new):
+        rows = []
+        for i in range(first_new, dates.size):
+            candle = {column: float(candles[column][i]) for column in CANDLE_COLUMNS}
+            row = []
+            for stream in self.streams:
+                row.extend(stream.update(candle))
+            rows.append(row)
+
+        kept = self.values[:, self.values.shape[1] - first_new:]
+        new = np.array(rows, dtype=np.float64).reshape(-1, len(self.columns)).T
+        self.values = np.concatenate([kept, new], axis=1)
+        self._seen(dates, candles)
+
+    def _seen(self, dates, candles):
+        self.dates = dates
+        self.last_candle = tuple(float(candles[column][-1]) for column in CANDLE_COLUMNS)
+
+
+class StreamingIndicators:
+    """
+    Per-pair incremental indicators.
+
+    :param build: Callable returning a fresh list of streams (EMA, RSI, ...),
+                  called for each pair and on every resync
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self._pairs = {}
+        self.resyncs = 0
+
+    @classmethod
+    def from_config(cls, config, build):
+        """
+        Streams for the running Freqtrade config, None outside dry/live or
+        when disabled
+        """
+        runmode = config.get('runmode')
+        runmode = getattr(runmode, 'value', runmode)
+        if runmode not in STREAMING_RUNMODES:
+            return None
+        if not config.get('pochteca', {}).get('streaming_indicators', True):
+            return None
+        if not HAS_TALIB_STREAMS:
+            logger.warning(f"TA-Lib {talib.__version__} has no stream handles, "
+                           "indicators are computed in batch")
+            return None
+        logger.info("Streaming indicator updates enabled")
+        return cls(build)
+
+    def update(self, pair, dataframe):
+        """
+        Indicator columns for `dataframe`, feeding only its new candles.
+
+        :return: dict of arrays aligned with `dataframe`, keyed by column;
+                 None while the pair has too little history for the streams
+        """
+        dates = np.ascontiguousarray(dataframe['date'].values).view(np.int64)
+        candles = {column: dataframe[column].to_numpy(dtype=np.float64) for column in CANDLE_COLUMNS}
+
+        state = self._pairs.get(pair)
+        first_new = state.first_new(dates, candles) if state is not None else None
+        if first_new is None:
+            if state is not None:
+                logger.info(f"Resyncing streaming indicators for {pair}")
+                self.resyncs += 1
+            state = _PairState(self.build())
+            try:
+                state.open(dates, candles)
+            except _InsufficientHistory:
+                self._pairs.pop(pair, None)
+                return None
+            self._pairs[pair] = state
+        else:
+            state.advance(dates, candles, first_new)
+        return dict(zip(state.columns, state.values))
+
+    def reset(self, pair=None):
+        if pair is None:
+            self._pairs.clear()
+        else:
+            self._pairs.pop(pair, None)
@@ -32,9 +32,20 @@ from freqtrade.strategy import (
 
 # --------------------------------
 # Add your lib to import here
+import sys
+from pathlib import Path
+
 import talib.abstract as ta
 from technical import qtpylib
 
+# pochteca/ lives next to the strategies; hyperopt workers need to import it too
+if str(Path(__file__).parent) not in sys.path:
+    sys.path.append(str(Path(__file__).parent))
+
+from pochteca import lookback
+from pochteca.indicator_cache import NO_CACHE, IndicatorCache
+from pochteca.registry import IndicatorRegistry, wanted_columns
+
 
 # This class is a sample. Feel free to customize it.
 class SampleStrategy(IStrategy):
@@ -100,8 +111,10 @@ class SampleStrategy(IStrategy):
         low=1, high=50, default=30, space="exit", optimize=True, load=True
     )
 
-    # Number of candles the strategy requires before producing valid signals
-    startup_candle_count: int = 200
+    # Number of candles the strategy requires before producing valid signals,
+    # computed from the indicators' lookbacks in __init__ (see pochteca/lookback.py)
+    startup_candle_count: int = 0
+    lookback_tolerance = lookback.DEFAULT_TOLERANCE
 
     # Optional order type mapping.
     order_types = {
@@ -130,6 +143,21 @@ class SampleStrategy(IStrategy):
         },
     }
 
+    # Columns read by the entry/exit rules. Only these are computed, plus the
+    # plot_config columns when plotting (see pochteca/registry.py)
+    signal_columns = ("rsi", "tema", "bb_middleband")
+
+    # On-disk indicator cache, configured in bot_start
+    indicator_cache = NO_CACHE
+
+    def __init__(self, config: dict) -> None:
+        super().__init__(config)
+        self.lookback_tolerance = lookback.tolerance_from_config(self.config)
+        self.startup_candle_count = lookback.startup_candle_count(self)
+
+    def bot_start(self, **kwargs) -> None:
+        self.indicator_cache = IndicatorCache.from_config(self.config)
+
     def informative_pairs(self):
         """
         Define additional, informative pair/interval combinations to be cached from the exchange.
@@ -143,23 +171,21 @@ class SampleStrategy(IStrategy):
         """
         return []
 
-    def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+    def indicator_registry(self, dataframe: DataFrame, metadata: dict) -> IndicatorRegistry:
         """
-        Adds several different TA indicators to the given DataFrame
-
-        Performance Note: For the best performance be frugal on the number of indicators
-        you are using. Let uncomment only the indicator you are using in your strategies
-        or your hyperopt configuration, otherwise you will waste your memory and CPU usage.
-        :param dataframe: Dataframe with data from the exchange
-        :param metadata: Additional information, like the currently traded pair
-        :return: a Dataframe with all mandatory indicators for the strategies
+        Every indicator the strategy can compute, with the candles each one
+        needs before its first usable value (lookback)
         """
+        # Indicators go through the on-disk cache (backtest/hyperopt by default)
+        ind = self.indicator_cache.bind(dataframe, metadata["pair"], self.timeframe)
+        registry = IndicatorRegistry()
+        tolerance = self.lookback_tolerance
 
         # Momentum Indicators
         # ------------------------------------
 
         # ADX
-        dataframe["adx"] = ta.ADX(dataframe)
+        registry.add("adx", lambda grid: ind.talib("ADX"), lookback=lookback.talib("ADX", tolerance))
 
         # # Plus Directional Indicator / Movement
         # dataframe['plus_dm'] = ta.PLUS_DM(dataframe)
@@ -198,7 +224,7 @@ class SampleStrategy(IStrategy):
         # dataframe['cci'] = ta.CCI(dataframe)
 
         # RSI
-        dataframe["rsi"] = ta.RSI(dataframe)
+        registry.add("rsi", lambda grid: ind.talib("RSI"), lookback=lookback.talib("RSI", tolerance))
 
         # # Inverse Fisher transform on RSI: values [-1.0, 1.0] (https://goo.gl/2JGGoy)
         # rsi = 0.1 * (dataframe['rsi'] - 50)
@@ -213,9 +239,11 @@ class SampleStrategy(IStrategy):
         # dataframe['slowk'] = stoch['slowk']
 
         # Stochastic Fast
-        stoch_fast = ta.STOCHF(dataframe)
-        dataframe["fastd"] = stoch_fast["fastd"]
-        dataframe["fastk"] = stoch_fast["fastk"]
+        registry.add(
+            ("fastd", "fastk"),
+            lambda grid: ind.talib("STOCHF"),
+            lookback=lookback.talib("STOCHF", tolerance),
+        )
 
         # # Stochastic RSI
         # Please read https://github.com/freqtrade/freqtrade/issues/2961 before using this.
@@ -225,13 +253,14 @@ class SampleStrategy(IStrategy):
         # dataframe['fastk_rsi'] = stoch_rsi['fastk']
 
         # MACD
-        macd = ta.MACD(dataframe)
-        dataframe["macd"] = macd["macd"]
-        dataframe["macdsignal"] = macd["macdsignal"]
-        dataframe["macdhist"] = macd["macdhist"]
+        registry.add(
+            ("macd", "macdsignal", "macdhist"),
+            lambda grid: ind.talib("MACD"),
+            lookback=lookback.talib("MACD", tolerance),
+        )
 
         # MFI
-        dataframe["mfi"] = ta.MFI(dataframe)
+        registry.add("mfi", lambda grid: ind.talib("MFI"), lookback=lookback.talib("MFI", tolerance))
 
         # # ROC
         # dataframe['roc'] = ta.ROC(dataframe)
@@ -240,16 +269,32 @@ class SampleStrategy(IStrategy):
         # ------------------------------------
 
         # Bollinger Bands
-        bollinger = qtpylib.bollinger_bands(qtpylib.typical_price(dataframe), window=20, stds=2)
-        dataframe["bb_lowerband"] = bollinger["lower"]
-        dataframe["bb_middleband"] = bollinger["mid"]
-        dataframe["bb_upperband"] = bollinger["upper"]
-        dataframe["bb_percent"] = (dataframe["close"] - dataframe["bb_lowerband"]) / (
-            dataframe["bb_upperband"] - dataframe["bb_lowerband"]
+        def bollinger(grid):
+            bands = ind.get(
+                "qtpylib_bollinger_bands",
+                {"window": 20, "stds": 2},
+                lambda: qtpylib.bollinger_bands(qtpylib.typical_price(dataframe), window=20, stds=2),
+            )
+            return {
+                "bb_lowerband": bands["lower"],
+                "bb_middleband": bands["mid"],
+                "bb_upperband": bands["upper"],
+            }
+
+        registry.add(
+            ("bb_lowerband", "bb_middleband", "bb_upperband"), bollinger, lookback=lookback.window(20)
+        )
+        registry.add(
+            "bb_percent",
+            lambda grid: (dataframe["close"] - grid["bb_lowerband"])
+            / (grid["bb_upperband"] - grid["bb_lowerband"]),
+            requires=("bb_lowerband", "bb_upperband"),
+        )
+        registry.add(
+            "bb_width",
+            lambda grid: (grid["bb_upperband"] - grid["bb_lowerband"]) / grid["bb_middleband"],
+            requires=("bb_lowerband", "bb_middleband", "bb_upperband"),
         )
-        dataframe["bb_width"] = (dataframe["bb_upperband"] - dataframe["bb_lowerband"]) / dataframe[
-            "bb_middleband"
-        ]
 
         # Bollinger Bands - Weighted (EMA based instead of SMA)
         # weighted_bollinger = qtpylib.weighted_bollinger_bands(
@@ -284,17 +329,25 @@ class SampleStrategy(IStrategy):
         # dataframe['sma100'] = ta.SMA(dataframe, timeperiod=100)
 
         # Parabolic SAR
-        dataframe["sar"] = ta.SAR(dataframe)
+        registry.add("sar", lambda grid: ind.talib("SAR"), lookback=lookback.talib("SAR", tolerance))
 
         # TEMA - Triple Exponential Moving Average
-        dataframe["tema"] = ta.TEMA(dataframe, timeperiod=9)
+        registry.add(
+            "tema",
+            lambda grid: ind.talib("TEMA", timeperiod=9),
+            lookback=lookback.talib("TEMA", tolerance, timeperiod=9),
+        )
 
         # Cycle Indicator
         # ------------------------------------
         # Hilbert Transform Indicator - SineWave
-        hilbert = ta.HT_SINE(dataframe)
-        dataframe["htsine"] = hilbert["sine"]
-        dataframe["htleadsine"] = hilbert["leadsine"]
+        def hilbert(grid):
+            sine = ind.talib("HT_SINE")
+            return {"htsine": sine["sine"], "htleadsine": sine["leadsine"]}
+
+        registry.add(
+            ("htsine", "htleadsine"), hilbert, lookback=lookback.talib("HT_SINE", tolerance)
+        )
 
         # Pattern Recognition - Bullish candlestick patterns
         # ------------------------------------
@@ -361,6 +414,34 @@ class SampleStrategy(IStrategy):
                 dataframe['best_ask'] = ob['asks'][0][0]
         """
 
+        return registry
+
+    def warmup_candles(self, values) -> int:
+        """
+        Candles the entry/exit rules need before their first valid signal
+        :param values: Values of each hyperopt parameter by name
+        """
+        candles = DataFrame(columns=["date", "open", "high", "low", "close", "volume"])
+        registry = self.indicator_registry(candles, {"pair": None})
+        # +1: crossed_above and the tema guards read the previous candle
+        return registry.lookback(wanted_columns(self, self.signal_columns, values)) + 1
+
+    def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
+        """
+        Adds several different TA indicators to the given DataFrame
+
+        Performance Note: For the best performance be frugal on the number of indicators
+        you are using. Let uncomment only the indicator you are using in your strategies
+        or your hyperopt configuration, otherwise you will waste your memory and CPU usage.
+        :param dataframe: Dataframe with data from the exchange
+        :param metadata: Additional information, like the currently traded pair
+        :return: a Dataframe with all mandatory indicators for the strategies
+        """
+        # Only the indicators needed for signal_columns are computed
+        registry = self.indicator_registry(dataframe, metadata)
+        for column, values in registry.compute(wanted_columns(self, self.signal_columns)).items():
+            dataframe[column] = values
+
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame: